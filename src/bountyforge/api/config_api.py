@@ -13,9 +13,14 @@ from bountyforge.config import settings
 from flask_jwt_extended import (
   JWTManager, create_access_token, jwt_required, get_jwt_identity
 )
-from pymongo import MongoClient
 from bountyforge.core import module_manager
 from bountyforge.core import run_scan_task
+from bountyforge.core.replay import replay_job
+from bountyforge.core.records import (
+    RECORD_KINDS, live_results, load_records, record_filters
+)
+from bountyforge.core.spill import load_results
+from bountyforge.repository import RecordRepository, ScanRepository, get_db
 
 
 logger = logging.getLogger(__name__)
@@ -174,9 +179,7 @@ def start_scan():
     # TODO: exclude validation + usage
 
     job = run_scan_task.delay({**data, "target": valid}, asdict(settings))
-    mongo = MongoClient(settings.backend.mongo_url)
-    db = mongo.get_default_database()
-    db.scan_jobs.insert_one({
+    ScanRepository().insert_job({
         "job_id": job.id,
         "targets": valid,
         "exclude": invalid,
@@ -201,21 +204,40 @@ def start_scan():
     }), 202
 
 
+@config_api.route('/api/replay/<job_id>', methods=['POST'])
+@jwt_required()
+def replay_scan(job_id):
+    """
+    Re-parse the stored raw output of a job with the current code
+    and store the outcome as a new job
+
+    JSON body: {"current_settings": bool} to use the current scanner
+    settings instead of the ones the job ran with
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        replay = replay_job(
+            get_db(), job_id,
+            current_settings=bool(data.get("current_settings")),
+            initiator=get_jwt_identity()
+        )
+    except LookupError as e:
+        return jsonify({"error": str(e)}), 404
+    except Exception as e:
+        logger.exception(f"Replay of {job_id} failed: {e}")
+        return jsonify({"error": str(e)}), 500
+
+    return jsonify({
+        "message": "Scan replayed",
+        "job_id": replay["job_id"],
+        "replay_of": job_id
+    }), 201
+
+
 @config_api.route('/api/scan_history', methods=['GET'])
 @jwt_required()
 def scan_history():
-    mongo = MongoClient(settings.backend.mongo_url)
-    db = mongo.get_default_database()
-    docs = db.scan_jobs.find(
-        {
-            "initiator": get_jwt_identity()
-        },
-        {
-            "_id": 0
-        }
-    ).sort("timestamp", -1)
-    history = list(docs)
-
+    history = ScanRepository().jobs_of(get_jwt_identity())
     return jsonify(history), 200
 
 
@@ -225,9 +247,7 @@ def get_scan(job_id):
     """
     Вернёт мета-данные по скану: статус, targets, инициатор и т.п.
     """
-    mongo = MongoClient(settings.backend.mongo_url)
-    db = mongo.get_default_database()
-    job = db.scan_jobs.find_one({"job_id": job_id}, {"_id": 0})
+    job = ScanRepository().find_job(job_id)
     if not job:
         return jsonify({"error": "Scan not found"}), 404
 
@@ -243,14 +263,20 @@ def get_scan_results(job_id):
     """
     Возвращает все записи из scan_results с этим job_id
     """
-    client = MongoClient(settings.backend.mongo_url)
-    db = client.get_default_database()
-    cursor = db.scan_results.find(
-        {"job_id": job_id},
-        sort=[("timestamp", 1)],  # по времени, от старых к новым
-        projection={"_id": 0}
-    )
-    results = list(cursor)
+    scans = ScanRepository()
+    results = [
+        load_records(scans.db, load_results(scans.db, record))
+        for record in scans.results_of(job_id)
+    ]
+    job = scans.find_job(job_id) if not results else None
+    if job and job.get("status") == "running":
+        # records written so far by the running stages
+        results = [{
+            "job_id": job_id,
+            "status": "running",
+            "partial": True,
+            "results": live_results(scans.db, job_id)
+        }]
     return jsonify(results), 200
 
 
@@ -258,17 +284,7 @@ def get_scan_results(job_id):
 @jwt_required()
 def reports():
     # Берём все jobs из БД (или только завершённые)
-    client = MongoClient(settings.backend.mongo_url)
-    db = client.get_default_database()
-    jobs = db.scan_jobs.find(
-        {},
-        {
-            "_id": 0,
-            "job_id": 1,
-            "timestamp": 1,
-            "status": 1
-        }
-    ).sort("timestamp", -1)
+    jobs = ScanRepository().all_jobs()
     reports = [
         {
           "job_id": job["job_id"],
@@ -287,16 +303,44 @@ def get_scan_report(job_id):
     """
     Returns the full data for report with a given job_id
     """
-    mongo = MongoClient(settings.backend.mongo_url)
-    db = mongo.get_default_database()
-    job = db.scan_results.find_one(
-        {"job_id": job_id},
-        {"_id": 0}
-    )
+    scans = ScanRepository()
+    job = scans.find_result(job_id)
     if not job:
         return jsonify({"error": "Report not found"}), 404
 
-    return jsonify(job)
+    return jsonify(load_records(scans.db, load_results(scans.db, job)))
+
+
+@config_api.route('/api/scan/<job_id>/records/<kind>', methods=['GET'])
+@jwt_required()
+def get_scan_records(job_id, kind):
+    """
+    A page of the hosts, ports, endpoints, directories or findings
+    of a job, also while it is running
+
+    Query parameters: skip, limit (default 100, at most 1000)
+    and the filters of the kind (e.g. severity for findings)
+    """
+    if kind not in RECORD_KINDS:
+        return jsonify({"error": f"Unknown record kind: {kind}"}), 404
+    try:
+        skip = max(int(request.args.get("skip", 0)), 0)
+        limit = min(max(int(request.args.get("limit", 100)), 1), 1000)
+        filters = record_filters(kind, request.args)
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query: {e}"}), 400
+
+    total, records = RecordRepository().query(
+        RECORD_KINDS[kind], job_id, filters, skip, limit
+    )
+    return jsonify({
+        "job_id": job_id,
+        "kind": kind,
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+        "records": records
+    }), 200
 
 
 @config_api.route("/api/scan/stream/<job_id>")
@@ -331,16 +375,12 @@ def get_last_scan():
     """
     Return metadata for the most recent scan of the current user
     """
-    db = MongoClient(settings.backend.mongo_url).get_default_database()
-    user = get_jwt_identity()
-    job = db.scan_jobs.find_one(
-        {"initiator": user},
-        sort=[("timestamp", -1)]
-    )
+    scans = ScanRepository()
+    job = scans.last_job(get_jwt_identity())
     if not job:
         return jsonify({}), 200
 
-    cnt = db.scan_results.count_documents({"job_id": job["job_id"]})
+    cnt = scans.count_results(job["job_id"])
     return jsonify({
         "job_id": job["job_id"],
         "targets": job["targets"],
@@ -356,22 +396,12 @@ def get_stats():
     """
     Return scan statistics for the current user for the last 7 days
     """
-    db = MongoClient(settings.backend.mongo_url).get_default_database()
-    user = get_jwt_identity()
     now = datetime.datetime.now()
     week_ago = now - datetime.timedelta(days=7)
+    jobs = ScanRepository().jobs_since(get_jwt_identity(), week_ago)
 
-    scans_today = db.scan_jobs.count_documents({
-        "initiator": user,
-        "timestamp": {"$gte": week_ago}
-    })
-
-    total_targets = 0
-    for job in db.scan_jobs.find({
-        "initiator": user,
-        "timestamp": {"$gte": week_ago}
-    }, {"targets": 1}):
-        total_targets += len(job.get("targets", []))
+    scans_today = len(jobs)
+    total_targets = sum(len(job.get("targets", [])) for job in jobs)
 
     return jsonify({
         "scans_last_7_days":   scans_today,
@@ -379,6 +409,61 @@ def get_stats():
     }), 200
 
 
+@config_api.route('/api/stats/resources', methods=['GET'])
+@jwt_required()
+def get_resource_stats():
+    """
+    Resource cost of tool runs grouped by tool, tool and mode
+    or tool and target count (power of ten buckets)
+
+    Query parameters: group_by (tool, mode, targets), days (default 30)
+    """
+    group_by = request.args.get("group_by", "tool")
+    keys = {
+        "tool": {"tool": "$tool"},
+        "mode": {"tool": "$tool", "mode": "$mode"},
+        "targets": {
+            "tool": "$tool",
+            "targets": {"$pow": [10, {"$floor": {
+                "$log10": {"$max": ["$targets", 1]}
+            }}]}
+        },
+    }
+    if group_by not in keys:
+        return jsonify({"error": f"Invalid group_by: {group_by}"}), 400
+    try:
+        days = int(request.args.get("days", 30))
+    except ValueError:
+        return jsonify({"error": "Invalid days"}), 400
+
+    since = datetime.datetime.now() - datetime.timedelta(days=days)
+    rows = get_db().stage_resources.aggregate([
+        {"$match": {"timestamp": {"$gte": since}}},
+        {"$group": {
+            "_id": keys[group_by],
+            "runs": {"$sum": 1},
+            "processes": {"$sum": "$processes"},
+            "targets": {"$sum": "$targets"},
+            "cpu": {"$sum": {"$add": ["$user_cpu", "$sys_cpu"]}},
+            "avg_cpu": {"$avg": {"$add": ["$user_cpu", "$sys_cpu"]}},
+            "avg_wall_time": {"$avg": "$wall_time"},
+            "max_wall_time": {"$max": "$wall_time"},
+            "avg_max_rss_kb": {"$avg": "$max_rss_kb"},
+            "max_rss_kb": {"$max": "$max_rss_kb"},
+            "block_in": {"$sum": "$block_in"},
+            "block_out": {"$sum": "$block_out"},
+        }},
+        {"$sort": {"cpu": -1}},
+    ])
+    stats = []
+    for row in rows:
+        group = row.pop("_id")
+        row["cpu_per_target"] = row["cpu"] / row["targets"]\
+            if row["targets"] else None
+        stats.append({**group, **row})
+    return jsonify({"group_by": group_by, "days": days, "stats": stats}), 200
+
+
 @config_api.route('/api/check_modules', methods=['GET'])
 @jwt_required()
 def check_modules():
@@ -433,7 +518,26 @@ def update_nuclei():
 def update_templates():
     try:
         module = module_manager.get_module("nuclei")  # NucleiModule
-        module.update_templates()
+        module.update_templates(
+            settings.scanners.nuclei.get("templates_dir") or ""
+        )
         return jsonify({"message": "Templates updated"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@config_api.route('/api/templates', methods=['GET'])
+@jwt_required()
+def templates_summary():
+    """
+    Template counts by severity and protocol from the template index
+    """
+    try:
+        module = module_manager.get_module("nuclei")  # NucleiModule
+        index = module.template_index(
+            settings.scanners.nuclei.get("templates_dir") or ""
+        )
+        return jsonify(index.summary()), 200
+    except Exception as e:
+        logger.exception(f"Error reading template index: {e}")
+        return jsonify({"error": str(e)}), 500
@@ -60,12 +60,30 @@ class BaseApp(object):
 class BackendBountyForge(BaseApp):
     celery_broker_url: str = "redis://redis:6379/0"
     mongo_url: str = "mongodb://mongo:27017"
+    mongo_pool_size: int = 50  # connections of a process
     frontend_host: str = "localhost"
     threads: int = 1
-    timeout: int = 120
+    timeout: int = 600  # seconds a tool may run without any output
     rate_limit: int = 20
     project_version: str = "0.2.1"
     abort_on_error: bool = False
+    progress_interval: float = 2.0  # seconds between progress events
+    retries: int = 2  # retries of a failed tool invocation
+    retry_backoff: float = 2.0  # seconds before the first retry, doubled
+    retry_budget: int = 20  # retries of a whole job
+    # directory for stage outputs of running jobs, empty keeps them
+    # in memory
+    spill_dir: str = "/tmp/bountyforge-spill"
+    # bytes of tool stdout kept in memory before spooling to a file
+    spool_threshold: int = 64 * 1024 * 1024
+    stderr_limit: int = 64 * 1024  # last characters of tool stderr kept
+    write_batch: int = 500  # records per bulk write during a scan
+    write_interval: float = 5.0  # seconds records wait for a bulk write
+    # recon stages connected by bounded queues instead of one by one
+    streaming: bool = False
+    stream_batch: int = 50  # targets per micro-batch of a stage
+    stream_linger: float = 5.0  # seconds to wait for a fuller batch
+    stream_queue: int = 500  # capacity of a queue between stages
 
     def __post_init__(self):
         super().__post_init__()
@@ -85,6 +103,45 @@ class BackendBountyForge(BaseApp):
         if isinstance(self.rate_limit, str):
             self.rate_limit = int(self.rate_limit)
 
+        if isinstance(self.mongo_pool_size, str):
+            self.mongo_pool_size = int(self.mongo_pool_size)
+
+        if isinstance(self.progress_interval, str):
+            self.progress_interval = float(self.progress_interval)
+
+        if isinstance(self.retries, str):
+            self.retries = int(self.retries)
+
+        if isinstance(self.retry_backoff, str):
+            self.retry_backoff = float(self.retry_backoff)
+
+        if isinstance(self.retry_budget, str):
+            self.retry_budget = int(self.retry_budget)
+
+        if isinstance(self.spool_threshold, str):
+            self.spool_threshold = int(self.spool_threshold)
+
+        if isinstance(self.stderr_limit, str):
+            self.stderr_limit = int(self.stderr_limit)
+
+        if isinstance(self.write_batch, str):
+            self.write_batch = int(self.write_batch)
+
+        if isinstance(self.write_interval, str):
+            self.write_interval = float(self.write_interval)
+
+        if isinstance(self.streaming, str):
+            self.streaming = self.streaming.lower() in ("1", "true", "yes")
+
+        if isinstance(self.stream_batch, str):
+            self.stream_batch = int(self.stream_batch)
+
+        if isinstance(self.stream_linger, str):
+            self.stream_linger = float(self.stream_linger)
+
+        if isinstance(self.stream_queue, str):
+            self.stream_queue = int(self.stream_queue)
+
 
 @dataclass
 class FrontendBountyForge(BaseApp):
@@ -105,25 +162,66 @@ class ScannerSettings(object):
     """
     available_wordlists: Dict[str, List[str]] = field(default_factory=dict)
 
+    dns: Dict[str, Any] = field(default_factory=lambda: {
+        "enabled": True,
+        "nameservers": [],  # system resolvers if empty
+        "port": 53,
+        "concurrency": 100,
+        "timeout": 3,
+        "negative_ttl": 300,  # seconds NXDOMAIN answers are cached
+        "max_ttl": 3600,
+    })
     nmap: Dict[str, Any] = field(default_factory=lambda: {
         "mode": "default",  # Options: "default", "aggressive", "full"
-        "additional_flags": []
+        "additional_flags": [],
+        "skip_cdn": True,  # skip CDN edges in "aggressive" and "full" modes
+        "cdn_ranges": None,  # provider -> CIDR list, None uses built-in
+        # open-port sweep first, then -sV on open ports; always on while
+        # fingerprint_ttl > 0 so cached ports skip -sV
+        "two_phase": False,
+        # Options: "nmap", "connect"; both sweep nmap's top 1000 ports
+        # (all in "full" mode) or the ports selected by -p, --top-ports,
+        # -F or --exclude-ports in additional_flags
+        "discovery": "nmap",
+        "discovery_rate": 5000,  # --min-rate of the sweep
+        "workers": 4,  # hosts processed in parallel
+        "batch_size": 1,  # hosts per nmap invocation in single-phase mode
+        "fingerprint_ttl": 604800,  # seconds a -sV result is reused, 0 off
+        "time_budget": 0,  # wall-clock seconds for the stage, 0 for none
     })
     subfinder: Dict[str, Any] = field(default_factory=lambda: {
-        "additional_flags": []
+        "additional_flags": [],
+        "batch_size": 1,  # domains per subfinder invocation
+        "time_budget": 0,
     })
     ffuf: Dict[str, Any] = field(default_factory=lambda: {
         "dns_wordlist": "dns/subdomains-top1million-5000.txt",
         "directories_wordlist": "web-content/common.txt",
         "additional_flags": [],
+        "recursion_depth": 2,  # 0 disables recursion
+        "host_request_budget": 50000,  # 0 means unlimited
+        "job_request_budget": 500000,  # 0 means unlimited
+        "time_budget": 0,
     })
     httpx: Dict[str, Any] = field(default_factory=lambda: {
         "mode": "recon",   # Options: "recon", "live"
-        "additional_flags": []
+        "additional_flags": [],
+        "cache_fresh_ttl": 900,  # seconds a probe result is reused
+        "cache_max_age": 21600,  # seconds a stale result is kept
+        "batch_size": 50,  # URLs per httpx invocation
+        "time_budget": 0,
     })
     nuclei: Dict[str, Any] = field(default_factory=lambda: {
         "mode": "full",   # Options: "full", "fast"
-        "additional_flags": []
+        "additional_flags": [],
+        "cluster_representatives": 1,  # URLs scanned per cluster, 0 disables
+        "tech_routing": True,  # skip templates of undetected technologies
+        "tech_tags": None,  # technology -> tags, None uses built-in
+        "shards": 1,  # parallel nuclei processes splitting the templates
+        "severity_tiers": True,  # critical/high first, then medium, low
+        "stop_after_tier": None,  # "critical", "medium" or None for all
+        "incremental": False,  # rescan only changed URLs and templates
+        "time_budget": 0,
     })
 
     def __post_init__(self):
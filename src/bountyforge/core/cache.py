@@ -0,0 +1,74 @@
+"""
+Small JSON cache on top of Redis shared between workers
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class RedisCache:
+    """
+    Namespaced JSON values with per-key TTL
+
+    Cache errors are logged and treated as misses, a broken cache
+    must never fail a scan
+    """
+
+    def __init__(self, client, namespace: str) -> None:
+        """
+        :param client: redis.Redis instance (or None to disable caching)
+        :param namespace: key prefix, e.g. "dns"
+        """
+        self.client = client
+        self.namespace = namespace
+
+    def _key(self, key: str) -> str:
+        return f"{self.namespace}:{key}"
+
+    def get(self, key: str) -> Optional[Any]:
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Fetch several keys with a single round trip
+
+        :return: mapping key -> value for cache hits only
+        """
+        keys = list(keys)
+        if self.client is None or not keys:
+            return {}
+        try:
+            values = self.client.mget([self._key(k) for k in keys])
+        except Exception as e:
+            logger.warning(f"[RedisCache] {self.namespace} read failed: {e}")
+            return {}
+
+        hits = {}
+        for key, value in zip(keys, values):
+            if value is None:
+                continue
+            try:
+                hits[key] = json.loads(value)
+            except (TypeError, ValueError):
+                continue
+        return hits
+
+    def set(self, key: str, value: Any, ttl: int) -> None:
+        self.set_many({key: value}, ttl)
+
+    def set_many(self, items: Dict[str, Any], ttl: int) -> None:
+        """
+        Store several values with the same TTL (seconds)
+        """
+        if self.client is None or not items or ttl <= 0:
+            return
+        try:
+            pipe = self.client.pipeline(transaction=False)
+            for key, value in items.items():
+                pipe.set(self._key(key), json.dumps(value), ex=int(ttl))
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f"[RedisCache] {self.namespace} write failed: {e}")
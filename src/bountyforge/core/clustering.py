@@ -0,0 +1,142 @@
+"""
+Response-fingerprint clustering of live URLs
+
+Large scopes contain many hosts serving the same default or parking
+page. URLs from httpx are grouped by body hash, title and technology
+fingerprint; nuclei scans only a few representatives per cluster and
+its findings are attributed back to every member
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Tuple
+
+from bountyforge.core.probe_cache import response_hash, url_is_under
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Cluster:
+    """
+    URLs serving the same response
+    """
+    key: Tuple
+    members: List[str] = field(default_factory=list)
+    representatives: List[str] = field(default_factory=list)
+
+    @property
+    def followers(self) -> List[str]:
+        """
+        Members that are not scanned themselves
+        """
+        return [m for m in self.members if m not in self.representatives]
+
+
+def response_fingerprint(record: Dict[str, Any]) -> Tuple:
+    """
+    Clustering key of an httpx record
+
+    Records without a body hash (e.g. "live" mode) are never clustered
+    """
+    body_hash = response_hash(record)
+    if not body_hash:
+        return ("url", record.get("url"))
+    return (
+        body_hash,
+        (record.get("title") or "").strip().lower(),
+        tuple(sorted(t.lower() for t in record.get("tech") or [])),
+        record.get("status_code") or record.get("status"),
+    )
+
+
+def cluster_responses(
+    records: Iterable[Dict[str, Any]],
+    representatives: int = 1
+) -> List[Cluster]:
+    """
+    Group httpx records by response fingerprint
+
+    :param records: parsed httpx records with "url"
+    :param representatives: members per cluster that get scanned
+    :return: clusters in order of first appearance
+    """
+    clusters: Dict[Tuple, Cluster] = {}
+    for record in records:
+        url = record.get("url")
+        if not url:
+            continue
+        key = response_fingerprint(record)
+        cluster = clusters.setdefault(key, Cluster(key))
+        if url not in cluster.members:
+            cluster.members.append(url)
+
+    for cluster in clusters.values():
+        # shortest URLs first: bare hosts are better representatives
+        ranked = sorted(cluster.members, key=lambda u: (len(u), u))
+        cluster.representatives = ranked[:max(representatives, 1)]
+
+    result = list(clusters.values())
+    followers = sum(len(c.followers) for c in result)
+    logger.info(
+        f"Clustered {sum(len(c.members) for c in result)} URLs into "
+        f"{len(result)} clusters, {followers} URLs skipped for scanning"
+    )
+    return result
+
+
+def _rebase(value: str, old: str, new: str) -> str:
+    if isinstance(value, str) and url_is_under(value, old):
+        return new + value[len(old):]
+    return value
+
+
+def attribute_findings(
+    findings: List[Dict[str, Any]],
+    clusters: List[Cluster]
+) -> List[Dict[str, Any]]:
+    """
+    Copy findings of representatives to the other cluster members
+
+    :param findings: parsed nuclei records
+    :param clusters: clusters used to pick nuclei targets
+    :return: original findings plus one copy per follower,
+        copies are marked with "attributed_from"; a template reported
+        by several representatives is attributed from the first one
+    """
+    by_representative: Dict[str, List[str]] = defaultdict(list)
+    for cluster in clusters:
+        if not cluster.followers:
+            continue
+        for rep in cluster.representatives:
+            by_representative[rep.rstrip("/")] = cluster.followers
+
+    if not by_representative:
+        return findings
+
+    result = list(findings)
+    # (template-id, follower) -> representative the copies come from
+    sources: Dict[Tuple[Any, str], str] = {}
+    for finding in findings:
+        matched = finding.get("matched-at") or finding.get("host") or ""
+        for rep, followers in by_representative.items():
+            if not url_is_under(matched, rep):
+                continue
+            for member in followers:
+                member = member.rstrip("/")
+                source = sources.setdefault(
+                    (finding.get("template-id"), member), rep
+                )
+                if source != rep:
+                    continue
+                result.append({
+                    **finding,
+                    "host": _rebase(finding.get("host"), rep, member),
+                    "matched-at": _rebase(
+                        finding.get("matched-at"), rep, member
+                    ),
+                    "attributed_from": rep
+                })
+            break
+    return result
@@ -0,0 +1,404 @@
+"""
+Execution layer for tool processes
+
+ProcessRunner starts a tool with Popen, pumps stdout and stderr in
+reader threads and watches the process: it is killed when it produces
+no output for the idle window (stalled) or runs past its wall-clock
+limit. Output read until then is kept and the result is marked as
+truncated. Every line can also be handed to a callback as it arrives,
+e.g. to parse progress statistics; the callback also tells whether the
+line counts as output at all, so the statistics a hung tool keeps
+printing do not hold off the stall kill.
+
+The process is reaped with os.wait4, so every result carries the
+resource usage of the tool (CPU time, peak RSS, block I/O).
+
+Verbose tools can be captured without holding their whole output in
+memory: stdout is spooled to a temporary file once it passes a size
+threshold (SpooledOutput, read back through mmap) and stderr can be
+limited to its last bytes (TailBuffer)
+"""
+
+import codecs
+import collections
+import logging
+import mmap
+import os
+import subprocess
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import IO, Any, Callable, Dict, Iterator, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+STALLED = "stalled"
+TIMEOUT = "timeout"
+
+
+class SpooledOutput:
+    """
+    Tool output kept in memory up to a threshold, then in a
+    temporary file
+
+    Parsers iterate it with splitlines() like a string; once spooled,
+    the lines are read from an mmap of the file instead of a string
+    copy of the whole output
+    """
+
+    def __init__(self, threshold: int) -> None:
+        """
+        :param threshold: bytes kept in memory before spooling to disk
+        """
+        self.threshold = threshold
+        self.size = 0
+        self._lines: List[str] = []
+        self._file: Optional[IO[bytes]] = None
+
+    @property
+    def spooled(self) -> bool:
+        return self._file is not None
+
+    def write(self, text: str) -> None:
+        data = text.encode("utf-8", errors="replace")
+        self.size += len(data)
+        if self._file is not None:
+            self._file.write(data)
+            return
+        self._lines.append(text)
+        if self.size > self.threshold:
+            self._file = tempfile.TemporaryFile(prefix="bountyforge-")
+            for line in self._lines:
+                self._file.write(line.encode("utf-8", errors="replace"))
+            self._lines = []
+
+    def mmap(self) -> Optional[mmap.mmap]:
+        """
+        Read-only map of the spooled file, None while in memory
+        """
+        if self._file is None or not self.size:
+            return None
+        self._file.flush()
+        return mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def splitlines(self) -> Iterator[str]:
+        if self._file is None:
+            yield from "".join(self._lines).splitlines()
+            return
+        mapped = self.mmap()
+        if mapped is None:
+            return
+        with mapped:
+            for line in iter(mapped.readline, b""):
+                yield line.decode("utf-8", errors="replace").rstrip("\r\n")
+
+    def chunks(self, size: int = 1 << 20) -> Iterator[str]:
+        """
+        The output in pieces of about `size` bytes
+        """
+        if self._file is None:
+            text = "".join(self._lines)
+            for i in range(0, len(text), size):
+                yield text[i:i + size]
+            return
+        mapped = self.mmap()
+        if mapped is None:
+            return
+        with mapped:
+            decoder = codecs.getincrementaldecoder("utf-8")("replace")
+            for i in range(0, len(mapped), size):
+                yield decoder.decode(mapped[i:i + size])
+            tail = decoder.decode(b"", final=True)
+            if tail:
+                yield tail
+
+    def getvalue(self) -> str:
+        """
+        The whole output as a string
+        """
+        return "".join(self.chunks())
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._lines = []
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __bool__(self) -> bool:
+        return self.size > 0
+
+    def __str__(self) -> str:
+        return self.getvalue()
+
+    def __repr__(self) -> str:
+        return f"<SpooledOutput {self.size} bytes>"
+
+
+Output = Union[str, SpooledOutput]
+
+
+def join_outputs(outputs: List[Output], threshold: int = 0) -> Output:
+    """
+    Join outputs of several processes with newlines, spooled ones
+    are copied into a new spool instead of a string
+
+    :param outputs: outputs to join, spooled ones are closed
+    :param threshold: memory threshold of the joined spool
+    """
+    outputs = [o for o in outputs if o]
+    if not any(isinstance(o, SpooledOutput) for o in outputs):
+        return "\n".join(outputs)
+    joined = SpooledOutput(threshold)
+    for i, output in enumerate(outputs):
+        if i:
+            joined.write("\n")
+        if isinstance(output, SpooledOutput):
+            for chunk in output.chunks():
+                joined.write(chunk)
+            output.close()
+        else:
+            joined.write(output)
+    return joined
+
+
+class TailBuffer:
+    """
+    Keeps only the last `limit` characters written to it
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.dropped = 0
+        self._parts: collections.deque = collections.deque()
+        self._size = 0
+
+    def write(self, text: str) -> None:
+        self._parts.append(text)
+        self._size += len(text)
+        # whole lines are dropped while the rest still fills the limit
+        while self._size - len(self._parts[0]) >= self.limit:
+            self._size -= len(self._parts[0])
+            self.dropped += len(self._parts.popleft())
+
+    def getvalue(self) -> str:
+        text = "".join(self._parts)
+        dropped = self.dropped + max(len(text) - self.limit, 0)
+        if not dropped:
+            return text
+        return f"[{dropped} characters dropped]\n{text[-self.limit:]}"
+
+
+class _Lines(list):
+    """
+    Unbounded capture of a stream
+    """
+    write = list.append
+
+    def getvalue(self) -> str:
+        return "".join(self)
+
+
+@dataclass
+class ProcessResult:
+    """
+    Outcome of a tool process, stdout is a SpooledOutput if it was
+    spooled to disk
+    """
+    returncode: int
+    stdout: Output
+    stderr: str
+    wall_time: float
+    truncated: bool = False
+    reason: Optional[str] = None
+    rusage: Dict[str, Any] = field(default_factory=dict)
+
+
+def rusage_dict(usage, wall_time: float) -> Dict[str, Any]:
+    """
+    Resource usage of a reaped process (ru_maxrss is in KiB on Linux)
+    """
+    return {
+        "user_cpu": usage.ru_utime,
+        "sys_cpu": usage.ru_stime,
+        "max_rss_kb": usage.ru_maxrss,
+        "block_in": usage.ru_inblock,
+        "block_out": usage.ru_oublock,
+        "wall_time": wall_time,
+    }
+
+
+class ProcessRunner:
+    """
+    Runs a command under a stall and wall-clock watchdog
+    """
+    poll_interval: float = 1.0
+    kill_grace: float = 5.0
+
+    def __init__(
+        self,
+        command: List[str],
+        timeout: Optional[float] = None,
+        idle_timeout: Optional[float] = None,
+        on_line: Optional[Callable[[str, str], Optional[bool]]] = None,
+        spool_threshold: Optional[int] = None,
+        stderr_limit: Optional[int] = None
+    ) -> None:
+        """
+        :param command: command arguments
+        :param timeout: wall-clock limit in seconds, None for no limit
+        :param idle_timeout: seconds without any output after which
+            the process counts as stalled, None disables the check
+        :param on_line: called with the stream name ("stdout" or
+            "stderr") and every line read from it, a line it returns
+            False for (e.g. unchanged statistics) is not counted as
+            output for the idle window
+        :param spool_threshold: bytes of stdout kept in memory before
+            it is spooled to a temporary file, None keeps all of it
+        :param stderr_limit: characters of stderr kept (the last ones),
+            None keeps all of it
+        """
+        self.command = command
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.on_line = on_line
+        self.spool_threshold = spool_threshold
+        self.stderr_limit = stderr_limit
+        self.last_activity = time.monotonic()
+
+    def _pump(
+        self,
+        name: str,
+        stream: IO[str],
+        sink: Callable[[str], None]
+    ) -> None:
+        for line in iter(stream.readline, ""):
+            sink(line)
+            active = True
+            if self.on_line is not None:
+                try:
+                    active = self.on_line(name, line) is not False
+                except Exception as e:
+                    logger.debug(
+                        f"[ProcessRunner] Line callback failed: {e}"
+                    )
+            if active:
+                self.last_activity = time.monotonic()
+        stream.close()
+
+    def _check(self, started: float) -> Optional[str]:
+        now = time.monotonic()
+        if self.timeout and now - started > self.timeout:
+            return TIMEOUT
+        if self.idle_timeout and now - self.last_activity > self.idle_timeout:
+            return STALLED
+        return None
+
+    def _reap(self, process: subprocess.Popen, block: bool = False):
+        """
+        Reap the process with wait4 instead of Popen.wait
+
+        :return: rusage of the process or None if it is still running
+        """
+        pid, status, usage = os.wait4(process.pid, 0 if block else os.WNOHANG)
+        if not pid:
+            return None
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return usage
+
+    def _wait(self, process: subprocess.Popen, timeout: float):
+        """
+        Wait up to timeout seconds for the process to exit
+
+        :return: rusage of the process or None if it is still running
+        """
+        deadline = time.monotonic() + timeout
+        delay = 0.005
+        while True:
+            usage = self._reap(process)
+            if usage is not None:
+                return usage
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.poll_interval)
+
+    def _kill(self, process: subprocess.Popen):
+        process.terminate()
+        usage = self._wait(process, self.kill_grace)
+        if usage is None:
+            process.kill()
+            usage = self._reap(process, block=True)
+        return usage
+
+    def run(self) -> ProcessResult:
+        """
+        Run the command to completion or until the watchdog fires
+        """
+        started = self.last_activity = time.monotonic()
+        process = subprocess.Popen(
+            self.command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            errors="replace"
+        )
+        stdout = SpooledOutput(self.spool_threshold)\
+            if self.spool_threshold is not None else _Lines()
+        stderr = TailBuffer(self.stderr_limit)\
+            if self.stderr_limit is not None else _Lines()
+        readers = [
+            threading.Thread(
+                target=self._pump,
+                args=("stdout", process.stdout, stdout.write),
+                daemon=True
+            ),
+            threading.Thread(
+                target=self._pump,
+                args=("stderr", process.stderr, stderr.write),
+                daemon=True
+            ),
+        ]
+        for reader in readers:
+            reader.start()
+
+        reason = None
+        while True:
+            usage = self._wait(process, self.poll_interval)
+            if usage is not None:
+                break
+            reason = self._check(started)
+            if reason:
+                logger.warning(
+                    f"[ProcessRunner] Killing {self.command[0]} "
+                    f"({reason}) after "
+                    f"{time.monotonic() - started:.0f}s"
+                )
+                usage = self._kill(process)
+                break
+        wall_time = time.monotonic() - started
+
+        for reader in readers:
+            # children of a killed tool may still hold the pipes open
+            reader.join(self.kill_grace if reason else None)
+        if isinstance(stdout, SpooledOutput) and stdout.spooled:
+            logger.info(
+                f"[ProcessRunner] {self.command[0]} wrote {stdout.size} "
+                f"bytes, spooled to disk"
+            )
+        else:
+            stdout = stdout.getvalue()
+        return ProcessResult(
+            returncode=process.returncode,
+            stdout=stdout,
+            stderr=stderr.getvalue(),
+            wall_time=wall_time,
+            truncated=reason is not None,
+            reason=reason,
+            rusage=rusage_dict(usage, wall_time)
+        )
@@ -0,0 +1,92 @@
+"""
+Helpers for nuclei findings
+"""
+
+import logging
+from typing import Any, Dict, Iterable, List, Tuple
+
+from bountyforge.core.hostmap import normalize_host
+
+logger = logging.getLogger(__name__)
+
+
+def finding_key(record: Dict[str, Any]) -> Tuple:
+    """
+    Identity of a single nuclei match
+    """
+    return (
+        record.get("template-id"),
+        record.get("matched-at"),
+        record.get("matcher-name"),
+    )
+
+
+def dedupe_findings(
+    records: Iterable[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Drop repeated matches, e.g. from shards with overlapping templates
+
+    :param records: parsed nuclei JSONL records
+    :return: first record of every (template-id, matched-at, matcher-name)
+    """
+    seen = set()
+    result = []
+    for record in records:
+        key = finding_key(record)
+        if key in seen:
+            continue
+        seen.add(key)
+        result.append(record)
+    return result
+
+
+def aggregate_key(record: Dict[str, Any]) -> Tuple:
+    """
+    Identity of an issue regardless of port, path or URL variant
+
+    (template-id, host name, matcher-name, extracted values)
+    """
+    location = record.get("matched-at") or record.get("host") or ""
+    host = normalize_host(str(location)).lower() if location else ""
+    extracted = record.get("extracted-results") or []
+    return (
+        record.get("template-id"),
+        host,
+        record.get("matcher-name"),
+        tuple(sorted(str(value) for value in extracted)),
+    )
+
+
+def aggregate_findings(
+    records: Iterable[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Collapse findings of the same issue reported on several locations
+
+    :param records: parsed nuclei records
+    :return: one record per aggregate_key (the first one seen) with
+        "occurrences" and the sorted list of affected "locations"
+    """
+    groups: Dict[Tuple, Dict[str, Any]] = {}
+    locations: Dict[Tuple, set] = {}
+    total = 0
+    for record in records:
+        total += 1
+        key = aggregate_key(record)
+        if key not in groups:
+            groups[key] = dict(record)
+            groups[key]["occurrences"] = 0
+            locations[key] = set()
+        groups[key]["occurrences"] += record.get("occurrences", 1)
+        locations[key].update(
+            record.get("locations")
+            or [record.get("matched-at") or record.get("host")]
+        )
+
+    result = []
+    for key, record in groups.items():
+        record["locations"] = sorted(filter(None, locations[key]))
+        result.append(record)
+    logger.info(f"Aggregated {total} findings into {len(result)}")
+    return result
@@ -0,0 +1,126 @@
+"""
+Persistent service fingerprint cache for nmap results
+
+Service probing (-sV and scripts) is the most expensive part of a port
+scan, while the same infrastructure is scanned again and again. The
+cache keeps the last fingerprint of every (ip, port) so the version
+pass can be limited to ports that are new or whose fingerprint is stale.
+
+Fingerprints are kept per scan profile, the flags of the version pass:
+a plain -sV result has no script or OS output and must not stand in for
+an -A run
+"""
+
+import datetime
+import logging
+from typing import Any, Dict, Iterable, List
+
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# Fields of a parsed nmap entry that make up the fingerprint
+FINGERPRINT_FIELDS = ("state", "service", "info", "scripts")
+
+
+class FingerprintCache:
+    """
+    (ip, port, profile) -> service/version/script output stored in
+    MongoDB
+    """
+
+    def __init__(self, collection, max_age: int = 7 * 24 * 3600) -> None:
+        """
+        :param collection: pymongo collection for fingerprints
+        :param max_age: freshness window in seconds, 0 disables lookups
+        """
+        self.collection = collection
+        self.max_age = max_age
+        self._indexed = False
+
+    def _ensure_index(self) -> None:
+        if self._indexed:
+            return
+        try:
+            # fingerprints used to be unique per (ip, port)
+            self.collection.drop_index("ip_1_port_1")
+        except OperationFailure:
+            pass
+        self.collection.create_index(
+            [("ip", ASCENDING), ("port", ASCENDING), ("profile", ASCENDING)],
+            unique=True
+        )
+        self._indexed = True
+
+    def lookup(
+        self,
+        ip: str,
+        ports: Iterable[int],
+        state: str = "open",
+        profile: str = ""
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Fresh fingerprints of the given ports seen with the same state
+
+        :param ip: scanned address
+        :param ports: port numbers found by the discovery pass
+        :param state: state reported by the discovery pass
+        :param profile: scan profile the fingerprints must come from
+        :return: port number -> cached parsed entry
+        """
+        if self.max_age <= 0:
+            return {}
+        ports = [f"{port}/tcp" for port in ports]
+        if not ports:
+            return {}
+        fresh_since = datetime.datetime.now() - datetime.timedelta(
+            seconds=self.max_age
+        )
+        try:
+            docs = self.collection.find(
+                {
+                    "ip": ip,
+                    "port": {"$in": ports},
+                    "state": state,
+                    "profile": profile,
+                    "seen_at": {"$gte": fresh_since}
+                },
+                {"_id": 0, "profile": 0}
+            )
+            return {int(doc["port"].split("/")[0]): doc for doc in docs}
+        except Exception as e:
+            logger.warning(f"[FingerprintCache] Lookup failed for {ip}: {e}")
+            return {}
+
+    def store(
+        self,
+        entries: List[Dict[str, Any]],
+        profile: str = ""
+    ) -> None:
+        """
+        Upsert fingerprints of freshly scanned entries
+
+        :param profile: scan profile the entries were scanned with
+        """
+        now = datetime.datetime.now()
+        ops = []
+        for entry in entries:
+            ip = entry.get("ip") or entry.get("host")
+            if not ip or not entry.get("port"):
+                continue
+            doc = {
+                key: entry[key] for key in FINGERPRINT_FIELDS if key in entry
+            }
+            ops.append(UpdateOne(
+                {"ip": ip, "port": entry["port"], "profile": profile},
+                {"$set": {**doc, "seen_at": now}},
+                upsert=True
+            ))
+        if not ops:
+            return
+        try:
+            self._ensure_index()
+            self.collection.bulk_write(ops, ordered=False)
+        except Exception as e:
+            logger.warning(f"[FingerprintCache] Store failed: {e}")
@@ -0,0 +1,267 @@
+"""
+Resolution-aware host grouping for port scanning
+
+Subdomains found by subfinder often point to the same few CDN or load
+balancer addresses. HostMap groups targets by resolved IP so every
+address is port-scanned once, then fans the port results back out to
+every hostname that resolves to it
+"""
+
+import ipaddress
+import logging
+import socket
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Well-known CDN / WAF address ranges, provider -> networks
+CDN_RANGES: Dict[str, List[str]] = {
+    "cloudflare": [
+        "173.245.48.0/20", "103.21.244.0/22", "103.22.200.0/22",
+        "103.31.4.0/22", "141.101.64.0/18", "108.162.192.0/18",
+        "190.93.240.0/20", "188.114.96.0/20", "197.234.240.0/22",
+        "198.41.128.0/17", "162.158.0.0/15", "104.16.0.0/13",
+        "104.24.0.0/14", "172.64.0.0/13", "131.0.72.0/22",
+    ],
+    "fastly": [
+        "23.235.32.0/20", "43.249.72.0/22", "103.244.50.0/24",
+        "103.245.222.0/23", "103.245.224.0/24", "104.156.80.0/20",
+        "140.248.64.0/18", "140.248.128.0/17", "146.75.0.0/17",
+        "151.101.0.0/16", "157.52.64.0/18", "167.82.0.0/17",
+        "172.111.64.0/18", "185.31.16.0/22", "199.27.72.0/21",
+        "199.232.0.0/16",
+    ],
+    "cloudfront": [
+        "13.32.0.0/15", "13.224.0.0/14", "13.249.0.0/16", "18.64.0.0/14",
+        "52.84.0.0/15", "54.182.0.0/16", "54.192.0.0/16", "54.230.0.0/16",
+        "54.239.128.0/18", "99.84.0.0/16", "143.204.0.0/16",
+        "204.246.164.0/22", "205.251.192.0/19",
+    ],
+    "akamai": [
+        "2.16.0.0/13", "23.32.0.0/11", "23.192.0.0/11", "104.64.0.0/10",
+        "184.24.0.0/13",
+    ],
+    "incapsula": [
+        "199.83.128.0/21", "198.143.32.0/19", "149.126.72.0/21",
+        "103.28.248.0/22", "45.64.64.0/22", "185.11.124.0/22",
+        "192.230.64.0/18", "107.154.0.0/16", "45.60.0.0/16",
+        "45.223.0.0/16",
+    ],
+}
+
+# Ports assumed to be open on CDN edges that were not port-scanned
+CDN_PORTS = [("80/tcp", "http"), ("443/tcp", "https")]
+
+
+def normalize_host(target: str) -> str:
+    """
+    Strip scheme, path and port from a target, leaving the host name
+    """
+    target = target.strip()
+    parsed = urlparse(target if "://" in target else f"//{target}")
+    return parsed.hostname or target
+
+
+def is_ip(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+
+class HostMap:
+    """
+    Bidirectional mapping between hostnames and resolved addresses
+    """
+
+    def __init__(
+        self,
+        cdn_ranges: Optional[Dict[str, List[str]]] = None
+    ) -> None:
+        self._ips: Dict[str, List[str]] = {}
+        self._hosts: Dict[str, List[str]] = defaultdict(list)
+        self.unresolved: List[str] = []
+        self._cdn_networks = [
+            (provider, ipaddress.ip_network(net))
+            for provider, nets in (cdn_ranges or CDN_RANGES).items()
+            for net in nets
+        ]
+
+    def add(self, host: str, ips: Iterable[str]) -> None:
+        """
+        Register addresses of a host, hosts without addresses
+        are kept as unresolved and scanned by name
+
+        Only the primary address (lowest IPv4 first) is scanned,
+        so round-robin records of the same pool collapse to one target
+        """
+        ips = list(dict.fromkeys(ips))
+        if not ips:
+            if host not in self.unresolved:
+                self.unresolved.append(host)
+            return
+        self._ips[host] = ips
+        # numeric order, IPv4 before IPv6 ("10.0.0.9" < "10.0.0.10")
+        primary = min(
+            ips,
+            key=lambda ip: ipaddress.get_mixed_type_key(
+                ipaddress.ip_address(ip)
+            )
+        )
+        if host not in self._hosts[primary]:
+            self._hosts[primary].append(host)
+
+    @classmethod
+    def from_dict(
+        cls,
+        mapping: Dict[str, List[str]],
+        unresolved: Optional[List[str]] = None,
+        cdn_ranges: Optional[Dict[str, List[str]]] = None
+    ) -> "HostMap":
+        """
+        Rebuild a host map from its stored form (see as_dict)
+        """
+        hostmap = cls(cdn_ranges)
+        for host, ips in mapping.items():
+            hostmap.add(host, ips)
+        for host in unresolved or []:
+            hostmap.add(host, [])
+        return hostmap
+
+    @property
+    def hosts(self) -> List[str]:
+        return list(self._ips)
+
+    @property
+    def ips(self) -> List[str]:
+        return list(self._hosts)
+
+    def ips_for(self, host: str) -> List[str]:
+        return self._ips.get(host, [])
+
+    def hosts_for(self, ip: str) -> List[str]:
+        return self._hosts.get(ip, [])
+
+    def as_dict(self) -> Dict[str, List[str]]:
+        """
+        host -> addresses mapping for later stages and storage
+        """
+        return dict(self._ips)
+
+    def cdn_provider(self, ip: str) -> Optional[str]:
+        """
+        Name of the CDN the address belongs to, None if not a CDN edge
+        """
+        try:
+            addr = ipaddress.ip_address(ip)
+        except ValueError:
+            return None
+        for provider, network in self._cdn_networks:
+            if addr.version == network.version and addr in network:
+                return provider
+        return None
+
+    def scan_targets(self, skip_cdn: bool = False) -> List[str]:
+        """
+        Unique targets to port-scan: one per address plus
+        hosts that could not be resolved
+
+        :param skip_cdn: leave out addresses of CDN edges
+        """
+        targets = [
+            ip for ip in self._hosts
+            if not (skip_cdn and self.cdn_provider(ip))
+        ]
+        return targets + self.unresolved
+
+    def fan_out(
+        self,
+        entries: Iterable[Dict[str, Any]],
+        skipped_cdn: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        Copy per-address port results to every hostname of the address
+
+        :param entries: parsed nmap records keyed by "ip"
+        :param skipped_cdn: add assumed web ports for CDN edges
+            that were left out of the scan, these entries are not scan
+            results and carry "assumed" and "synthesized" flags
+        :return: parsed records with one entry per hostname
+        """
+        results: List[Dict[str, Any]] = []
+        for entry in entries:
+            ip = entry.get("ip") or entry.get("host")
+            hosts = self.hosts_for(ip) or [entry.get("host") or ip]
+            provider = self.cdn_provider(ip)
+            for host in hosts:
+                item = {**entry, "host": host, "ip": ip}
+                if provider:
+                    item["cdn"] = provider
+                results.append(item)
+
+        synthesized = 0
+        if skipped_cdn:
+            for ip in self.ips:
+                provider = self.cdn_provider(ip)
+                if not provider:
+                    continue
+                for host in self.hosts_for(ip):
+                    for port, service in CDN_PORTS:
+                        results.append({
+                            "host": host,
+                            "ip": ip,
+                            "port": port,
+                            "state": "open",
+                            "service": service,
+                            "cdn": provider,
+                            "assumed": True,
+                            "synthesized": True,
+                            "info": f"assumed open on {provider} edge, "
+                                    f"not port-scanned"
+                        })
+                        synthesized += 1
+        if synthesized:
+            logger.info(
+                f"[HostMap] {synthesized} web ports assumed open "
+                f"on skipped CDN edges"
+            )
+        return results
+
+
+def _lookup(host: str) -> List[str]:
+    if is_ip(host):
+        return [host]
+    try:
+        infos = socket.getaddrinfo(host, None, proto=socket.IPPROTO_TCP)
+    except socket.gaierror:
+        return []
+    return [info[4][0] for info in infos]
+
+
+def resolve_hosts(
+    targets: Iterable[str],
+    cdn_ranges: Optional[Dict[str, List[str]]] = None,
+    workers: int = 32
+) -> HostMap:
+    """
+    Resolve targets with the system resolver and build a HostMap
+
+    :param targets: hostnames, addresses or URLs
+    :param cdn_ranges: override of the CDN ranges
+    :param workers: number of concurrent lookups
+    """
+    hosts = list(dict.fromkeys(normalize_host(t) for t in targets if t))
+    hostmap = HostMap(cdn_ranges)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for host, ips in zip(hosts, pool.map(_lookup, hosts)):
+            hostmap.add(host, ips)
+
+    logger.info(
+        f"Resolved {len(hostmap.hosts)} hosts to {len(hostmap.ips)} "
+        f"unique addresses, {len(hostmap.unresolved)} unresolved"
+    )
+    return hostmap
@@ -0,0 +1,321 @@
+"""
+Incremental nuclei rescans driven by change detection
+
+Recurring scans of a program hit mostly unchanged URLs with a mostly
+unchanged template set. For every scanned URL the planner keeps its
+httpx fingerprint, the template index digest it was scanned with and
+its findings. On the next scan a URL is
+
+- scanned with all templates if it is new, its fingerprint changed or
+  it has no httpx record of its own (e.g. a path found by ffuf, whose
+  content changes the origin's probe does not show),
+- scanned only with templates added or changed since its last scan if
+  just the template set changed,
+- skipped if neither changed,
+
+and previous findings of templates that were not re-run are carried
+forward. Template snapshots no URL state refers to are pruned
+"""
+
+import datetime
+import hashlib
+import json
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from pymongo import ASCENDING, UpdateOne
+
+from bountyforge.core.probe_cache import (
+    canonical_url, response_hash, url_is_under
+)
+from bountyforge.core.template_index import TemplateIndex
+from bountyforge.core.template_routing import TemplateGroup
+
+logger = logging.getLogger(__name__)
+
+
+def url_fingerprint(record: Dict[str, Any]) -> str:
+    """
+    Change-detection hash of an httpx record
+
+    Response headers are represented by the server and content type:
+    the header hash of httpx covers Date and cookies and changes with
+    every request
+    """
+    doc = {
+        "body": response_hash(record),
+        "status": record.get("status_code") or record.get("status"),
+        "tech": sorted(t.lower() for t in record.get("tech") or []),
+        "webserver": record.get("webserver"),
+        "content_type": record.get("content_type"),
+    }
+    return hashlib.sha256(
+        json.dumps(doc, sort_keys=True).encode()
+    ).hexdigest()
+
+
+def url_fingerprints(
+    httpx_records: List[Dict[str, Any]]
+) -> Dict[str, str]:
+    """
+    Fingerprints of the probed URLs by canonical URL
+    """
+    return {
+        canonical_url(r["url"]): url_fingerprint(r)
+        for r in httpx_records if r.get("url")
+    }
+
+
+@dataclass
+class RescanPlan:
+    """
+    What to scan in the current run
+
+    :param full: URLs to scan with all templates
+    :param partial: URL -> relative paths of templates to run
+    :param skipped: unchanged URLs that are not scanned
+    :param carried: previous findings kept for partial and skipped URLs
+    """
+    full: List[str] = field(default_factory=list)
+    partial: Dict[str, List[str]] = field(default_factory=dict)
+    skipped: List[str] = field(default_factory=list)
+    carried: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def targets(self) -> List[str]:
+        return self.full + list(self.partial)
+
+    def split(self, groups: List[TemplateGroup]) -> List[TemplateGroup]:
+        """
+        Split routed groups so partial URLs run only their templates
+        """
+        result = []
+        for group in groups:
+            full = [t for t in group.targets if t not in self.partial]
+            if full:
+                result.append(replace(group, targets=full))
+
+            by_templates: Dict[Tuple[str, ...], List[str]] = defaultdict(
+                list
+            )
+            for target in group.targets:
+                if target in self.partial:
+                    by_templates[tuple(self.partial[target])].append(target)
+            for templates, targets in by_templates.items():
+                result.append(replace(
+                    group, targets=targets, templates=list(templates)
+                ))
+        return result
+
+    def summary(self) -> Dict[str, int]:
+        return {
+            "full": len(self.full),
+            "partial": len(self.partial),
+            "skipped": len(self.skipped),
+            "carried": len(self.carried),
+        }
+
+
+class RescanPlanner:
+    """
+    Per-URL scan state and template snapshots stored in MongoDB
+    """
+
+    def __init__(self, state, snapshots, index: TemplateIndex) -> None:
+        """
+        :param state: collection of per-URL scan state
+        :param snapshots: collection of template index snapshots
+        :param index: current template index
+        """
+        self.state = state
+        self.snapshots = snapshots
+        self.index = index
+        self.digest = index.digest
+        self._indexed = False
+
+    def _ensure_index(self) -> None:
+        if self._indexed:
+            return
+        self.state.create_index([("url", ASCENDING)], unique=True)
+        self.snapshots.create_index([("digest", ASCENDING)], unique=True)
+        self._indexed = True
+
+    def _snapshot(
+        self,
+        digest: str
+    ) -> Optional[Dict[str, Tuple[str, str]]]:
+        """
+        Templates of a stored snapshot: path -> (hash, template id)
+        """
+        doc = self.snapshots.find_one({"digest": digest}, {"_id": 0})
+        if not doc:
+            return None
+        return {path: (h, tid) for path, h, tid in doc["templates"]}
+
+    def _changed_templates(
+        self,
+        digest: str,
+        cache: Dict[str, Optional[Tuple[List[str], Set[str]]]]
+    ) -> Optional[Tuple[List[str], Set[str]]]:
+        """
+        Templates added or modified since a snapshot
+
+        :return: (relative paths to run, ids whose previous findings
+            are outdated) or None if the snapshot is unknown
+        """
+        if digest in cache:
+            return cache[digest]
+        old = self._snapshot(digest)
+        if old is None:
+            cache[digest] = None
+            return None
+
+        paths, ids = [], set()
+        for path, entry in self.index.entries.items():
+            if old.get(path, ("", ""))[0] != entry.hash:
+                paths.append(path)
+                ids.add(entry.id)
+        # findings of removed templates are not carried either
+        ids.update(
+            tid for path, (_, tid) in old.items()
+            if path not in self.index.entries
+        )
+        cache[digest] = (sorted(paths), ids)
+        return cache[digest]
+
+    def plan(
+        self,
+        targets: List[str],
+        httpx_records: List[Dict[str, Any]]
+    ) -> RescanPlan:
+        """
+        Decide per target between full, partial and no scan
+
+        :param targets: nuclei targets (URLs)
+        :param httpx_records: parsed httpx records of this run
+        """
+        plan = RescanPlan()
+        if not self.index.entries:
+            logger.warning(
+                "[RescanPlanner] Empty template index, scanning everything"
+            )
+            plan.full = list(targets)
+            return plan
+
+        fingerprints = url_fingerprints(httpx_records)
+        keys = {target: canonical_url(target) for target in targets}
+        try:
+            states = {
+                doc["url"]: doc
+                for doc in self.state.find(
+                    {"url": {"$in": list(set(keys.values()))}}, {"_id": 0}
+                )
+            }
+        except Exception as e:
+            logger.warning(f"[RescanPlanner] State lookup failed: {e}")
+            states = {}
+
+        changes: Dict[str, Optional[Tuple[List[str], Set[str]]]] = {}
+        for target in targets:
+            state = states.get(keys[target])
+            fingerprint = fingerprints.get(keys[target])
+            if (
+                state is None
+                or fingerprint is None
+                or state.get("fingerprint") != fingerprint
+            ):
+                plan.full.append(target)
+                continue
+
+            if state.get("digest") == self.digest:
+                plan.skipped.append(target)
+                plan.carried += state.get("findings", [])
+                continue
+
+            changed = self._changed_templates(state.get("digest"), changes)
+            if changed is None:
+                plan.full.append(target)
+                continue
+            paths, outdated = changed
+            plan.carried += [
+                f for f in state.get("findings", [])
+                if f.get("template-id") not in outdated
+            ]
+            if paths:
+                plan.partial[target] = paths
+            else:
+                plan.skipped.append(target)
+
+        plan.carried = [{**f, "carried": True} for f in plan.carried]
+        logger.info(f"[RescanPlanner] {plan.summary()}")
+        return plan
+
+    def record(
+        self,
+        plan: RescanPlan,
+        httpx_records: List[Dict[str, Any]],
+        findings: List[Dict[str, Any]]
+    ) -> None:
+        """
+        Store state of the URLs scanned in this run
+
+        :param plan: plan the run was executed with
+        :param httpx_records: parsed httpx records of this run
+        :param findings: all findings of this run, including carried ones
+        """
+        fingerprints = url_fingerprints(httpx_records)
+        by_target: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        targets = sorted(
+            plan.targets + plan.skipped, key=len, reverse=True
+        )
+        for finding in findings:
+            matched = finding.get("matched-at") or finding.get("host") or ""
+            # the longest target containing the match owns the finding
+            owner = next(
+                (t for t in targets if url_is_under(matched, t.rstrip("/"))),
+                None
+            )
+            if owner is not None:
+                doc = {k: v for k, v in finding.items() if k != "carried"}
+                by_target[owner].append(doc)
+
+        now = datetime.datetime.now()
+        ops = []
+        for target in plan.targets + plan.skipped:
+            fingerprint = fingerprints.get(canonical_url(target))
+            if fingerprint is None:
+                continue
+            ops.append(UpdateOne(
+                {"url": canonical_url(target)},
+                {"$set": {
+                    "fingerprint": fingerprint,
+                    "digest": self.digest,
+                    "findings": by_target.get(target, []),
+                    "scanned_at": now
+                }},
+                upsert=True
+            ))
+        try:
+            self._ensure_index()
+            self.snapshots.update_one(
+                {"digest": self.digest},
+                {"$setOnInsert": {
+                    # a list, template paths are not valid field names
+                    "templates": [
+                        [path, entry.hash, entry.id]
+                        for path, entry in self.index.entries.items()
+                    ],
+                    "created_at": now
+                }},
+                upsert=True
+            )
+            if ops:
+                self.state.bulk_write(ops, ordered=False)
+            # snapshots no URL was scanned with are not needed anymore
+            self.snapshots.delete_many(
+                {"digest": {"$nin": self.state.distinct("digest")}}
+            )
+        except Exception as e:
+            logger.warning(f"[RescanPlanner] Storing state failed: {e}")
@@ -3,13 +3,23 @@ Base module for all modules using the Template Method pattern
 with integrated command execution
 """
 
-from typing import Any, Dict, List, Union, Optional
+from typing import Any, Callable, Dict, List, Union, Optional
 import subprocess
 import logging
 import enum
 import os
 import shutil
 import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bountyforge.core.executor import (
+    ProcessRunner, SpooledOutput, join_outputs
+)
+from bountyforge.core.progress import ProgressRecord
+from bountyforge.core.retry import RetryPolicy
 
 logger = logging.getLogger(__name__)
 
@@ -50,6 +60,12 @@ class Module():
     target_type: TargetType = TargetType.SINGLE
     additional_flags: List[str] = None
     timeout: int = 7200  # 2 hours
+    idle_timeout: Optional[int] = None  # seconds without output
+    time_budget: Optional[int] = None  # wall-clock budget of the stage
+    spool_threshold: Optional[int] = None  # stdout bytes kept in memory
+    stderr_limit: Optional[int] = None  # last stderr characters kept
+    batch_size: Optional[int] = None  # targets per invocation, None for all
+    batch_workers: int = 1  # batches run in parallel
     binary_name: str = ""
     headers: dict = None
 
@@ -79,6 +95,30 @@ class Module():
         self.headers = headers if headers is not None else {}
         self.exclude = exclude if exclude is not None else []
         self.rate_limit = rate_limit
+        self.truncated = False
+        # monotonic end of the time budget, set by the first command or
+        # by a caller sharing one budget between several modules
+        self.deadline: Optional[float] = None
+        self.progress_callback: Optional[
+            Callable[[ProgressRecord], None]
+        ] = None
+        # resource usage summed over all processes of the module
+        self.resources: Dict[str, Any] = {
+            "processes": 0,
+            "user_cpu": 0.0,
+            "sys_cpu": 0.0,
+            "max_rss_kb": 0,
+            "block_in": 0,
+            "block_out": 0,
+            "wall_time": 0.0,
+        }
+        self._resources_lock = threading.Lock()
+        self.retry_policy: Optional[RetryPolicy] = None
+        # called with the parsed records of every finished invocation
+        # and the shard (host, template shard, pass) they belong to
+        self.records_callback: Optional[
+            Callable[[List[Dict[str, Any]], Optional[str]], None]
+        ] = None
 
     def _prepare_target(self) -> str:
         """
@@ -203,12 +243,134 @@ class Module():
             f"{target_str} with scan type: {self.scan_type.value}"
         )
 
+    def _remaining_time(self) -> float:
+        """
+        Seconds left for the next command: the module timeout capped by
+        the stage budget, which starts with the first command unless a
+        deadline was given
+        """
+        if not self.time_budget:
+            return self.timeout
+        if self.deadline is None:
+            self.deadline = time.monotonic() + self.time_budget
+        return min(self.timeout, self.deadline - time.monotonic())
+
+    def _parse_progress(
+        self,
+        stream: str,
+        line: str
+    ) -> Optional[ProgressRecord]:
+        """
+        Parse a progress line of the tool
+
+        Override in modules whose tool reports its progress
+
+        :param stream: "stdout" or "stderr"
+        :param line: output line
+        """
+        return None
+
+    def _is_heartbeat(self, stream: str, line: str) -> bool:
+        """
+        Whether a line is a periodic status line that is not parsed
+            into progress itself (e.g. the nmap "Stats:" line)
+
+        Override in modules whose tool prints such lines
+        """
+        return False
+
+    def _on_output_line(
+        self,
+        stream: str,
+        line: str,
+        last: Dict[str, Any]
+    ) -> bool:
+        """
+        Report the progress of an output line
+
+        :param last: progress of the last record of the process
+        :return: whether the line counts as activity for the stall
+            watchdog: output or progress that moved, not statistics
+            repeated by a hung tool
+        """
+        record = self._parse_progress(stream, line)
+        if record is None:
+            return not self._is_heartbeat(stream, line)
+        self.progress_callback(record)
+        progress = (record.percent, record.requests)
+        moved = progress != last.get("progress")
+        last["progress"] = progress
+        return moved
+
+    def _emit_records(
+        self,
+        records: List[Dict[str, Any]],
+        shard: Optional[str] = None
+    ) -> None:
+        """
+        Hand the records of a finished invocation to the records
+            callback, e.g. to store them while the stage is running
+        """
+        if self.records_callback is None or not records:
+            return
+        try:
+            self.records_callback(records, shard)
+        except Exception as e:
+            logger.warning(
+                f"[{self.__class__.__name__}] Records callback failed: {e}"
+            )
+
+    def _account(self, rusage: Dict[str, Any]) -> None:
+        """
+        Add the resource usage of a finished process to the module total
+        """
+        with self._resources_lock:
+            self.resources["processes"] += 1
+            for key, value in rusage.items():
+                if key == "max_rss_kb":
+                    self.resources[key] = max(self.resources[key], value)
+                else:
+                    self.resources[key] += value
+
     def _execute_command(self, command: List[str]) -> Dict[str, Any]:
         """
-        Executes a system command using subprocess.run
+        Executes a system command, retrying transient failures
+            according to the retry policy
+
+        The command is retried as a whole, modules keep invocations
+        small (a host, a batch of targets, a template shard) so a retry
+        re-runs only the targets of the failed one
+
+        :param command: A list of command arguments
+        :return: result of the last attempt with the number of "attempts"
+        """
+        attempt = 1
+        result = self._execute_once(command)
+        while (
+            not result["success"]
+            and self.retry_policy is not None
+            and self.retry_policy.allow(attempt, result)
+        ):
+            delay = self.retry_policy.delay(attempt)
+            logger.warning(
+                f"[{self.__class__.__name__}] Transient failure "
+                f"(returncode {result['returncode']}), retry {attempt} "
+                f"in {delay:.1f}s: {' '.join(command)}"
+            )
+            time.sleep(delay)
+            attempt += 1
+            result = self._execute_once(command)
+        result["attempts"] = attempt
+        return result
+
+    def _execute_once(self, command: List[str]) -> Dict[str, Any]:
+        """
+        Executes a system command under the process watchdog
 
         This method encapsulates the logic for running shell commands,
-            capturing output, and handling exceptions consistently
+            capturing output, and handling exceptions consistently.
+        A process killed for stalling or running out of time keeps its
+        partial output and is marked as truncated
 
         :param command: A list of command arguments
         :return: A dictionary containing 'output' with the command result
@@ -225,45 +387,68 @@ class Module():
                 f"[{self.__class__.__name__}] Running command: "
                 f"{' '.join(command)}"
             )
-            process = subprocess.run(
+            remaining = self._remaining_time()
+            if remaining <= 0:
+                self.truncated = True
+                result.update({
+                    "error": f"Time budget ({self.time_budget}s) exhausted",
+                    "truncated": True
+                })
+                logger.error(
+                    f"[{self.__class__.__name__}] {result['error']}, "
+                    f"skipping command: {' '.join(command)}"
+                )
+                return result
+
+            last_progress: Dict[str, Any] = {}
+            process = ProcessRunner(
                 command,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                check=True,
-                timeout=self.timeout
-            )
+                timeout=remaining,
+                idle_timeout=self.idle_timeout,
+                on_line=(
+                    lambda stream, line: self._on_output_line(
+                        stream, line, last_progress
+                    )
+                ) if self.progress_callback else None,
+                spool_threshold=self.spool_threshold,
+                stderr_limit=self.stderr_limit
+            ).run()
+            self._account(process.rusage)
             result.update({
-                "success": True,
-                "output": process.stdout.strip(),
+                "success": process.returncode == 0,
+                # spooled output stays on disk, parsers read it by line
+                "output": process.stdout
+                if isinstance(process.stdout, SpooledOutput)
+                else process.stdout.strip(),
                 "error": process.stderr.strip(),
-                "returncode": process.returncode
-            })
-            logger.info(
-                f"[{self.__class__.__name__}] Command executed successfully"
-            )
-            # return process.stdout.strip()
-
-        except subprocess.CalledProcessError as e:
-            logger.error(
-                f"[{self.__class__.__name__}] Command '{' '.join(command)}' "
-                f"failed with error: {e}"
-            )
-            result.update({
-                "output": e.stdout.strip(),
-                "error": e.stderr.strip(),
-                "returncode": e.returncode
+                "returncode": process.returncode,
+                "rusage": process.rusage
             })
-
-        except subprocess.TimeoutExpired:
-            logger.error(
-                f"[{self.__class__.__name__}] Timeout ({self.timeout}s) "
-                f"expired for command: {' '.join(command)}"
-            )
-            result["error"] = (
-                f"Timeout ({self.timeout}s) expired for command: "
-                f"{' '.join(command)}"
-            )
+            if process.truncated:
+                self.truncated = True
+                limit = self.idle_timeout if process.reason == "stalled"\
+                    else remaining
+                logger.error(
+                    f"[{self.__class__.__name__}] Command {process.reason} "
+                    f"({limit:.0f}s), keeping partial output: "
+                    f"{' '.join(command)}"
+                )
+                result.update({
+                    "success": True,
+                    "error": f"Command {process.reason} ({limit:.0f}s)",
+                    "truncated": True
+                })
+            elif process.returncode == 0:
+                logger.info(
+                    f"[{self.__class__.__name__}] "
+                    f"Command executed successfully"
+                )
+            else:
+                logger.error(
+                    f"[{self.__class__.__name__}] Command "
+                    f"'{' '.join(command)}' failed with exit status "
+                    f"{process.returncode}"
+                )
 
         except Exception as e:
             logger.exception(
@@ -301,10 +486,147 @@ class Module():
                 "returncode": result["returncode"]
             }
 
-        return {
+        output = {
             "result": result["output"],
             "parsed": self._parse_output(result["output"]),
         }
+        if result.get("truncated"):
+            output["truncated"] = True
+            output["truncated_reason"] = result["error"]
+        return output
+
+    def _replayed_records(
+        self,
+        stored: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Stored records that did not come from the tool output
+            (cache hits, carried findings) and can not be re-parsed
+        """
+        return [
+            record for record in stored.get("parsed", [])
+            if record.get("cached") or record.get("carried")
+        ]
+
+    def replay(self, stored: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Rebuild the result from a stored result without running the tool
+
+        Override this method in modules that store their raw output
+            in another shape than a single string
+
+        :param stored: result of an earlier run of the module
+        :return: result with the raw output parsed again
+        """
+        output = stored.get("result")
+        if not isinstance(output, str):
+            return {
+                "error": stored.get("error") or "No raw output stored",
+                "success": False,
+                "tool": self.__class__.__name__
+            }
+        result = self._post_run(
+            "replay", {"success": True, "output": output}
+        )
+        result["parsed"] += self._replayed_records(stored)
+        return result
+
+    def _target_batches(self, target_str: str) -> List[List[str]]:
+        """
+        Split the prepared target into batches of batch_size targets
+        """
+        if self.target_type == TargetType.FILE:
+            with open(target_str) as f:
+                targets = [line.strip() for line in f if line.strip()]
+        else:
+            targets = [t for t in target_str.split(",") if t]
+        size = self.batch_size or len(targets) or 1
+        return [targets[i:i + size] for i in range(0, len(targets), size)]
+
+    def _run_batch(
+        self,
+        targets: List[str],
+        shard: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Run one invocation for a batch of targets, FILE targets are
+            passed to the tool as a temporary list of the batch
+        """
+        path = None
+        try:
+            if self.target_type == TargetType.FILE:
+                with tempfile.NamedTemporaryFile(
+                    "w", suffix=".txt", prefix=f"{self.binary_name}-batch-",
+                    delete=False
+                ) as f:
+                    f.write("\n".join(targets))
+                path = target_str = f.name
+            else:
+                target_str = ",".join(targets)
+            command = self._build_command(target_str)
+            result = self._post_run(
+                target_str, self._execute_command(command)
+            )
+        finally:
+            if path is not None:
+                os.unlink(path)
+        self._emit_records(result.get("parsed", []), shard)
+        return result
+
+    def _run_batched(self, target_str: str) -> Dict[str, Any]:
+        """
+        Run the targets in invocations of batch_size targets
+
+        Every batch is retried on its own, so a transient failure
+        re-runs only its batch and a failed batch does not fail the
+        others. Without a batch size all targets go to one invocation
+
+        :param target_str: prepared target string
+        :return: merged result, failed batches are listed in "errors"
+        """
+        batches = self._target_batches(target_str)
+        if len(batches) <= 1:
+            command = self._build_command(target_str)
+            result = self._post_run(
+                target_str, self._execute_command(command)
+            )
+            self._emit_records(result.get("parsed", []))
+            return result
+
+        with ThreadPoolExecutor(
+            max_workers=max(self.batch_workers, 1)
+        ) as pool:
+            results = list(pool.map(
+                lambda item: self._run_batch(item[1], f"batch-{item[0]}"),
+                enumerate(batches)
+            ))
+
+        ok = [res for res in results if "error" not in res]
+        errors = [
+            {"targets": batch, **res}
+            for batch, res in zip(batches, results) if "error" in res
+        ]
+        if not ok:
+            return results[0]
+
+        merged: Dict[str, Any] = {
+            "result": join_outputs(
+                [res["result"] for res in ok], self.spool_threshold or 0
+            ),
+            "parsed": [record for res in ok for record in res["parsed"]],
+            "batches": len(batches)
+        }
+        truncated = [res for res in ok if res.get("truncated")]
+        if truncated:
+            merged["truncated"] = True
+            merged["truncated_reason"] = truncated[0].get("truncated_reason")
+        if errors:
+            logger.warning(
+                f"[{self.__class__.__name__}] {len(errors)} of "
+                f"{len(batches)} batches failed"
+            )
+            merged["errors"] = errors
+        return merged
 
     def run(self) -> Dict[str, Any]:
         """
@@ -315,9 +637,7 @@ class Module():
         try:
             target_str = self._prepare_target()
             self._pre_run(target_str)
-            command = self._build_command(target_str)
-            result = self._execute_command(command)
-            return self._post_run(target_str, result)
+            return self._run_batched(target_str)
 
         except Exception as e:
             logger.exception(
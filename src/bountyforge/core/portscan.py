@@ -0,0 +1,229 @@
+"""
+Built-in asyncio TCP connect scanner
+
+Used as a fast open-port discovery pass when nmap's own sweep is not
+wanted (e.g. no raw socket privileges). It only answers "is the port
+open", service detection is left to nmap.
+
+To cover the ports the nmap sweep would, the port set is taken from
+nmap-services (the top 1000 ports nmap scans by default) and from the
+port selection flags (-p, --top-ports, -F, --exclude-ports) of the scan
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import socket
+from typing import Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# nmap-services of common nmap installs
+NMAP_SERVICES = (
+    "/usr/share/nmap/nmap-services",
+    "/usr/local/share/nmap/nmap-services",
+    "/opt/homebrew/share/nmap/nmap-services",
+)
+
+# nmap flags selecting ports, with a value unless listed in PORT_SWITCHES
+PORT_FLAGS = ("-p", "--top-ports", "--exclude-ports")
+PORT_SWITCHES = ("-F",)
+
+# Most common TCP ports, used without nmap-services
+TOP_PORTS = [
+    21, 22, 23, 25, 53, 80, 81, 110, 111, 135, 139, 143, 161, 389, 443,
+    445, 465, 587, 593, 631, 636, 873, 993, 995, 1080, 1433, 1521, 1723,
+    2049, 2082, 2083, 2086, 2087, 2375, 2376, 3000, 3001, 3128, 3306,
+    3389, 4000, 4443, 4848, 5000, 5001, 5432, 5601, 5672, 5900, 5984,
+    6379, 6443, 7001, 7443, 8000, 8001, 8008, 8009, 8080, 8081, 8088,
+    8181, 8443, 8500, 8800, 8880, 8888, 9000, 9001, 9042, 9090, 9200,
+    9300, 9443, 10000, 10250, 10443, 11211, 15672, 27017,
+]
+
+ALL_PORTS = range(1, 65536)
+
+
+@functools.lru_cache(maxsize=None)
+def _services_ports(path: str) -> Tuple[int, ...]:
+    """
+    TCP ports of an nmap-services file, most frequent first
+    """
+    ports = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            fields = line.split("#", 1)[0].split()
+            if len(fields) < 3 or not fields[1].endswith("/tcp"):
+                continue
+            ports.append((float(fields[2]), int(fields[1].split("/")[0])))
+    ports.sort(key=lambda p: -p[0])
+    return tuple(port for _, port in ports)
+
+
+def top_ports(count: int = 1000, services: Optional[str] = None) -> List[int]:
+    """
+    The `count` most frequent TCP ports, the ports nmap scans with
+    `--top-ports count` (1000 by default)
+
+    :param services: nmap-services file, found in the usual places
+        if not set; without one the built-in TOP_PORTS are used
+    """
+    candidates = [services] if services else NMAP_SERVICES
+    services = next((p for p in candidates if os.path.isfile(p)), None)
+    if services is None:
+        logger.warning(
+            "[portscan] nmap-services not found, using the built-in "
+            f"{len(TOP_PORTS)} ports"
+        )
+        return TOP_PORTS[:count]
+    return sorted(_services_ports(services)[:count])
+
+
+def parse_port_spec(spec: str) -> List[int]:
+    """
+    TCP ports of an nmap -p value, e.g. "22,80,8000-8100,T:443,U:53"
+
+    UDP/SCTP parts and service names are ignored
+    """
+    ports: List[int] = []
+    protocol = "T"
+    for part in spec.split(","):
+        part = part.strip()
+        if ":" in part:
+            protocol, part = part.split(":", 1)
+            protocol = protocol.upper()
+        if protocol != "T" or not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-", 1)
+            if not (start or "1").isdigit() or not (end or "1").isdigit():
+                continue
+            ports.extend(range(int(start or 1), int(end or 65535) + 1))
+        elif part.isdigit():
+            ports.append(int(part))
+    return sorted(set(ports))
+
+
+def split_port_flags(flags: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """
+    Split nmap flags into port selection flags and all others
+
+    :return: (port selection flags, other flags)
+    """
+    ports: List[str] = []
+    others: List[str] = []
+    flags = list(flags or [])
+    i = 0
+    while i < len(flags):
+        flag = flags[i]
+        name = flag.split("=", 1)[0]
+        if flag in PORT_SWITCHES:
+            ports.append(flag)
+        elif name in PORT_FLAGS:
+            if "=" in flag or i + 1 >= len(flags):
+                ports.append(flag)
+            else:
+                ports += [flag, flags[i + 1]]
+                i += 1
+        elif flag.startswith("-p") and not flag.startswith("--"):
+            # -p22,80 and -p-
+            ports.append(flag)
+        else:
+            others.append(flag)
+        i += 1
+    return ports, others
+
+
+def discovery_ports(
+    port_flags: Iterable[str],
+    full: bool = False
+) -> List[int]:
+    """
+    Ports an nmap sweep with these port selection flags covers
+
+    :param port_flags: flags from split_port_flags
+    :param full: full mode, all ports unless the flags select others
+    """
+    ports: Iterable[int] = ALL_PORTS if full else top_ports()
+    exclude: set = set()
+    flags = list(port_flags)
+    for i, flag in enumerate(flags):
+        name, _, value = flag.partition("=")
+        if not value and name in PORT_FLAGS and i + 1 < len(flags):
+            value = flags[i + 1]
+        if name == "-p":
+            ports = parse_port_spec(value)
+        elif name.startswith("-p") and not name.startswith("--"):
+            ports = parse_port_spec(flag[2:])
+        elif name == "--top-ports":
+            ports = top_ports(int(value))
+        elif name == "-F":
+            ports = top_ports(100)
+        elif name == "--exclude-ports":
+            exclude.update(parse_port_spec(value))
+    return [port for port in ports if port not in exclude]
+
+
+async def _probe(
+    host: str,
+    port: int,
+    semaphore: asyncio.Semaphore,
+    timeout: float
+) -> bool:
+    async with semaphore:
+        try:
+            _, writer = await asyncio.wait_for(
+                asyncio.open_connection(host, port), timeout
+            )
+        except (OSError, asyncio.TimeoutError):
+            return False
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+        return True
+
+
+async def scan_ports(
+    host: str,
+    ports: Iterable[int],
+    concurrency: int = 500,
+    timeout: float = 1.0
+) -> List[int]:
+    """
+    Return open TCP ports of a host using full connects
+
+    :param host: hostname or address
+    :param ports: ports to probe
+    :param concurrency: maximum number of connects in flight
+    :param timeout: connect timeout per port in seconds
+    """
+    # resolve once instead of once per port
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(
+            host, None, proto=socket.IPPROTO_TCP
+        )
+    except socket.gaierror as e:
+        logger.warning(f"[portscan] Can not resolve {host}: {e}")
+        return []
+    address = infos[0][4][0]
+
+    ports = list(ports)
+    semaphore = asyncio.Semaphore(concurrency)
+    states = await asyncio.gather(*(
+        _probe(address, port, semaphore, timeout) for port in ports
+    ))
+    return [port for port, is_open in zip(ports, states) if is_open]
+
+
+def tcp_connect_scan(
+    host: str,
+    ports: Iterable[int],
+    concurrency: int = 500,
+    timeout: float = 1.0
+) -> List[int]:
+    """
+    Synchronous wrapper around scan_ports()
+    """
+    return asyncio.run(scan_ports(host, ports, concurrency, timeout))
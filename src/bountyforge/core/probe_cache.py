@@ -0,0 +1,170 @@
+"""
+Shared cache of httpx probe results
+
+The same `host:port` is often probed by several jobs within minutes.
+ProbeCache keeps a compact httpx record per canonical URL in Redis:
+fresh entries are reused as is, stale ones are re-probed in full (httpx
+sends no conditional requests) and the new record is marked as changed
+or unchanged against the stale one.
+
+Entries are kept per probe profile (httpx mode and flags): a minimal
+live-mode record has no title, technologies or hash and must not be
+served to a recon probe
+"""
+
+import logging
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from bountyforge.core.cache import RedisCache
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+# httpx JSON fields kept in the cache
+RECORD_FIELDS = (
+    "url", "input", "host", "port", "scheme", "status_code", "title",
+    "tech", "cdn", "cdn_name", "webserver", "content_length",
+    "content_type", "hash",
+)
+
+
+def canonical_url(target: str) -> str:
+    """
+    Canonical cache key for an httpx input
+
+    Host names are lower-cased and default ports of URLs made explicit,
+    so "http://Example.com/" and "http://example.com:80" share an entry
+    """
+    target = target.strip()
+    if "://" not in target:
+        parsed = urlparse(f"//{target}")
+        host = (parsed.hostname or target).lower()
+        return f"{host}:{parsed.port}" if parsed.port else host
+
+    parsed = urlparse(target)
+    scheme = parsed.scheme.lower()
+    host = (parsed.hostname or "").lower()
+    port = parsed.port or DEFAULT_PORTS.get(scheme)
+    path = parsed.path.rstrip("/")
+    return f"{scheme}://{host}:{port}{path}"
+
+
+def response_hash(record: Dict[str, Any]) -> Optional[str]:
+    """
+    Body hash of an httpx record (requires `-hash sha256`)
+    """
+    value = record.get("hash")
+    if isinstance(value, dict):
+        return value.get("body_sha256") or value.get("body_md5")
+    return value
+
+
+def url_is_under(url: str, base: str) -> bool:
+    """
+    Whether a URL is the base URL or a path, query or fragment below it
+
+    "http://x.com/a" is under "http://x.com", "http://x.com.evil" is not
+    """
+    return url == base or (
+        url.startswith(base) and url[len(base)] in "/?#"
+    )
+
+
+class ProbeCache:
+    """
+    httpx probe results keyed by probe profile and canonical URL
+    with a freshness window
+    """
+
+    def __init__(
+        self,
+        cache: RedisCache,
+        fresh_ttl: int = 900,
+        max_age: int = 6 * 3600
+    ) -> None:
+        """
+        :param cache: shared Redis cache
+        :param fresh_ttl: seconds an entry is reused without probing
+        :param max_age: seconds a stale entry is kept to compare
+            its re-probe with
+        """
+        self.cache = cache
+        self.fresh_ttl = fresh_ttl
+        self.max_age = max(max_age, fresh_ttl)
+
+    @staticmethod
+    def _key(target: str, profile: str) -> str:
+        return f"{profile}|{canonical_url(target)}"
+
+    def lookup(
+        self,
+        targets: Iterable[str],
+        profile: str = ""
+    ) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+        """
+        Split cached entries of the targets into fresh and stale
+
+        :param targets: httpx inputs
+        :param profile: probe profile the entries must come from
+        :return: (fresh, stale) mappings target -> cached record
+        """
+        keys = {target: self._key(target, profile) for target in targets}
+        hits = self.cache.get_many(set(keys.values()))
+        now = time.time()
+
+        fresh, stale = {}, {}
+        for target, key in keys.items():
+            entry = hits.get(key)
+            if not entry:
+                continue
+            if now - entry.get("probed_at", 0) < self.fresh_ttl:
+                fresh[target] = entry
+            else:
+                stale[target] = entry
+        return fresh, stale
+
+    def store(
+        self,
+        records: List[Dict[str, Any]],
+        profile: str = ""
+    ) -> None:
+        """
+        Cache freshly probed httpx records under their input's key
+
+        :param profile: probe profile the records were probed with
+        """
+        now = time.time()
+        items = {}
+        for record in records:
+            target = record.get("input") or record.get("url")
+            if not target:
+                continue
+            entry = {
+                key: record[key] for key in RECORD_FIELDS if key in record
+            }
+            entry["probed_at"] = now
+            items[self._key(target, profile)] = entry
+        self.cache.set_many(items, self.max_age)
+
+    @staticmethod
+    def mark_reprobed(
+        record: Dict[str, Any],
+        previous: Optional[Dict[str, Any]]
+    ) -> Dict[str, Any]:
+        """
+        Mark a re-probed record as changed or unchanged
+        compared to its stale cache entry
+        """
+        if previous is None:
+            return record
+        old_hash = response_hash(previous)
+        record["reprobed"] = True
+        record["changed"] = not (
+            old_hash
+            and old_hash == response_hash(record)
+            and previous.get("status_code") == record.get("status_code")
+        )
+        return record
@@ -0,0 +1,196 @@
+"""
+Live progress of tool processes
+
+Tools report their progress in their own formats: the ffuf progress
+line, nuclei statistics in JSON (-stats -sj) and nmap timing lines
+(--stats-every). The parsers turn them into a uniform ProgressRecord,
+ProgressReporter publishes the records at a bounded rate per stage and
+keeps a summary of every stage
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+FFUF_PROGRESS_RE = re.compile(
+    r'Progress: \[(?P<done>\d+)/(?P<total>\d+)\].*?'
+    r'(?P<rps>\d+) req/sec :: Duration: \[(?P<duration>[\d:]+)\]'
+)
+NMAP_STATS_RE = re.compile(r'^Stats: (?P<elapsed>[\d:]+) elapsed')
+NMAP_TIMING_RE = re.compile(
+    r'Timing: About (?P<percent>[\d.]+)% done'
+    r'(?:; ETC: \S+ \((?P<remaining>[\d:]+) remaining\))?'
+)
+
+
+@dataclass
+class ProgressRecord:
+    """
+    Uniform progress of a tool process, unknown values are None
+    """
+    tool: str
+    percent: Optional[float] = None
+    rps: Optional[float] = None
+    eta: Optional[float] = None
+    elapsed: Optional[float] = None
+    requests: Optional[int] = None
+    total: Optional[int] = None
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def parse_duration(value: str) -> float:
+    """
+    Seconds of a "[h:]mm:ss" duration
+    """
+    seconds = 0.0
+    for part in value.split(":"):
+        seconds = seconds * 60 + float(part)
+    return seconds
+
+
+def _eta(
+    percent: Optional[float],
+    elapsed: Optional[float]
+) -> Optional[float]:
+    """
+    Remaining seconds extrapolated from the elapsed time
+    """
+    if percent is None or elapsed is None:
+        return None
+    if percent >= 100:
+        return 0.0
+    if percent <= 0:
+        return None
+    return elapsed * (100 - percent) / percent
+
+
+def parse_ffuf_progress(line: str) -> Optional[ProgressRecord]:
+    """
+    ":: Progress: [120/4614] :: Job [1/1] :: 52 req/sec ::
+    Duration: [0:00:02] :: Errors: 0 ::"
+    """
+    m = FFUF_PROGRESS_RE.search(line)
+    if not m:
+        return None
+    done, total = int(m.group("done")), int(m.group("total"))
+    elapsed = parse_duration(m.group("duration"))
+    percent = 100.0 * done / total if total else None
+    return ProgressRecord(
+        tool="ffuf",
+        percent=percent,
+        rps=float(m.group("rps")),
+        eta=_eta(percent, elapsed),
+        elapsed=elapsed,
+        requests=done,
+        total=total
+    )
+
+
+def parse_nuclei_stats(line: str) -> Optional[ProgressRecord]:
+    """
+    A JSON statistics line of `nuclei -stats -sj`, values are strings
+    """
+    line = line.strip()
+    if not line.startswith("{") or '"percent"' not in line:
+        return None
+    try:
+        stats = json.loads(line)
+        percent = float(stats["percent"])
+        elapsed = parse_duration(stats["duration"])\
+            if stats.get("duration") else None
+        return ProgressRecord(
+            tool="nuclei",
+            percent=percent,
+            rps=float(stats.get("rps") or 0),
+            eta=_eta(percent, elapsed),
+            elapsed=elapsed,
+            requests=int(stats.get("requests") or 0),
+            total=int(stats.get("total") or 0)
+        )
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+class NmapStatsParser:
+    """
+    nmap prints "Stats: 0:00:03 elapsed; ..." followed by a
+    "<phase> Timing: About 12.50% done; ETC: 10:22 (0:00:21 remaining)"
+    line, so the parser keeps the last elapsed time
+    """
+
+    def __init__(self) -> None:
+        self.elapsed: Optional[float] = None
+
+    def __call__(self, line: str) -> Optional[ProgressRecord]:
+        stats = NMAP_STATS_RE.match(line.strip())
+        if stats:
+            self.elapsed = parse_duration(stats.group("elapsed"))
+            return None
+        m = NMAP_TIMING_RE.search(line)
+        if not m:
+            return None
+        percent = float(m.group("percent"))
+        eta = parse_duration(m.group("remaining"))\
+            if m.group("remaining") else _eta(percent, self.elapsed)
+        return ProgressRecord(
+            tool="nmap", percent=percent, eta=eta, elapsed=self.elapsed
+        )
+
+
+class ProgressReporter:
+    """
+    Publishes progress records, at most one per stage per interval
+    """
+
+    def __init__(
+        self,
+        publish: Callable[[Dict[str, Any]], None],
+        min_interval: float = 2.0
+    ) -> None:
+        """
+        :param publish: called with the event to send
+        :param min_interval: seconds between two events of a stage
+        """
+        self.publish = publish
+        self.min_interval = min_interval
+        self._last: Dict[str, float] = {}
+        self._summary: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def report(self, stage: str, record: ProgressRecord) -> None:
+        """
+        Record progress of a stage, publishing it if the interval passed
+        """
+        now = time.monotonic()
+        with self._lock:
+            summary = self._summary.setdefault(
+                stage, {"updates": 0, "max_rps": None}
+            )
+            summary["updates"] += 1
+            summary["last"] = record.as_dict()
+            if record.rps is not None:
+                summary["max_rps"] = max(summary["max_rps"] or 0, record.rps)
+            if now - self._last.get(stage, float("-inf")) < self.min_interval:
+                return
+            self._last[stage] = now
+
+        try:
+            self.publish({"stage": stage, **record.as_dict()})
+        except Exception as e:
+            logger.warning(f"[ProgressReporter] Publish failed: {e}")
+
+    def summary(self, stage: str) -> Optional[Dict[str, Any]]:
+        """
+        Number of updates, peak rate and last record of a stage
+        """
+        with self._lock:
+            summary = self._summary.get(stage)
+            return dict(summary) if summary else None
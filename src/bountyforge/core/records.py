@@ -0,0 +1,156 @@
+"""
+Normalized storage of parsed stage records
+
+Instead of one scan_results document holding the parsed records of
+every stage, the records are stored one document each in a collection
+per kind (hosts, ports, HTTP endpoints, directory hits, findings),
+keyed by job and stage. The scan_results document keeps the stage
+summaries with a reference to the collection, load_records puts the
+records back for the views reading the whole result.
+
+While a job runs, the records of every finished tool invocation are
+written to the same collections (see BulkWriter), live_results reads
+them; store_records replaces them with the final records of the stage
+"""
+
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+from bountyforge.core.spill import SpillStore
+from bountyforge.repository import RecordRepository
+
+logger = logging.getLogger(__name__)
+
+# stage -> collection of its parsed records
+STAGE_COLLECTIONS: Dict[str, str] = {
+    "subfinder": "scan_hosts",
+    "ffuf_subdomainbruteforce": "scan_hosts",
+    "nmap": "scan_ports",
+    "httpx": "scan_endpoints",
+    "ffuf_directorybruteforce": "scan_directories",
+    "nuclei": "scan_findings",
+}
+
+# collection of a kind of record in the API
+RECORD_KINDS: Dict[str, str] = {
+    "hosts": "scan_hosts",
+    "ports": "scan_ports",
+    "endpoints": "scan_endpoints",
+    "directories": "scan_directories",
+    "findings": "scan_findings",
+}
+
+# query parameter -> (record field, type) of the filters of a kind
+RECORD_FILTERS: Dict[str, Dict[str, Tuple[str, type]]] = {
+    "hosts": {"host": ("host", str), "stage": ("stage", str)},
+    "ports": {
+        "host": ("host", str), "ip": ("ip", str), "port": ("port", str),
+        "service": ("service", str), "state": ("state", str)
+    },
+    "endpoints": {
+        "url": ("url", str), "status_code": ("status_code", int)
+    },
+    "directories": {
+        "host": ("host", str), "status": ("status", int)
+    },
+    "findings": {
+        "severity": ("info.severity", str),
+        "template": ("template-id", str),
+        "host": ("host", str)
+    },
+}
+
+
+def record_filters(kind: str, args: Dict[str, str]) -> Dict[str, Any]:
+    """
+    Equality filters of a record query from request arguments
+
+    :raises ValueError: if a value has the wrong type
+    """
+    filters = {}
+    for param, (field, kind_type) in RECORD_FILTERS[kind].items():
+        if param in args:
+            filters[field] = kind_type(args[param])
+    return filters
+
+
+def store_records(
+    db,
+    job_id: str,
+    results: Dict[str, Any],
+    spill: Optional[SpillStore] = None
+) -> Dict[str, Any]:
+    """
+    Move the parsed records of the stages into their collections
+
+    :param db: MongoDB database
+    :param job_id: job of the results
+    :param results: pipeline results, possibly spilled
+    :param spill: spill store the results were spilled to
+    :return: results without parsed records, every stored stage
+        carries {"collection", "count"} under "normalized"
+    """
+    repo = RecordRepository(db)
+    stored = {}
+    for stage, res in results.items():
+        collection = STAGE_COLLECTIONS.get(stage)
+        if collection is None or not isinstance(res, dict):
+            stored[stage] = res
+            continue
+        spilled = dict(res.get("spilled") or {})
+        if "parsed" not in res and "parsed" not in spilled:
+            stored[stage] = res
+            continue
+
+        records = spill.iter_field(res, "parsed") if spill is not None\
+            else res.get("parsed") or []
+        # live records written during the scan are superseded
+        repo.delete(collection, job_id, stage)
+        count = repo.insert(collection, job_id, stage, records)
+        summary = {k: v for k, v in res.items() if k != "parsed"}
+        if spilled:
+            spilled.pop("parsed", None)
+            summary["spilled"] = spilled
+        summary["normalized"] = {"collection": collection, "count": count}
+        stored[stage] = summary
+        logger.info(f"Stored {count} {stage} records in {collection}")
+    return stored
+
+
+def load_records(db, record: Optional[Dict[str, Any]]) -> Any:
+    """
+    Put the normalized records back into a `scan_results` record
+
+    :param db: MongoDB database
+    :param record: stored record, returned unchanged without
+        normalized stages
+    """
+    if not record or not isinstance(record.get("results"), dict):
+        return record
+    repo = RecordRepository(db)
+    results = {}
+    for stage, res in record["results"].items():
+        if not isinstance(res, dict) or "normalized" not in res:
+            results[stage] = res
+            continue
+        res = {k: v for k, v in res.items() if k != "normalized"}
+        res["parsed"] = repo.records(
+            record["results"][stage]["normalized"]["collection"],
+            record.get("job_id"),
+            stage
+        )
+        results[stage] = res
+    return {**record, "results": results}
+
+
+def live_results(db, job_id: str) -> Dict[str, Any]:
+    """
+    Parsed records a running job has written so far, by stage
+    """
+    repo = RecordRepository(db)
+    results = {}
+    for stage, collection in STAGE_COLLECTIONS.items():
+        records = repo.records(collection, job_id, stage)
+        if records:
+            results[stage] = {"parsed": records}
+    return results
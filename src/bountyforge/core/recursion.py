@@ -0,0 +1,240 @@
+"""
+Budgeted recursion scheduler for directory brute force
+
+Instead of letting ffuf descend into every directory it finds
+(`-recursion -recursion-depth N`), the scheduler collects hits from
+each pass, ranks candidate branches and hands out the next branch to
+brute force only while the host and job request budgets allow it
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# Status codes that usually mean "there is a directory here"
+# and their base weight when ranking branches
+STATUS_WEIGHTS: Dict[int, float] = {
+    301: 1.0,
+    302: 0.8,
+    307: 0.8,
+    308: 1.0,
+    200: 0.6,
+    204: 0.5,
+    401: 0.7,
+    403: 0.7,
+}
+
+# Paths with these suffixes are files, not directories
+FILE_EXTENSIONS = (
+    ".php", ".asp", ".aspx", ".jsp", ".html", ".htm", ".js", ".css",
+    ".txt", ".xml", ".json", ".png", ".jpg", ".jpeg", ".gif", ".ico",
+    ".svg", ".zip", ".gz", ".tar", ".bak", ".old", ".log", ".pdf",
+)
+
+
+def wordlist_path(value: str) -> str:
+    """
+    File of an ffuf -w value, resolved the way ffuf does: an optional
+    ":KEYWORD" suffix is split off, "~" is expanded and relative paths
+    are taken from the working directory ffuf runs in (ours)
+    """
+    path = value.split(":", 1)[0]
+    if path == "-":
+        return path
+    return os.path.abspath(os.path.expanduser(path))
+
+
+def count_wordlist(path: str) -> int:
+    """
+    Count non-empty lines of a wordlist, i.e. requests per ffuf pass
+
+    :param path: ffuf -w value of the wordlist
+    :return: number of words, 0 if the file can not be read
+    """
+    path = wordlist_path(path)
+    if not os.path.isfile(path):
+        return 0
+    with open(path, "rb") as f:
+        return sum(1 for line in f if line.strip())
+
+
+class RequestBudget:
+    """
+    Thread-safe request counter shared between hosts of one job
+    """
+
+    def __init__(self, limit: int) -> None:
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    @property
+    def remaining(self) -> int:
+        return max(self.limit - self.used, 0)
+
+    def try_spend(self, amount: int) -> bool:
+        """
+        Reserve `amount` requests if the budget allows it
+        """
+        with self._lock:
+            if self.used + amount > self.limit:
+                return False
+            self.used += amount
+            return True
+
+    def spend(self, amount: int) -> None:
+        """
+        Unconditionally account `amount` requests
+        """
+        with self._lock:
+            self.used += amount
+
+
+@dataclass(order=True)
+class Branch:
+    """
+    Directory candidate for the next brute force pass
+    """
+    priority: float
+    seq: int
+    url: str = field(compare=False)
+    depth: int = field(compare=False)
+    status: int = field(compare=False, default=0)
+    length: int = field(compare=False, default=0)
+
+
+class RecursionScheduler:
+    """
+    Decides which discovered directories are worth descending into
+
+    Branches are ranked by the status code weight and by how novel
+    the response size is for the host: hits sharing the same length
+    with many others are most likely catch-all or soft-404 responses
+    """
+
+    def __init__(
+        self,
+        max_depth: int = 2,
+        requests_per_pass: int = 0,
+        host_budget: int = 0,
+        job_budget: Optional[RequestBudget] = None
+    ) -> None:
+        """
+        :param max_depth: maximum recursion depth, 0 disables recursion
+        :param requests_per_pass: requests spent on one pass (wordlist size)
+        :param host_budget: requests allowed per host, 0 means unlimited
+        :param job_budget: shared budget for the whole job
+        """
+        self.max_depth = max_depth
+        self.requests_per_pass = requests_per_pass
+        self.host_budget = host_budget
+        self.job_budget = job_budget
+        self._queues: Dict[str, List[Branch]] = defaultdict(list)
+        self._seen: Dict[str, set] = defaultdict(set)
+        self._lengths: Dict[str, Counter] = defaultdict(Counter)
+        self._spent: Counter = Counter()
+        self._seq = itertools.count()
+
+    def spent(self, host: str) -> int:
+        return self._spent[host]
+
+    def charge(self, host: str) -> None:
+        """
+        Account a pass that runs regardless of the budget (the base pass)
+        """
+        self._spent[host] += self.requests_per_pass
+        if self.job_budget is not None:
+            self.job_budget.spend(self.requests_per_pass)
+
+    def _is_directory(self, url: str) -> bool:
+        path = urlparse(url).path.rstrip("/")
+        if not path:
+            return False
+        return not path.lower().endswith(FILE_EXTENSIONS)
+
+    def _score(self, host: str, hit: Dict[str, Any], depth: int) -> float:
+        status = hit.get("status") or 0
+        weight = STATUS_WEIGHTS.get(status, 0.0)
+        redirect = hit.get("redirectlocation") or ""
+        if redirect.endswith("/"):
+            weight += 0.5
+        same_size = self._lengths[host][hit.get("length")]
+        novelty = 1.0 / same_size if same_size else 1.0
+        # prefer shallow branches when scores are close
+        return weight * novelty / (depth + 1)
+
+    def offer(self, host: str, hits: List[Dict[str, Any]], depth: int) -> None:
+        """
+        Register hits of a finished pass as candidate branches
+
+        :param host: host the pass was run against
+        :param hits: parsed ffuf hits (url, status, length)
+        :param depth: depth of the pass that produced the hits
+        """
+        for hit in hits:
+            self._lengths[host][hit.get("length")] += 1
+
+        if depth >= self.max_depth:
+            return
+
+        for hit in hits:
+            url = (hit.get("url") or "").rstrip("/")
+            if (
+                not url
+                or url in self._seen[host]
+                or hit.get("status") not in STATUS_WEIGHTS
+                or not self._is_directory(url)
+            ):
+                continue
+            score = self._score(host, hit, depth)
+            if score <= 0:
+                continue
+            self._seen[host].add(url)
+            heapq.heappush(
+                self._queues[host],
+                Branch(
+                    priority=-score,
+                    seq=next(self._seq),
+                    url=url,
+                    depth=depth + 1,
+                    status=hit.get("status") or 0,
+                    length=hit.get("length") or 0
+                )
+            )
+
+    def next_branch(self, host: str) -> Optional[Branch]:
+        """
+        Pop the best ranked branch if the budgets allow one more pass
+
+        :return: branch to brute force or None when done / out of budget
+        """
+        queue = self._queues[host]
+        if not queue:
+            return None
+
+        cost = self.requests_per_pass
+        if self.host_budget and self._spent[host] + cost > self.host_budget:
+            logger.info(
+                f"[RecursionScheduler] Host budget exhausted for {host}, "
+                f"dropping {len(queue)} branches"
+            )
+            queue.clear()
+            return None
+        if self.job_budget is not None and not self.job_budget.try_spend(cost):
+            logger.info(
+                f"[RecursionScheduler] Job budget exhausted, "
+                f"dropping {len(queue)} branches of {host}"
+            )
+            queue.clear()
+            return None
+
+        self._spent[host] += cost
+        return heapq.heappop(queue)
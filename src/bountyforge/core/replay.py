@@ -0,0 +1,163 @@
+"""
+Offline replay of stored scans
+
+ReplayPipeline runs the regular ScanPipeline stage hand-off logic, but
+every module re-parses the raw output stored in `scan_results` instead
+of running its binary, and resolution uses the stored host map. Parser
+and routing changes can be checked against real scans in seconds; the
+outcome is stored as a new derived result
+"""
+
+import copy
+import datetime
+import logging
+import uuid
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from bountyforge.config import settings
+from bountyforge.core.hostmap import HostMap
+from bountyforge.core.records import load_records, store_records
+from bountyforge.core.spill import load_results
+from bountyforge.repository import ScanRepository
+from bountyforge.core.task import ScanPipeline
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayPipeline(ScanPipeline):
+    """
+    ScanPipeline fed with the stored results of an earlier job
+    """
+
+    def __init__(
+        self,
+        stored: Dict[str, Any],
+        targets: List[str],
+        tools: List[str],
+        options: Dict[str, Any]
+    ) -> None:
+        """
+        :param stored: "results" of the replayed scan_results record
+        :param targets: initial targets of the job
+        :param tools: tools of the job
+        :param options: scanner options to replay with
+        """
+        options = copy.deepcopy(options)
+        # incremental state belongs to live scans
+        options.setdefault("nuclei", {})["incremental"] = False
+        super().__init__(targets, tools, options)
+        self.stored = stored
+
+    def _publish(self, payload: Any) -> None:
+        pass
+
+    def _stored_hostmap(
+        self,
+        cdn_ranges: Optional[Dict[str, List[str]]]
+    ) -> HostMap:
+        dns = self.stored.get("dns") or {}
+        mapping = dns.get("hostmap")\
+            or self.stored.get("nmap", {}).get("hostmap") or {}
+        return HostMap.from_dict(mapping, dns.get("unresolved"), cdn_ranges)
+
+    def _resolve_dns(
+        self,
+        dns_cfg: Dict[str, Any],
+        cdn_ranges: Optional[Dict[str, List[str]]],
+        targets: Optional[List[str]] = None
+    ) -> Tuple[HostMap, List[str]]:
+        dead = (self.stored.get("dns") or {}).get("dead", [])
+        return self._stored_hostmap(cdn_ranges), dead
+
+    def _build_hostmap(
+        self,
+        cdn_ranges: Optional[Dict[str, List[str]]],
+        targets: Optional[List[str]] = None
+    ) -> HostMap:
+        return self._stored_hostmap(cdn_ranges)
+
+    def _store_tier(self, tier: str, res: Dict[str, Any]) -> None:
+        pass
+
+    def _run_module(
+        self,
+        stage: str,
+        mod,
+        cfg: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        stored = self.stored.get(stage)
+        if stored is None:
+            return {
+                "error": f"No stored output of {stage}",
+                "success": False,
+                "replayed": True
+            }
+        res = mod.replay(stored)
+        res["replayed"] = True
+        return res
+
+
+def replay_job(
+    db,
+    job_id: str,
+    current_settings: bool = False,
+    initiator: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Replay a finished job and store the derived result as a new job
+
+    :param db: MongoDB database
+    :param job_id: job to replay
+    :param current_settings: replay with the current scanner settings
+        instead of the options the job ran with
+    :param initiator: user requesting the replay
+    :return: stored record of the replay
+    :raises LookupError: if the job has no stored result
+    """
+    scans = ScanRepository(db)
+    record = load_records(db, load_results(db, scans.find_result(job_id)))
+    if not record or not isinstance(record.get("results"), dict):
+        raise LookupError(f"No stored result for job {job_id}")
+    job = scans.find_job(job_id) or {}
+
+    stored = record["results"]
+    request = record.get("request") or {}
+    targets = request.get("target") or job.get("targets") or []
+    # jobs stored without their request: stages that left a result
+    tools = request.get("tools") or [
+        stage for stage in ScanPipeline.ORDER if stage in stored
+    ]
+    options = request.get("scanners") or {}
+    if current_settings or not options:
+        options = asdict(settings.scanners)
+
+    started = datetime.datetime.now()
+    results = ReplayPipeline(stored, targets, tools, options).run()
+    logger.info(
+        f"Replayed job {job_id} in "
+        f"{(datetime.datetime.now() - started).total_seconds():.2f}s"
+    )
+
+    new_id = str(uuid.uuid4())
+    now = datetime.datetime.now()
+    replay = {
+        "job_id": new_id,
+        "replay_of": job_id,
+        "timestamp": now,
+        "results": store_records(db, new_id, results),
+        "status": "finished",
+        "request": {
+            "target": targets, "tools": tools, "scanners": options
+        }
+    }
+    scans.insert_result(replay)
+    scans.insert_job({
+        "job_id": new_id,
+        "replay_of": job_id,
+        "targets": targets,
+        "initiator": initiator or job.get("initiator"),
+        "timestamp": now,
+        "status": "finished"
+    })
+    return replay
@@ -0,0 +1,200 @@
+"""
+Asynchronous DNS resolution stage
+
+Runs between subdomain discovery and port scanning: resolves every
+host with bounded concurrency, drops hosts that do not exist
+(NXDOMAIN) and builds the HostMap used by later stages. Names without
+A records (IPv6-only hosts, CNAMEs to them) exist and are kept as
+unresolved, later stages reach them by name.
+Answers are shared between workers through a Redis cache, negative
+answers are cached too so dead subdomains are not queried on every job
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+import dns.asyncresolver
+import dns.exception
+import dns.resolver
+
+from bountyforge.core.cache import RedisCache
+from bountyforge.core.hostmap import HostMap, is_ip, normalize_host
+
+logger = logging.getLogger(__name__)
+
+RESOLVED = "resolved"
+NXDOMAIN = "nxdomain"
+NOANSWER = "noanswer"
+ERROR = "error"
+
+
+@dataclass
+class Resolution:
+    """
+    Result of resolving one host
+    """
+    host: str
+    status: str
+    ips: List[str] = field(default_factory=list)
+    ttl: int = 0
+    cached: bool = False
+
+    @property
+    def is_dead(self) -> bool:
+        return self.status == NXDOMAIN
+
+
+class AsyncResolver:
+    """
+    asyncio resolver with bounded concurrency and a shared TTL cache
+    """
+
+    def __init__(
+        self,
+        nameservers: Optional[List[str]] = None,
+        port: int = 53,
+        concurrency: int = 100,
+        timeout: float = 3.0,
+        cache: Optional[RedisCache] = None,
+        negative_ttl: int = 300,
+        max_ttl: int = 3600
+    ) -> None:
+        """
+        :param nameservers: resolver addresses, system ones if empty
+        :param port: nameserver port (a stub server in tests)
+        :param concurrency: maximum number of queries in flight
+        :param timeout: lifetime of a single query in seconds
+        :param cache: shared cache for positive and negative answers
+        :param negative_ttl: how long NXDOMAIN / no-answer is cached
+        :param max_ttl: upper bound for caching positive answers
+        """
+        self.nameservers = nameservers or []
+        self.port = port
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.cache = cache
+        self.negative_ttl = negative_ttl
+        self.max_ttl = max_ttl
+
+    def _make_resolver(self) -> dns.asyncresolver.Resolver:
+        resolver = dns.asyncresolver.Resolver(
+            configure=not self.nameservers
+        )
+        # port has to be set first, nameservers are bound to it
+        resolver.port = self.port
+        if self.nameservers:
+            resolver.nameservers = self.nameservers
+        resolver.lifetime = self.timeout
+        resolver.cache = None
+        return resolver
+
+    async def _query(
+        self,
+        resolver: dns.asyncresolver.Resolver,
+        semaphore: asyncio.Semaphore,
+        host: str
+    ) -> Resolution:
+        async with semaphore:
+            try:
+                answer = await resolver.resolve(host, "A", search=False)
+            except dns.resolver.NXDOMAIN:
+                return Resolution(host, NXDOMAIN, ttl=self.negative_ttl)
+            except dns.resolver.NoAnswer:
+                return Resolution(host, NOANSWER, ttl=self.negative_ttl)
+            except (dns.exception.DNSException, OSError) as e:
+                logger.debug(f"[AsyncResolver] {host}: {e}")
+                return Resolution(host, ERROR)
+
+        ips = [rdata.address for rdata in answer]
+        ttl = min(answer.rrset.ttl, self.max_ttl) if answer.rrset else 0
+        return Resolution(host, RESOLVED, ips=ips, ttl=ttl)
+
+    def _from_cache(self, hosts: List[str]) -> Dict[str, Resolution]:
+        if self.cache is None:
+            return {}
+        return {
+            host: Resolution(
+                host,
+                value.get("status", RESOLVED),
+                ips=value.get("ips", []),
+                cached=True
+            )
+            for host, value in self.cache.get_many(hosts).items()
+        }
+
+    def _to_cache(self, results: Iterable[Resolution]) -> None:
+        if self.cache is None:
+            return
+        by_ttl: Dict[int, Dict[str, dict]] = defaultdict(dict)
+        for res in results:
+            # transient errors are never cached
+            if res.cached or res.status == ERROR:
+                continue
+            by_ttl[res.ttl][res.host] = {"status": res.status, "ips": res.ips}
+        for ttl, items in by_ttl.items():
+            self.cache.set_many(items, ttl)
+
+    async def resolve_many(
+        self,
+        hosts: Iterable[str]
+    ) -> Dict[str, Resolution]:
+        """
+        Resolve hosts, answering from the cache where possible
+
+        :param hosts: host names or addresses
+        :return: mapping host -> Resolution
+        """
+        hosts = list(dict.fromkeys(hosts))
+        results: Dict[str, Resolution] = {
+            host: Resolution(host, RESOLVED, ips=[host])
+            for host in hosts if is_ip(host)
+        }
+        pending = [host for host in hosts if host not in results]
+        results.update(self._from_cache(pending))
+        pending = [host for host in pending if host not in results]
+
+        if pending:
+            resolver = self._make_resolver()
+            semaphore = asyncio.Semaphore(self.concurrency)
+            answers = await asyncio.gather(*(
+                self._query(resolver, semaphore, host) for host in pending
+            ))
+            self._to_cache(answers)
+            results.update({res.host: res for res in answers})
+        return results
+
+    def resolve(
+        self,
+        targets: Iterable[str],
+        cdn_ranges: Optional[Dict[str, List[str]]] = None
+    ) -> tuple[HostMap, List[str]]:
+        """
+        Synchronous entry point for the pipeline
+
+        :param targets: hostnames, addresses or URLs
+        :param cdn_ranges: override of the CDN ranges for the HostMap
+        :return: HostMap of live hosts and list of dropped (dead) hosts
+        """
+        hosts = [normalize_host(t) for t in targets if t]
+        results = asyncio.run(self.resolve_many(hosts))
+
+        hostmap = HostMap(cdn_ranges)
+        dead: List[str] = []
+        for host, res in results.items():
+            if res.is_dead:
+                dead.append(host)
+            else:
+                # errors and names without A records are kept as
+                # unresolved and scanned by name
+                hostmap.add(host, res.ips)
+
+        cached = sum(1 for res in results.values() if res.cached)
+        logger.info(
+            f"[AsyncResolver] {len(results)} hosts: "
+            f"{len(hostmap.hosts)} resolved, {len(dead)} dead, "
+            f"{len(hostmap.unresolved)} failed, {cached} from cache"
+        )
+        return hostmap, dead
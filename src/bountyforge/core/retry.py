@@ -0,0 +1,114 @@
+"""
+Retries of failed tool invocations
+
+Modules run their tool once per invocation: a host of nmap, a batch
+of httpx URLs, a subfinder domain, an ffuf pass, a nuclei template
+shard. When one of these invocations fails for a transient reason
+(killed by the OOM killer, a tool-level network error) only it is
+retried with exponential backoff instead of failing or re-running the
+whole stage. Retries of a job share one budget, so a broken environment
+does not multiply the scan time.
+
+Only tool level failures are retried: per-target errors ("connection
+refused" on one host) are routine in the stderr of a batch and never
+trigger a retry
+"""
+
+import logging
+import random
+import re
+import signal
+from typing import Any, Dict, Optional
+
+from bountyforge.core.recursion import RequestBudget
+
+logger = logging.getLogger(__name__)
+
+# negative return codes of processes killed by these signals
+RETRYABLE_SIGNALS = {signal.SIGKILL, signal.SIGSEGV, signal.SIGBUS}
+# exit codes of shells/wrappers reporting a killed child (128 + signal)
+RETRYABLE_EXIT_CODES = {128 + sig for sig in RETRYABLE_SIGNALS}
+# never retried: usage errors, missing binary, not executable
+FATAL_EXIT_CODES = {2, 126, 127}
+
+# stderr lines (with their indented details) of errors that stopped the
+# tool, not of a single target: [FTL] of the projectdiscovery tools, Go
+# panics, ffuf and nmap aborts
+TOOL_ERROR_LINES = re.compile(
+    r"^(?:.*\[(?:FTL|FATAL)\]|\s*(?:fatal|panic)\b|.*encountered error|"
+    r".*quitting!).*(?:\n[ \t]+.*)*",
+    re.IGNORECASE | re.MULTILINE
+)
+TRANSIENT_ERRORS = re.compile(
+    r"connection (?:refused|reset|timed out)|no route to host|"
+    r"network is unreachable|temporary failure in name resolution|"
+    r"i/o timeout|tls handshake timeout|too many open files|"
+    r"cannot allocate memory|resource temporarily unavailable",
+    re.IGNORECASE
+)
+
+
+def is_retryable(result: Dict[str, Any]) -> bool:
+    """
+    Classify a failed _execute_command result as transient or fatal
+    """
+    if result.get("success") or result.get("truncated"):
+        return False
+    code = result.get("returncode")
+    if code is None or code in FATAL_EXIT_CODES:
+        return False
+    if code < 0 and -code in RETRYABLE_SIGNALS:
+        return True
+    if code in RETRYABLE_EXIT_CODES:
+        return True
+    error = result.get("error") or ""
+    tool_errors = "\n".join(
+        m.group(0) for m in TOOL_ERROR_LINES.finditer(error)
+    )
+    return bool(TRANSIENT_ERRORS.search(tool_errors))
+
+
+class RetryPolicy:
+    """
+    Retry limits of one job shared by all of its modules
+    """
+
+    def __init__(
+        self,
+        max_retries: int = 2,
+        base_delay: float = 2.0,
+        max_delay: float = 60.0,
+        budget: Optional[RequestBudget] = None
+    ) -> None:
+        """
+        :param max_retries: retries of a single invocation
+        :param base_delay: delay before the first retry in seconds,
+            doubled for every further one
+        :param max_delay: upper bound of a delay
+        :param budget: retries left for the whole job, None for no limit
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget = budget
+
+    def delay(self, attempt: int) -> float:
+        """
+        Backoff before retry number `attempt` (1-based) with jitter
+        """
+        delay = min(self.base_delay * 2 ** (attempt - 1), self.max_delay)
+        return delay * random.uniform(0.5, 1.0)
+
+    def allow(self, attempt: int, result: Dict[str, Any]) -> bool:
+        """
+        Whether a failed invocation may be retried once more
+
+        :param attempt: number of the retry that would follow
+        :param result: result of the failed invocation
+        """
+        if attempt > self.max_retries or not is_retryable(result):
+            return False
+        if self.budget is not None and not self.budget.try_spend(1):
+            logger.warning("[RetryPolicy] Job retry budget exhausted")
+            return False
+        return True
@@ -0,0 +1,135 @@
+"""
+Service routing between the port scan and protocol-specific stages
+
+nmap reports every open port, but only HTTP(S)-capable endpoints are
+worth probing with httpx. The router classifies parsed nmap entries by
+service name and port heuristics and groups `host:port` targets by the
+stage that should handle them
+"""
+
+import logging
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+HTTP_ROUTE = "http"
+UNKNOWN_ROUTE = "unknown"
+
+# Ports that commonly serve HTTP(S) when nmap can not tell the service
+HTTP_PORTS = {
+    80, 81, 280, 443, 591, 593, 800, 888, 1080, 2082, 2083, 2086, 2087,
+    3000, 3001, 4000, 4443, 4848, 5000, 5001, 5601, 7001, 7443, 8000,
+    8001, 8008, 8080, 8081, 8088, 8181, 8443, 8800, 8880, 8888, 9000,
+    9001, 9090, 9200, 9443, 10000, 10443,
+}
+
+# Service names nmap uses for HTTP-like services
+HTTP_SERVICES = {
+    "http", "https", "http-alt", "https-alt", "http-proxy", "http-mgmt",
+    "http-rpc-epmap", "webcache", "sun-answerbook", "upnp", "ipp",
+    "radan-http", "xmpp-bosh",
+}
+
+# Service names that are not specific enough to decide by name alone
+AMBIGUOUS_SERVICES = {"unknown", "tcpwrapped", "ssl", "tls"}
+
+# Service name -> protocol route for future protocol-specific stages
+PROTOCOL_ROUTES = {
+    "ssh": "ssh",
+    "ftp": "ftp",
+    "ftps": "ftp",
+    "telnet": "telnet",
+    "smtp": "smtp",
+    "smtps": "smtp",
+    "submission": "smtp",
+    "pop3": "mail",
+    "pop3s": "mail",
+    "imap": "mail",
+    "imaps": "mail",
+    "domain": "dns",
+    "microsoft-ds": "smb",
+    "netbios-ssn": "smb",
+    "msrpc": "rpc",
+    "rpcbind": "rpc",
+    "ldap": "ldap",
+    "ldaps": "ldap",
+    "ms-wbt-server": "rdp",
+    "vnc": "vnc",
+    "snmp": "snmp",
+    "mysql": "database",
+    "postgresql": "database",
+    "ms-sql-s": "database",
+    "oracle-tns": "database",
+    "mongodb": "database",
+    "redis": "database",
+    "memcache": "database",
+    "cassandra": "database",
+}
+
+
+def _split_port(port: Any) -> tuple[int, str]:
+    """
+    Split nmap port notation ("443/tcp") into number and transport
+    """
+    number, _, proto = str(port).partition("/")
+    try:
+        return int(number), proto or "tcp"
+    except ValueError:
+        return 0, proto or "tcp"
+
+
+def classify_service(entry: Dict[str, Any]) -> str:
+    """
+    Decide which stage should handle a parsed nmap entry
+
+    :param entry: parsed nmap record with "port", "service", "state"
+    :return: HTTP_ROUTE, a protocol route name or UNKNOWN_ROUTE
+    """
+    port, proto = _split_port(entry.get("port"))
+    service = (entry.get("service") or "").lower().rstrip("?")
+    # "ssl/http" -> "http"
+    name = service.split("/")[-1]
+
+    if proto != "tcp":
+        return PROTOCOL_ROUTES.get(name, UNKNOWN_ROUTE)
+
+    if name in HTTP_SERVICES or name.startswith("http"):
+        return HTTP_ROUTE
+    if name in PROTOCOL_ROUTES:
+        return PROTOCOL_ROUTES[name]
+    if (name in AMBIGUOUS_SERVICES or not name) and port in HTTP_PORTS:
+        return HTTP_ROUTE
+    return UNKNOWN_ROUTE
+
+
+def route_services(entries: Iterable[Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    Group open ports from nmap results into `host:port` lists per route
+
+    :param entries: parsed nmap records
+    :return: mapping route name -> unique `host:port` targets
+    """
+    routes: Dict[str, List[str]] = defaultdict(list)
+    seen = set()
+    for entry in entries:
+        if entry.get("state", "open") != "open":
+            continue
+        host = entry.get("host") or entry.get("ip")
+        port, _ = _split_port(entry.get("port"))
+        if not host or not port:
+            continue
+
+        route = classify_service(entry)
+        target = f"{host}:{port}"
+        if (route, target) in seen:
+            continue
+        seen.add((route, target))
+        routes[route].append(target)
+
+    logger.info(
+        "Service routing: " + ", ".join(
+            f"{route}={len(targets)}" for route, targets in routes.items()
+        )
+    )
+    return dict(routes)
@@ -0,0 +1,271 @@
+"""
+Spilling of stage outputs to disk
+
+Keeping the raw output and parsed records of every stage in worker
+memory until the job ends gets large jobs OOM-killed. As soon as the
+pipeline is done with a stage, SpillStore appends its `result` and
+`parsed` fields to gzip-compressed NDJSON segments in a per-job
+directory and only a summary with the segment handles stays in memory.
+
+At the end of the job the segments are streamed into the
+`scan_result_chunks` collection in bounded chunks, so no single MongoDB
+document has to hold a whole stage. load_results reassembles a stored
+record for the API and replays
+"""
+
+import gzip
+import json
+import logging
+import os
+import shutil
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from bountyforge.core.executor import SpooledOutput
+
+logger = logging.getLogger(__name__)
+
+SPILLED_FIELDS = ("result", "parsed")
+
+
+def materialize(record: Any) -> Any:
+    """
+    Read spooled tool output back into a string and close its file
+
+    Records of list results (e.g. ffuf pass records) are copied with
+    their spooled outputs read back, other values are returned as is
+    """
+    if isinstance(record, SpooledOutput):
+        text = record.getvalue()
+        record.close()
+        return text
+    if isinstance(record, dict) and any(
+        isinstance(value, SpooledOutput) for value in record.values()
+    ):
+        return {key: materialize(value) for key, value in record.items()}
+    return record
+
+
+class SpillStore:
+    """
+    Append-only store of stage outputs of one job
+    """
+    # records per segment file
+    segment_records: int = 5000
+    # characters per record of a spilled raw output string
+    text_chunk: int = 1 << 20
+    # approximate bytes of records per stored MongoDB chunk
+    chunk_bytes: int = 4 << 20
+
+    def __init__(self, directory: str, job_id: str) -> None:
+        """
+        :param directory: base directory of the spill files
+        :param job_id: job whose outputs are spilled
+        """
+        self.job_id = job_id
+        self.path = os.path.join(directory, job_id)
+        os.makedirs(self.path, exist_ok=True)
+
+    def _write(
+        self,
+        stage: str,
+        field: str,
+        items: Iterable[Any]
+    ) -> Dict[str, Any]:
+        """
+        Append records to new segments of a stage field
+
+        :return: handle of the spilled field
+        """
+        segments: List[str] = []
+        count = 0
+        out = None
+        try:
+            for item in items:
+                if count % self.segment_records == 0:
+                    if out is not None:
+                        out.close()
+                    segment = os.path.join(
+                        self.path,
+                        f"{stage}.{field}.{len(segments):05d}.ndjson.gz"
+                    )
+                    out = gzip.open(segment, "wt", encoding="utf-8")
+                    segments.append(segment)
+                out.write(json.dumps(item, default=str) + "\n")
+                count += 1
+        finally:
+            if out is not None:
+                out.close()
+        return {"segments": segments, "count": count}
+
+    def spill(self, stage: str, res: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Move the outputs of a finished stage to disk
+
+        :param stage: pipeline stage
+        :param res: stage result
+        :return: the result without its outputs, with their handles
+            under "spilled"
+        """
+        summary = {k: v for k, v in res.items() if k not in SPILLED_FIELDS}
+        spilled = {}
+        for field in SPILLED_FIELDS:
+            value = res.get(field)
+            if isinstance(value, SpooledOutput):
+                spilled[field] = {
+                    **self._write(stage, field, value.chunks(self.text_chunk)),
+                    "type": "str"
+                }
+                value.close()
+            elif isinstance(value, str):
+                chunks = (
+                    value[i:i + self.text_chunk]
+                    for i in range(0, len(value), self.text_chunk)
+                )
+                spilled[field] = {**self._write(stage, field, chunks),
+                                  "type": "str"}
+            elif isinstance(value, list):
+                # one spooled pass output at a time is read back
+                records = (materialize(record) for record in value)
+                spilled[field] = {**self._write(stage, field, records),
+                                  "type": "list"}
+            elif field in res:
+                summary[field] = value
+        summary["spilled"] = spilled
+        logger.debug(
+            f"[SpillStore] {stage}: "
+            f"{ {f: h['count'] for f, h in spilled.items()} }"
+        )
+        return summary
+
+    @staticmethod
+    def _read(handle: Dict[str, Any]) -> Iterator[Any]:
+        for segment in handle.get("segments", []):
+            with gzip.open(segment, "rt", encoding="utf-8") as f:
+                for line in f:
+                    yield json.loads(line)
+
+    def iter_field(
+        self,
+        res: Dict[str, Any],
+        field: str
+    ) -> Iterator[Any]:
+        """
+        Records of a stage field, read back from disk if spilled
+        """
+        handle = (res.get("spilled") or {}).get(field)
+        if handle is None:
+            value = res.get(field)
+            yield from (value if isinstance(value, list) else [])
+            return
+        yield from self._read(handle)
+
+    def parsed(self, res: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Parsed records of a (possibly spilled) stage result
+        """
+        return list(self.iter_field(res, "parsed"))
+
+    def persist(self, db, results: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Stream the spilled outputs into `scan_result_chunks`
+
+        :param db: MongoDB database
+        :param results: pipeline results with spilled stages
+        :return: results to store in `scan_results`, spill handles
+            reduced to the stored type and number of records
+        """
+        stored = {}
+        for stage, res in results.items():
+            if not isinstance(res, dict) or "spilled" not in res:
+                stored[stage] = res
+                continue
+            spilled = {}
+            for field, handle in res["spilled"].items():
+                chunks = self._store_chunks(
+                    db, stage, field, self._read(handle)
+                )
+                spilled[field] = {
+                    "type": handle["type"],
+                    "count": handle["count"],
+                    "chunks": chunks
+                }
+            stored[stage] = {**res, "spilled": spilled}
+        return stored
+
+    def _store_chunks(
+        self,
+        db,
+        stage: str,
+        field: str,
+        items: Iterable[Any]
+    ) -> int:
+        seq = 0
+        batch: List[Any] = []
+        size = 0
+        for item in items:
+            batch.append(item)
+            size += len(json.dumps(item, default=str))
+            if size >= self.chunk_bytes:
+                self._insert_chunk(db, stage, field, seq, batch)
+                seq += 1
+                batch, size = [], 0
+        if batch:
+            self._insert_chunk(db, stage, field, seq, batch)
+            seq += 1
+        return seq
+
+    def _insert_chunk(
+        self,
+        db,
+        stage: str,
+        field: str,
+        seq: int,
+        items: List[Any]
+    ) -> None:
+        db.scan_result_chunks.insert_one({
+            "job_id": self.job_id,
+            "stage": stage,
+            "field": field,
+            "seq": seq,
+            "items": items
+        })
+
+    def cleanup(self) -> None:
+        """
+        Remove the spill files of the job
+        """
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def load_results(db, record: Optional[Dict[str, Any]]) -> Any:
+    """
+    Reassemble the spilled stage outputs of a `scan_results` record
+
+    :param db: MongoDB database
+    :param record: stored record, returned unchanged without spilled
+        stages
+    """
+    if not record or not isinstance(record.get("results"), dict):
+        return record
+    results = {}
+    for stage, res in record["results"].items():
+        if not isinstance(res, dict) or "spilled" not in res:
+            results[stage] = res
+            continue
+        spilled = res["spilled"] or {}
+        res = {k: v for k, v in res.items() if k != "spilled"}
+        for field, handle in spilled.items():
+            items: List[Any] = []
+            for chunk in db.scan_result_chunks.find(
+                {
+                    "job_id": record.get("job_id"),
+                    "stage": stage,
+                    "field": field
+                },
+                {"_id": 0, "items": 1}
+            ).sort("seq", 1):
+                items += chunk["items"]
+            res[field] = "".join(items) if handle.get("type") == "str"\
+                else items
+        results[stage] = res
+    return {**record, "results": results}
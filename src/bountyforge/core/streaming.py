@@ -0,0 +1,412 @@
+"""
+Streaming pipeline mode
+
+In the regular pipeline every stage waits for the previous one to
+finish: httpx cannot probe the first subdomain before subfinder has
+found all of them. StreamingPipeline connects the recon stages
+
+    subdomain discovery -> resolution -> nmap -> httpx
+
+with bounded queues. Discovery runs per root domain, and every stage
+consumes its input in micro-batches, handing results downstream as
+soon as a batch is done. A stage blocks on a full queue, so a slow
+consumer holds back its producer instead of buffering its output.
+
+The merged stage results have the shape of the regular ones, directory
+bruteforce and nuclei run on them as usual
+"""
+
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from bountyforge.config import settings
+from bountyforge.core.executor import join_outputs
+from bountyforge.core.hostmap import HostMap, normalize_host
+from bountyforge.core.routing import HTTP_ROUTE, route_services
+from bountyforge.core.task import ScanPipeline, merge_tool_opts
+
+logger = logging.getLogger(__name__)
+
+
+class StageQueue:
+    """
+    Bounded hand-off between two streaming stages
+    """
+    _CLOSED = object()
+
+    def __init__(self, maxsize: int = 500) -> None:
+        """
+        :param maxsize: items the queue holds before put blocks
+        """
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        # set once the consumer has taken the close signal
+        self._closed = False
+
+    def put(self, item: Any) -> None:
+        self._queue.put(item)
+
+    def close(self) -> None:
+        """
+        Signal the consumer that no more items follow
+        """
+        self._queue.put(self._CLOSED)
+
+    def batches(self, size: int, linger: float) -> Iterator[List[Any]]:
+        """
+        Micro-batches of queued items
+
+        A batch is handed out when it is full, when no further item
+        arrived for `linger` seconds or when the queue is closed
+
+        :param size: maximum items per batch
+        :param linger: seconds to wait for more items of a batch
+        """
+        batch: List[Any] = []
+        while True:
+            try:
+                item = self._queue.get(timeout=linger if batch else None)
+            except queue.Empty:
+                yield batch
+                batch = []
+                continue
+            if item is self._CLOSED:
+                self._closed = True
+                if batch:
+                    yield batch
+                return
+            batch.append(item)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+
+    def drain(self) -> None:
+        """
+        Discard items until the queue is closed, so the producer of
+        a failed consumer does not block forever
+        """
+        while not self._closed:
+            self._closed = self._queue.get() is self._CLOSED
+
+
+class StageAccumulator:
+    """
+    Merges the per-batch results of a module into one stage result
+    """
+
+    def __init__(self) -> None:
+        self.res: Dict[str, Any] = {"result": "", "parsed": []}
+        self.batches = 0
+
+    def add(self, res: Dict[str, Any]) -> None:
+        self.batches += 1
+        merged = self.res
+        output = res.get("result")
+        if isinstance(output, list):
+            if not isinstance(merged["result"], list):
+                merged["result"] = []
+            merged["result"] += output
+        elif output:
+            merged["result"] = join_outputs([merged["result"], output])
+        merged["parsed"] += res.get("parsed", [])
+        errors = list(res.get("errors") or [])
+        if "error" in res:
+            errors.append(res["error"])
+        if errors:
+            merged.setdefault("errors", []).extend(errors)
+        if res.get("truncated"):
+            merged["truncated"] = True
+        resources = merged.setdefault("resources", {})
+        for key, value in (res.get("resources") or {}).items():
+            if key == "max_rss_kb":
+                resources[key] = max(resources.get(key, 0), value)
+            else:
+                resources[key] = resources.get(key, 0) + value
+        for key, value in res.items():
+            merged.setdefault(key, value)
+
+    def result(self) -> Dict[str, Any]:
+        return {**self.res, "batches": self.batches}
+
+
+class StreamingPipeline(ScanPipeline):
+    """
+    ScanPipeline with the recon stages connected by bounded queues
+    """
+
+    def __init__(
+        self,
+        *args,
+        batch_size: Optional[int] = None,
+        linger: Optional[float] = None,
+        queue_size: Optional[int] = None,
+        **kwargs
+    ) -> None:
+        """
+        Arguments of ScanPipeline and
+
+        :param batch_size: targets per micro-batch of a stage
+        :param linger: seconds a stage waits to fill a micro-batch
+        :param queue_size: capacity of the queues between stages
+        """
+        super().__init__(*args, **kwargs)
+        backend = settings.backend
+        self.batch_size = batch_size or backend.stream_batch
+        self.linger = linger if linger is not None else backend.stream_linger
+        self.queue_size = queue_size or backend.stream_queue
+        self.hostmap = None
+        self.dead: List[str] = []
+        self._lock = threading.Lock()
+        self._stages: Dict[str, StageAccumulator] = {}
+        # nmap entries of addresses scanned in earlier batches
+        self._scanned: Dict[str, List[Dict[str, Any]]] = {}
+        self._errors: Dict[str, str] = {}
+        self._sink: List[str] = []
+        # time budgets run from the first batch of a stage
+        self._deadlines: Dict[str, float] = {}
+
+    def _stage_deadline(
+        self,
+        stage: str,
+        budget: Optional[int]
+    ) -> Optional[float]:
+        """
+        One deadline for all micro-batches of a stage, so a stage of
+        N batches runs for its time budget and not N times as long
+        """
+        if not budget:
+            return None
+        with self._lock:
+            return self._deadlines.setdefault(
+                stage, time.monotonic() + budget
+            )
+
+    def _accumulate(self, stage: str, res: Dict[str, Any]) -> None:
+        with self._lock:
+            self._stages.setdefault(stage, StageAccumulator()).add(res)
+        self._publish(res.get("result", []))
+
+    def _discover(self, outbox: StageQueue) -> None:
+        """
+        Emit the initial targets, then the subdomains of every root
+        as soon as its discovery finished
+        """
+        seen = set()
+
+        def emit(targets: Iterable[str]) -> None:
+            for target in targets:
+                if target not in seen:
+                    seen.add(target)
+                    outbox.put(target)
+
+        emit(self.initial_targets)
+        sources = []
+        if "subfinder" in self.tools:
+            cfg = merge_tool_opts("subfinder", self.options)
+            sources.append(
+                ("subfinder", cfg, self._subfinder_module)
+            )
+        if "ffuf_subdomainbruteforce" in self.tools:
+            cfg = merge_tool_opts("ffuf", self.options)
+            sources.append(
+                ("ffuf_subdomainbruteforce", cfg,
+                 self._subdomain_bruteforce_module)
+            )
+        for root in self.initial_targets:
+            for stage, cfg, factory in sources:
+                res = self._run_module(stage, factory([root], cfg), cfg)
+                self._accumulate(stage, res)
+                emit(r["host"] for r in res.get("parsed", []))
+
+    def _resolve(self, batch: List[str]) -> List[str]:
+        """
+        Resolve a batch into the shared host map, dropping dead hosts
+        """
+        dns_cfg = merge_tool_opts("dns", self.options)
+        cdn_ranges = merge_tool_opts("nmap", self.options).get("cdn_ranges")
+        if self._dns_enabled(dns_cfg):
+            hostmap, dead = self._resolve_dns(dns_cfg, cdn_ranges, batch)
+        else:
+            hostmap, dead = self._build_hostmap(cdn_ranges, batch), []
+        with self._lock:
+            if self.hostmap is None:
+                self.hostmap = HostMap(cdn_ranges)
+            for host in hostmap.hosts:
+                self.hostmap.add(host, hostmap.ips_for(host))
+            for host in hostmap.unresolved:
+                self.hostmap.add(host, [])
+            self.dead += dead
+        dead_hosts = set(dead)
+        return [t for t in batch if normalize_host(t) not in dead_hosts]
+
+    def _port_scan(self, batch: List[str]) -> List[str]:
+        """
+        Port-scan the addresses of a batch not scanned before,
+        returning its HTTP(S) services
+        """
+        cfg = merge_tool_opts("nmap", self.options)
+        skip_cdn = self._nmap_skip_cdn(cfg)
+        hosts = {normalize_host(t) for t in batch}
+        with self._lock:
+            hostmap = HostMap.from_dict(
+                {
+                    h: self.hostmap.ips_for(h)
+                    for h in hosts if self.hostmap.ips_for(h)
+                },
+                [h for h in self.hostmap.unresolved if h in hosts],
+                cfg.get("cdn_ranges")
+            )
+        targets = hostmap.scan_targets(skip_cdn=skip_cdn)
+        pending = [t for t in targets if t not in self._scanned]
+        # entries of addresses shared with earlier batches are reused
+        entries = [
+            e for t in targets if t not in pending
+            for e in self._scanned[t]
+        ]
+        res: Dict[str, Any] = {"result": "", "parsed": []}
+        if pending:
+            res = self._run_module(
+                "nmap", self._nmap_module(pending, cfg), cfg
+            )
+            for target in pending:
+                self._scanned[target] = []
+            for entry in res.get("parsed", []):
+                key = entry.get("ip") or entry.get("host")
+                self._scanned.setdefault(key, []).append(entry)
+                entries.append(entry)
+        res["parsed"] = hostmap.fan_out(entries, skipped_cdn=skip_cdn)
+        routes = route_services(res["parsed"])
+        with self._lock:
+            for route, services in routes.items():
+                self.routes.setdefault(route, []).extend(services)
+        self._accumulate("nmap", res)
+        return routes.get(HTTP_ROUTE, [])
+
+    def _probe(self, batch: List[str]) -> List[str]:
+        cfg = merge_tool_opts("httpx", self.options)
+        res = self._run_module("httpx", self._httpx_module(batch, cfg), cfg)
+        self._accumulate("httpx", res)
+        return []
+
+    def _worker(
+        self,
+        stage: str,
+        inbox: StageQueue,
+        outbox: Optional[StageQueue],
+        handle: Callable[[List[str]], List[str]]
+    ) -> None:
+        try:
+            for batch in inbox.batches(self.batch_size, self.linger):
+                logger.info(
+                    f"[StreamingPipeline] {stage}: batch of {len(batch)}"
+                )
+                for item in handle(batch):
+                    if outbox is not None:
+                        outbox.put(item)
+        except Exception as e:
+            logger.exception(f"[StreamingPipeline] {stage} failed: {e}")
+            self._errors[stage] = str(e)
+            inbox.drain()
+        finally:
+            if outbox is not None:
+                outbox.close()
+
+    def _run_source(self, outbox: StageQueue) -> None:
+        try:
+            self._discover(outbox)
+        except Exception as e:
+            logger.exception(f"[StreamingPipeline] discovery failed: {e}")
+            self._errors["discovery"] = str(e)
+        finally:
+            outbox.close()
+
+    def _collect(self, batch: List[str]) -> List[str]:
+        self._sink += batch
+        return []
+
+    def _stream(self) -> None:
+        """
+        Run the recon stages connected by queues until all are drained
+        """
+        dns_cfg = merge_tool_opts("dns", self.options)
+        stages: List[tuple] = []
+        if self._dns_enabled(dns_cfg) or "nmap" in self.tools:
+            stages.append(("resolve", self._resolve))
+        if "nmap" in self.tools:
+            stages.append(("nmap", self._port_scan))
+        if "httpx" in self.tools:
+            stages.append(("httpx", self._probe))
+        else:
+            stages.append(("collect", self._collect))
+
+        queues = [StageQueue(self.queue_size) for _ in stages]
+        threads = [threading.Thread(
+            target=self._run_source, args=(queues[0],), daemon=True
+        )]
+        for i, (stage, handle) in enumerate(stages):
+            outbox = queues[i + 1] if i + 1 < len(queues) else None
+            threads.append(threading.Thread(
+                target=self._worker,
+                args=(stage, queues[i], outbox, handle),
+                daemon=True
+            ))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def _finish_stream(self) -> None:
+        """
+        Store the merged results of the streamed stages
+        """
+        for stage in ("subfinder", "ffuf_subdomainbruteforce"):
+            if stage in self.tools:
+                acc = self._stages.get(stage) or StageAccumulator()
+                self.results[stage] = acc.result()
+                self._spill(stage)
+
+        if self.hostmap is not None and self._dns_enabled(
+            merge_tool_opts("dns", self.options)
+        ):
+            self.results["dns"] = {
+                "hostmap": self.hostmap.as_dict(),
+                "unresolved": self.hostmap.unresolved,
+                "dead": self.dead
+            }
+
+        if "nmap" in self.tools:
+            res = (self._stages.get("nmap") or StageAccumulator()).result()
+            res["hostmap"] = self.hostmap.as_dict() if self.hostmap else {}
+            res["routes"] = self.routes
+            self.results["nmap"] = res
+            self.targets = self.routes.get(HTTP_ROUTE, [])
+            self._spill("nmap")
+
+        if "httpx" in self.tools:
+            res = (self._stages.get("httpx") or StageAccumulator()).result()
+            self.results["httpx"] = res
+            self._finish_httpx(res)
+            self._spill("httpx")
+        elif "nmap" not in self.tools:
+            self.targets = list(self._sink)
+
+        if self._errors:
+            self.results["streaming_errors"] = dict(self._errors)
+
+    def run(self) -> Dict[str, Any]:
+        logger.info(
+            f"[StreamingPipeline] batches of {self.batch_size}, "
+            f"queues of {self.queue_size}"
+        )
+        self._stream()
+        self._finish_stream()
+
+        if "ffuf_directorybruteforce" in self.tools:
+            self._run_directory_bruteforce()
+
+        if "nuclei" in self.tools:
+            self._run_nuclei()
+
+        return self.results
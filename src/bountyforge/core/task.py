@@ -1,15 +1,33 @@
 import datetime
 import logging
 import json
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from celery import Celery
-from pymongo import MongoClient
 import redis
 
 from bountyforge.config import settings
 from bountyforge.core import module_manager
 from bountyforge.core.module_base import ScanType, TargetType
+from bountyforge.core.cache import RedisCache
+from bountyforge.core.executor import SpooledOutput
+from bountyforge.core.clustering import (
+    Cluster, attribute_findings, cluster_responses
+)
+from bountyforge.core.findings import aggregate_findings
+from bountyforge.core.fingerprints import FingerprintCache
+from bountyforge.core.hostmap import HostMap, normalize_host, resolve_hosts
+from bountyforge.core.incremental import RescanPlanner
+from bountyforge.core.probe_cache import ProbeCache
+from bountyforge.core.progress import ProgressReporter
+from bountyforge.core.records import STAGE_COLLECTIONS, store_records
+from bountyforge.core.recursion import RequestBudget
+from bountyforge.core.retry import RetryPolicy
+from bountyforge.core.spill import SpillStore, materialize
+from bountyforge.core.resolver import AsyncResolver
+from bountyforge.core.routing import HTTP_ROUTE, route_services
+from bountyforge.core.template_routing import TemplateGroup, route_templates
+from bountyforge.repository import BulkWriter, ScanRepository, get_db
 
 logger = logging.getLogger(__name__)
 
@@ -18,8 +36,7 @@ celery = Celery(
     broker=settings.backend.celery_broker_url,
 )
 
-mongo = MongoClient(settings.backend.mongo_url)
-db = mongo.get_default_database()
+db = get_db()
 
 redis_client = redis.Redis.from_url(settings.backend.celery_broker_url)
 
@@ -37,6 +54,11 @@ def merge_tool_opts(tool: str, options: Dict[str, Any]) -> Dict[str, Any]:
     if flags is None:
         flags = default_cfg.get("additional_flags")
     cfg["additional_flags"] = flags
+    budget = run_cfg.get("time_budget")
+    cfg["time_budget"] = budget if budget is not None\
+        else default_cfg.get("time_budget")
+    cfg["batch_size"] = run_cfg.get("batch_size")\
+        or default_cfg.get("batch_size")
 
     # tool-specific options
     if tool == "ffuf" or tool.startswith("ffuf_"):
@@ -44,24 +66,66 @@ def merge_tool_opts(tool: str, options: Dict[str, Any]) -> Dict[str, Any]:
             or default_cfg.get("dns_wordlist")
         cfg["directories_wordlist"] = run_cfg.get("directories_wordlist")\
             or default_cfg.get("directories_wordlist")
+        for key in (
+            "recursion_depth", "host_request_budget", "job_request_budget"
+        ):
+            value = run_cfg.get(key)
+            cfg[key] = value if value is not None else default_cfg.get(key)
+    if tool == "dns":
+        for key in (
+            "enabled", "nameservers", "port", "concurrency", "timeout",
+            "negative_ttl", "max_ttl"
+        ):
+            value = run_cfg.get(key)
+            cfg[key] = value if value is not None else default_cfg.get(key)
     if tool == "nmap":
         mode = run_cfg.get("mode") or default_cfg.get("mode")
         cfg["mode"] = mode
+        skip_cdn = run_cfg.get("skip_cdn")
+        cfg["skip_cdn"] = skip_cdn if skip_cdn is not None\
+            else default_cfg.get("skip_cdn", True)
+        cfg["cdn_ranges"] = run_cfg.get("cdn_ranges")\
+            or default_cfg.get("cdn_ranges")
+        for key in (
+            "two_phase", "discovery", "discovery_rate", "workers",
+            "fingerprint_ttl"
+        ):
+            value = run_cfg.get(key)
+            cfg[key] = value if value is not None else default_cfg.get(key)
     if tool == "httpx":
         mode = run_cfg.get("mode") or default_cfg.get("mode")
         exclude = run_cfg.get("exclude") or default_cfg.get("exclude")
         cfg["mode"] = mode
         cfg["exclude"] = exclude
+        for key in ("cache_fresh_ttl", "cache_max_age"):
+            value = run_cfg.get(key)
+            cfg[key] = value if value is not None else default_cfg.get(key)
     if tool == "nuclei":
         mode = run_cfg.get("mode") or default_cfg.get("mode")
         templates = run_cfg.get("templates_dir")\
             or default_cfg.get("templates_dir")
         cfg["mode"] = mode
         cfg["templates_dir"] = templates
+        for key in (
+            "cluster_representatives", "tech_routing", "tech_tags", "shards",
+            "severity_tiers", "stop_after_tier", "incremental"
+        ):
+            value = run_cfg.get(key)
+            cfg[key] = value if value is not None else default_cfg.get(key)
 
     return cfg
 
 
+def _event_value(value: Any) -> Any:
+    """
+    JSON form of values json does not know, spooled tool output is
+    announced by its size instead of being read into the event
+    """
+    if isinstance(value, SpooledOutput):
+        return f"<{value.size} bytes of output>"
+    return str(value)
+
+
 class ScanPipeline:
     """
     ScanPipeline orchestrates a series of scanning tools
@@ -69,6 +133,7 @@ class ScanPipeline:
     ORDER = [
         "subfinder",
         "ffuf_subdomainbruteforce",
+        "dns",
         "nmap",
         "httpx",
         "ffuf_directorybruteforce",
@@ -83,149 +148,476 @@ class ScanPipeline:
         channel: str = None,
         rate_limit: int = 20,
         timeout: int = 10,
+        job_id: str = None,
+        retry_policy: RetryPolicy = None,
+        spill: SpillStore = None,
+        writer: BulkWriter = None,
     ):
         self.initial_targets = targets
         self.targets = targets
         self.tools = set(tools)
         self.options = options
         self.results: Dict[str, Any] = {}
+        self.routes: Dict[str, List[str]] = {}
+        self.hostmap: HostMap | None = None
+        self.clusters: List[Cluster] = []
         self.channel = channel
         self.rate_limit = rate_limit
         self.timeout = timeout
+        self.job_id = job_id
+        self.retry_policy = retry_policy
+        # finished stage outputs are moved to disk when set
+        self.spill = spill
+        # parsed records are written while the stages run when set
+        self.writer = writer
+        self.progress = ProgressReporter(
+            self._publish_progress, settings.backend.progress_interval
+        )
 
-    def run(self) -> Dict[str, Any]:
-        if "subfinder" in self.tools:
-            logger.info("[1] subfinder")
-            cfg = merge_tool_opts("subfinder", self.options)
-            mod = module_manager.get_module("subfinder")(
-                target=self.targets,
-                target_type=TargetType.MULTIPLE,
-                scan_type=cfg.get("mode"),
-                additional_flags=cfg.get("additional_flags"),
-                rate_limit=self.rate_limit
-            )
-            res = mod.run()
-            self.results["subfinder"] = res
-            hosts = [r["host"] for r in res.get("parsed", [])]
-            self.targets = list(set(self.targets + hosts))
-            redis_client.publish(
-                self.channel,
-                json.dumps(res.get("result", []))
-            )
-            logger.info(f"raw results: {res}")
+    def _publish(self, payload: Any) -> None:
+        """
+        Send an event to the job channel
+        """
+        redis_client.publish(
+            self.channel, json.dumps(payload, default=_event_value)
+        )
 
-        if "ffuf_subdomainbruteforce" in self.tools:
-            logger.info("[2] ffuf_subdomainbruteforce")
-            cfg = merge_tool_opts("ffuf", self.options)
-            mod = module_manager.get_module("ffuf")(
-                target=self.targets,
-                target_type=TargetType.MULTIPLE,
-                scan_type=ScanType.SUBDOMAIN,
-                wordlist="/app/wordlists/"+cfg.get("dns_wordlist"),
-                additional_flags=cfg.get("additional_flags"),
-                rate_limit=self.rate_limit
+    def _resolve_dns(
+        self,
+        dns_cfg: Dict[str, Any],
+        cdn_ranges: Dict[str, List[str]] | None,
+        targets: List[str] | None = None
+    ) -> Tuple[HostMap, List[str]]:
+        """
+        Resolve the targets (all current ones by default),
+        returning the host map and dead hosts
+        """
+        resolver = AsyncResolver(
+            nameservers=dns_cfg.get("nameservers"),
+            port=int(dns_cfg.get("port") or 53),
+            concurrency=int(dns_cfg.get("concurrency") or 100),
+            timeout=float(dns_cfg.get("timeout") or 3),
+            cache=RedisCache(redis_client, "dns"),
+            negative_ttl=int(dns_cfg.get("negative_ttl") or 0),
+            max_ttl=int(dns_cfg.get("max_ttl") or 0)
+        )
+        return resolver.resolve(
+            self.targets if targets is None else targets, cdn_ranges
+        )
+
+    def _build_hostmap(
+        self,
+        cdn_ranges: Dict[str, List[str]] | None,
+        targets: List[str] | None = None
+    ) -> HostMap:
+        """
+        Host map for nmap when the dns stage did not run
+        """
+        return resolve_hosts(
+            self.targets if targets is None else targets, cdn_ranges
+        )
+
+    def _spill(self, stage: str) -> Dict[str, Any]:
+        """
+        Keep only the summary of a finished stage in memory
+        """
+        res = self.results[stage]
+        if self.spill is not None:
+            self.results[stage] = self.spill.spill(stage, res)
+        elif isinstance(res.get("result"), list):
+            # the result is stored in one document without a spill store
+            res["result"] = [materialize(r) for r in res["result"]]
+        elif "result" in res:
+            res["result"] = materialize(res["result"])
+        return self.results[stage]
+
+    def _parsed(self, stage: str) -> List[Dict[str, Any]]:
+        """
+        Parsed records of a finished stage
+        """
+        res = self.results.get(stage, {})
+        if self.spill is not None:
+            return self.spill.parsed(res)
+        return res.get("parsed", [])
+
+    def _publish_progress(self, record: Dict[str, Any]) -> None:
+        self._publish({"event": "progress", "job_id": self.job_id, **record})
+
+    def _run_module(
+        self,
+        stage: str,
+        mod,
+        cfg: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        """
+        Run a module under the stall window (pipeline timeout)
+        and the stage time budget from the tool settings,
+        publishing its progress
+        """
+        mod.idle_timeout = self.timeout or None
+        mod.spool_threshold = settings.backend.spool_threshold or None
+        mod.stderr_limit = settings.backend.stderr_limit or None
+        mod.time_budget = cfg.get("time_budget") or None
+        mod.deadline = self._stage_deadline(stage, mod.time_budget)
+        mod.retry_policy = self.retry_policy
+        if cfg.get("batch_size"):
+            # every batch of targets is run and retried on its own
+            mod.batch_size = int(cfg["batch_size"])
+        mod.progress_callback = (
+            lambda record: self.progress.report(stage, record)
+        )
+        if self.writer is not None and stage in STAGE_COLLECTIONS:
+            mod.records_callback = (
+                lambda records, shard: self.writer.add(
+                    STAGE_COLLECTIONS[stage], stage, records, shard
+                )
             )
-            res = mod.run()
-            self.results["ffuf_subdomainbruteforce"] = res
-            hosts = [r["host"] for r in res.get("parsed", [])]
-            self.targets = list(set(self.targets + hosts))
-            redis_client.publish(
-                self.channel,
-                json.dumps(res.get("result", []))
+        res = mod.run()
+        if mod.truncated:
+            res["truncated"] = True
+        progress = self.progress.summary(stage)
+        if progress:
+            res["progress"] = progress
+        res["resources"] = dict(mod.resources)
+        self._store_resources(stage, mod)
+        return res
+
+    def _stage_deadline(
+        self,
+        stage: str,
+        budget: Optional[int]
+    ) -> Optional[float]:
+        """
+        Deadline of the stage time budget, None lets the module start
+        it with its first command (one module runs the whole stage)
+        """
+        return None
+
+    def _store_resources(self, stage: str, mod) -> None:
+        """
+        Record the resource cost of a stage for the sizing statistics
+        """
+        targets = mod.target if isinstance(mod.target, list) else [mod.target]
+        scan_type = getattr(mod.scan_type, "value", mod.scan_type)
+        try:
+            db.stage_resources.insert_one({
+                "job_id": self.job_id,
+                "stage": stage,
+                "tool": mod.binary_name,
+                "mode": scan_type,
+                "targets": len(targets),
+                **mod.resources,
+                "timestamp": datetime.datetime.now()
+            })
+        except Exception as e:
+            logger.warning(f"Storing resources of {stage} failed: {e}")
+
+    def _store_tier(self, tier: str, res: Dict[str, Any]) -> None:
+        """
+        Publish findings of a finished nuclei severity tier, they are
+        already stored by the records writer
+        """
+        findings = res.get("parsed", [])
+        if self.clusters and findings:
+            findings = attribute_findings(findings, self.clusters)
+        findings = aggregate_findings(findings)
+        self._publish({
+            "event": "nuclei_tier",
+            "job_id": self.job_id,
+            "tier": tier,
+            "findings": findings
+        })
+
+    def _subfinder_module(self, targets: List[str], cfg: Dict[str, Any]):
+        return module_manager.get_module("subfinder")(
+            target=targets,
+            target_type=TargetType.MULTIPLE,
+            scan_type=cfg.get("mode"),
+            additional_flags=cfg.get("additional_flags"),
+            rate_limit=self.rate_limit
+        )
+
+    def _subdomain_bruteforce_module(
+        self,
+        targets: List[str],
+        cfg: Dict[str, Any]
+    ):
+        return module_manager.get_module("ffuf")(
+            target=targets,
+            target_type=TargetType.MULTIPLE,
+            scan_type=ScanType.SUBDOMAIN,
+            wordlist="/app/wordlists/"+cfg.get("dns_wordlist"),
+            additional_flags=cfg.get("additional_flags"),
+            rate_limit=self.rate_limit
+        )
+
+    def _nmap_skip_cdn(self, cfg: Dict[str, Any]) -> bool:
+        """
+        Heavy scans skip CDN edges
+        """
+        return bool(cfg.get("skip_cdn")) and ScanType(cfg.get("mode")) in (
+            ScanType.AGGRESSIVE, ScanType.FULL
+        )
+
+    def _nmap_module(self, targets: List[str], cfg: Dict[str, Any]):
+        return module_manager.get_module("nmap")(
+            target=targets,
+            target_type=TargetType.MULTIPLE,
+            scan_type=ScanType(cfg.get("mode")),
+            additional_flags=cfg.get("additional_flags"),
+            rate_limit=self.rate_limit,
+            two_phase=bool(cfg.get("two_phase")),
+            discovery=cfg.get("discovery") or "nmap",
+            discovery_rate=int(cfg.get("discovery_rate") or 5000),
+            workers=int(cfg.get("workers") or 4),
+            fingerprint_cache=FingerprintCache(
+                db.service_fingerprints,
+                int(cfg.get("fingerprint_ttl") or 0)
             )
-            logger.info(f"raw results: {res}")
+        )
 
-        if "nmap" in self.tools:
-            logger.info("[3] nmap")
-            cfg = merge_tool_opts("nmap", self.options)
-            mod = module_manager.get_module("nmap")(
-                target=self.targets,
-                target_type=TargetType.MULTIPLE,
-                scan_type=ScanType(cfg.get("mode")),
-                additional_flags=cfg.get("additional_flags"),
-                rate_limit=self.rate_limit
+    def _httpx_module(self, targets: List[str], cfg: Dict[str, Any]):
+        return module_manager.get_module("httpx")(
+            target=targets,
+            target_type=TargetType.MULTIPLE,
+            scan_type=ScanType(cfg.get("mode")),
+            additional_flags=cfg.get("additional_flags"),
+            exclude=cfg.get("exclude") or [],
+            rate_limit=self.rate_limit,
+            probe_cache=ProbeCache(
+                RedisCache(redis_client, "httpx"),
+                fresh_ttl=int(cfg.get("cache_fresh_ttl") or 0),
+                max_age=int(cfg.get("cache_max_age") or 0)
             )
-            res = mod.run()
-            self.results["nmap"] = res
-            ports: List[str] = []
-            for entry in res.get("parsed", []):
-                h = entry.get("host") or entry.get("ip")
-                port_num = entry.get("port", "").split('/')[0]
-                ports.append(f"{h}:{port_num}")
-            self.targets = ports
-            redis_client.publish(
-                self.channel,
-                json.dumps(res.get("result", []))
+        )
+
+    def _dns_enabled(self, dns_cfg: Dict[str, Any]) -> bool:
+        return bool(dns_cfg.get("enabled")) and bool(self.tools - {
+            "subfinder", "ffuf_subdomainbruteforce"
+        })
+
+    def _run_subfinder(self) -> None:
+        logger.info("[1] subfinder")
+        cfg = merge_tool_opts("subfinder", self.options)
+        mod = self._subfinder_module(self.targets, cfg)
+        res = self._run_module("subfinder", mod, cfg)
+        self.results["subfinder"] = res
+        hosts = [r["host"] for r in res.get("parsed", [])]
+        self.targets = list(set(self.targets + hosts))
+        self._publish(res.get("result", []))
+        res = self._spill("subfinder")
+        logger.info(f"raw results: {res}")
+
+    def _run_subdomain_bruteforce(self) -> None:
+        logger.info("[2] ffuf_subdomainbruteforce")
+        cfg = merge_tool_opts("ffuf", self.options)
+        mod = self._subdomain_bruteforce_module(self.targets, cfg)
+        res = self._run_module("ffuf_subdomainbruteforce", mod, cfg)
+        self.results["ffuf_subdomainbruteforce"] = res
+        hosts = [r["host"] for r in res.get("parsed", [])]
+        self.targets = list(set(self.targets + hosts))
+        self._publish(res.get("result", []))
+        res = self._spill("ffuf_subdomainbruteforce")
+        logger.info(f"raw results: {res}")
+
+    def _run_dns(self, dns_cfg: Dict[str, Any]) -> None:
+        logger.info("[dns] resolution")
+        nmap_cfg = merge_tool_opts("nmap", self.options)
+        self.hostmap, dead = self._resolve_dns(
+            dns_cfg, nmap_cfg.get("cdn_ranges")
+        )
+        # dead subdomains never reach port scanning and httpx
+        dead_hosts = set(dead)
+        self.targets = [
+            t for t in self.targets
+            if normalize_host(t) not in dead_hosts
+        ]
+        res = {
+            "hostmap": self.hostmap.as_dict(),
+            "unresolved": self.hostmap.unresolved,
+            "dead": dead
+        }
+        self.results["dns"] = res
+        self._publish(res)
+
+    def _run_nmap(self) -> None:
+        logger.info("[3] nmap")
+        cfg = merge_tool_opts("nmap", self.options)
+        # scan every resolved address once, heavy scans skip CDN edges
+        if self.hostmap is None:
+            self.hostmap = self._build_hostmap(cfg.get("cdn_ranges"))
+        skip_cdn = self._nmap_skip_cdn(cfg)
+        mod = self._nmap_module(
+            self.hostmap.scan_targets(skip_cdn=skip_cdn), cfg
+        )
+        res = self._run_module("nmap", mod, cfg)
+        res["parsed"] = self.hostmap.fan_out(
+            res.get("parsed", []), skipped_cdn=skip_cdn
+        )
+        res["hostmap"] = self.hostmap.as_dict()
+        # only HTTP(S)-capable ports go to httpx, the rest is kept
+        # for protocol-specific stages
+        self.routes = route_services(res.get("parsed", []))
+        res["routes"] = self.routes
+        self.results["nmap"] = res
+        self.targets = self.routes.get(HTTP_ROUTE, [])
+        self._publish(res.get("result", []))
+        res = self._spill("nmap")
+        logger.info(f"raw results: {res}")
+
+    def _finish_httpx(self, res: Dict[str, Any]) -> None:
+        """
+        Live URLs of the httpx result become the targets,
+        similar responses are clustered for nuclei
+        """
+        live = [
+            r for r in res.get("parsed", [])
+            if (r.get("status_code") or r.get("status") or 0) < 400
+        ]
+        self.targets = [r["url"] for r in live]
+        nuclei_cfg = merge_tool_opts("nuclei", self.options)
+        self.clusters = cluster_responses(
+            live, int(nuclei_cfg.get("cluster_representatives") or 0)
+        ) if nuclei_cfg.get("cluster_representatives") else []
+        res["clusters"] = [
+            {"members": c.members, "representatives": c.representatives}
+            for c in self.clusters if c.followers
+        ]
+
+    def _run_httpx(self) -> None:
+        logger.info("[4] httpx")
+        cfg = merge_tool_opts("httpx", self.options)
+        mod = self._httpx_module(self.targets, cfg)
+        res = self._run_module("httpx", mod, cfg)
+        self.results["httpx"] = res
+        self._finish_httpx(res)
+        self._publish(res.get("result", []))
+        res = self._spill("httpx")
+        logger.info(f"raw results: {res}")
+
+    def _run_directory_bruteforce(self) -> None:
+        logger.info("[5] ffuf_directorybruteforce")
+        cfg = merge_tool_opts("ffuf", self.options)
+        # unset keys keep the module defaults, a YAML ffuf block
+        # replaces the default settings as a whole
+        recursion = {
+            key: int(cfg[key])
+            for key in (
+                "recursion_depth", "host_request_budget",
+                "job_request_budget"
             )
-            logger.info(f"raw results: {res}")
+            if cfg.get(key) is not None
+        }
+        mod = module_manager.get_module("ffuf")(
+            target=self.targets,
+            target_type=TargetType.MULTIPLE,
+            scan_type=ScanType.DEFAULT,
+            wordlist="/app/wordlists/"+cfg.get("directories_wordlist"),
+            additional_flags=cfg.get("additional_flags"),
+            rate_limit=self.rate_limit,
+            **recursion
+        )
+        res = self._run_module("ffuf_directorybruteforce", mod, cfg)
+        self.results["ffuf_directorybruteforce"] = res
+        self.targets += [r.get("url") for r in res.get("parsed", [])]
+        self._publish(res.get("result", []))
+        res = self._spill("ffuf_directorybruteforce")
+        logger.info(f"raw results: {res}")
+        logger.info(
+            f"Targets after ffuf_directorybruteforce: {self.targets}"
+        )
 
-        if "httpx" in self.tools:
-            logger.info("[4] httpx")
-            cfg = merge_tool_opts("httpx", self.options)
-            mod = module_manager.get_module("httpx")(
-                target=self.targets,
-                target_type=TargetType.MULTIPLE,
-                scan_type=ScanType(cfg.get("mode")),
-                additional_flags=cfg.get("additional_flags"),
-                exclude=cfg.get("exclude") or [],
-                rate_limit=self.rate_limit
+    def _run_nuclei(self) -> None:
+        logger.info("[6] nuclei")
+        cfg = merge_tool_opts("nuclei", self.options)
+        self.targets += [
+                "http://192.168.2.130"
+        ]
+        # only cluster representatives are scanned
+        followers = {
+            url for cluster in self.clusters for url in cluster.followers
+        }
+        targets = [t for t in self.targets if t not in followers]
+        httpx_records = self._parsed("httpx")
+        # unchanged URLs are rescanned only with new templates
+        plan = planner = None
+        if cfg.get("incremental"):
+            planner = RescanPlanner(
+                db.nuclei_state,
+                db.template_snapshots,
+                module_manager.get_module("nuclei").template_index(
+                    cfg.get("templates_dir") or ""
+                )
             )
-            res = mod.run()
-            self.results["httpx"] = res
-            urls = [
-                r["url"] for r in res.get("parsed", [])
-                if r.get("status", 0) < 400
+            plan = planner.plan(targets, httpx_records)
+            targets = plan.targets
+        groups = route_templates(
+            targets, httpx_records, cfg.get("tech_tags")
+        ) if cfg.get("tech_routing") else None
+        if plan is not None:
+            plan_groups = groups or [
+                TemplateGroup(frozenset(), [], targets=targets)
             ]
-            self.targets = urls
-            redis_client.publish(
-                self.channel,
-                json.dumps(res.get("result", []))
+            groups = plan.split(plan_groups)
+        mod = module_manager.get_module("nuclei")(
+            target=targets,
+            target_type=TargetType.MULTIPLE,
+            scan_type=ScanType(cfg.get("mode")),
+            templates_dir=cfg.get("templates_dir"),
+            additional_flags=cfg.get("additional_flags"),
+            rate_limit=self.rate_limit,
+            groups=groups,
+            shards=int(cfg.get("shards") or 1),
+            severity_tiers=bool(cfg.get("severity_tiers")),
+            stop_after_tier=cfg.get("stop_after_tier") or None,
+            on_tier=self._store_tier,
+            # the index loaded for planning serves the shards too
+            index=planner.index if planner is not None else None
+        )
+        if plan is not None and not groups:
+            res = {"result": "", "parsed": []}
+        else:
+            res = self._run_module("nuclei", mod, cfg)
+        if plan is not None:
+            res["parsed"] = res.get("parsed", []) + plan.carried
+            res["incremental"] = plan.summary()
+            # a partial run must not mark templates as scanned
+            if not res.get("errors") and "error" not in res\
+                    and not cfg.get("stop_after_tier"):
+                planner.record(plan, httpx_records, res["parsed"])
+        if self.clusters and res.get("parsed"):
+            res["parsed"] = attribute_findings(
+                res["parsed"], self.clusters
             )
-            logger.info(f"raw results: {res}")
+        if res.get("parsed"):
+            res["parsed"] = aggregate_findings(res["parsed"])
+        self.results["nuclei"] = res
+        self._publish(res.get("result", []))
+        res = self._spill("nuclei")
+        logger.info(f"raw results: {res}")
+
+    def run(self) -> Dict[str, Any]:
+        if "subfinder" in self.tools:
+            self._run_subfinder()
+
+        if "ffuf_subdomainbruteforce" in self.tools:
+            self._run_subdomain_bruteforce()
+
+        dns_cfg = merge_tool_opts("dns", self.options)
+        if self._dns_enabled(dns_cfg):
+            self._run_dns(dns_cfg)
+
+        if "nmap" in self.tools:
+            self._run_nmap()
+
+        if "httpx" in self.tools:
+            self._run_httpx()
 
         if "ffuf_directorybruteforce" in self.tools:
-            logger.info("[5] ffuf_directorybruteforce")
-            cfg = merge_tool_opts("ffuf", self.options)
-            mod = module_manager.get_module("ffuf")(
-                target=self.targets,
-                target_type=TargetType.MULTIPLE,
-                scan_type=ScanType.DEFAULT,
-                wordlist="/app/wordlists/"+cfg.get("directories_wordlist"),
-                additional_flags=cfg.get("additional_flags"),
-                rate_limit=self.rate_limit
-            )
-            res = mod.run()
-            self.results["ffuf_directorybruteforce"] = res
-            self.targets += [r.get("url") for r in res.get("parsed", [])]
-            redis_client.publish(
-                self.channel, json.dumps(res.get("result", []))
-            )
-            logger.info(f"raw results: {res}")
-            logger.info(
-                f"Targets after ffuf_directorybruteforce: {self.targets}"
-            )
+            self._run_directory_bruteforce()
 
         if "nuclei" in self.tools:
-            logger.info("[6] nuclei")
-            cfg = merge_tool_opts("nuclei", self.options)
-            self.targets += [
-                    "http://192.168.2.130"
-            ]
-            mod = module_manager.get_module("nuclei")(
-                target=self.targets,
-                target_type=TargetType.MULTIPLE,
-                scan_type=ScanType(cfg.get("mode")),
-                templates_dir=cfg.get("templates_dir"),
-                additional_flags=cfg.get("additional_flags"),
-                rate_limit=self.rate_limit
-            )
-            res = mod.run()
-            self.results["nuclei"] = res
-            redis_client.publish(
-                self.channel,
-                json.dumps(res.get("result", []))
-            )
-            logger.info(f"raw results: {res}")
+            self._run_nuclei()
 
         return self.results
 
@@ -242,10 +634,8 @@ def run_scan_task(self, request: Dict[str, Any], settings_curr):
     logger.debug(f"Run options: {settings_curr}")
 
     channel = f"scan:{self.request.id}"
-    db.scan_jobs.update_one(
-        {"job_id": self.request.id},
-        {"$set": {"status": "running"}}
-    )
+    scans = ScanRepository(db)
+    scans.set_job_status(self.request.id, "running")
     redis_client.publish(
         channel,
         json.dumps(
@@ -257,36 +647,73 @@ def run_scan_task(self, request: Dict[str, Any], settings_curr):
     )
 
     backend = settings_curr.get("backend", {})
-    pipeline = ScanPipeline(
+    spill_dir = backend.get("spill_dir", settings.backend.spill_dir)
+    spill = SpillStore(spill_dir, self.request.id) if spill_dir else None
+    writer = BulkWriter(
+        self.request.id, db,
+        batch_size=int(
+            backend.get("write_batch", settings.backend.write_batch)
+        ),
+        flush_interval=float(
+            backend.get("write_interval", settings.backend.write_interval)
+        )
+    ).start()
+    pipeline_cls = ScanPipeline
+    if backend.get("streaming", settings.backend.streaming):
+        # imported here, the streaming pipeline builds on ScanPipeline
+        from bountyforge.core.streaming import StreamingPipeline
+        pipeline_cls = StreamingPipeline
+    pipeline = pipeline_cls(
         targets, tools, settings_curr.get("scanners", []),
-        channel, backend.get("rate_limit", 20), backend.get("timeout", 10)
+        channel, backend.get("rate_limit", 20),
+        backend.get("timeout", settings.backend.timeout),
+        job_id=self.request.id,
+        retry_policy=RetryPolicy(
+            max_retries=int(backend.get("retries", settings.backend.retries)),
+            base_delay=float(
+                backend.get("retry_backoff", settings.backend.retry_backoff)
+            ),
+            budget=RequestBudget(
+                int(backend.get("retry_budget", settings.backend.retry_budget))
+            )
+        ),
+        spill=spill,
+        writer=writer
     )
     try:
         results = pipeline.run()
         status = "finished"
+        # the live records are replaced by the final ones below
+        writer.close()
+        # parsed records go to their collections, raw outputs to
+        # scan_result_chunks, the record keeps the summaries
+        results = store_records(db, self.request.id, results, spill)
+        if spill is not None:
+            results = spill.persist(db, results)
     except Exception as e:
         logger.exception(f"Pipeline failed: {e}")
         results = {"error": str(e)}
         status = "error" if settings.backend.abort_on_error\
             else "finished_with_errors"
+    finally:
+        writer.close()
+        if spill is not None:
+            spill.cleanup()
 
     record = {
         "job_id": self.request.id,
         "timestamp": datetime.datetime.now(),
         "results": results,
-        "status": status
-    }
-    db.scan_results.insert_one(record)
-    db.scan_jobs.update_one(
-        {
-            "job_id": self.request.id
-        },
-        {
-            "$set": {
-                "status": status
-            }
+        "status": status,
+        # kept for offline replays of the job
+        "request": {
+            "target": targets,
+            "tools": tools,
+            "scanners": settings_curr.get("scanners", {})
         }
-    )
+    }
+    scans.insert_result(record)
+    scans.set_job_status(self.request.id, status)
     redis_client.publish(
         channel,
         json.dumps(
@@ -0,0 +1,322 @@
+"""
+Pre-built index of nuclei templates
+
+Template selection, sharding and severity filtering need metadata of
+thousands of YAML templates. The index parses the template tree once
+into a compact JSON file (id, tags, severity, protocol, path, hash) and
+is rebuilt incrementally when the templates are updated: only files
+whose size or mtime changed since the last build are parsed again.
+Scans load the stored index without walking the template tree.
+
+The index file is kept in the templates directory, or in the user
+cache directory when the templates directory is not writable
+"""
+
+import hashlib
+import json
+import logging
+import os
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = ".bountyforge-index.json"
+INDEX_VERSION = 1
+
+DEFAULT_TEMPLATES_DIR = os.path.expanduser("~/nuclei-templates")
+# index files of read-only templates directories
+INDEX_CACHE_DIR = os.path.expanduser("~/.cache/bountyforge")
+
+# top-level template keys -> protocol
+PROTOCOL_KEYS = {
+    "http": "http",
+    "requests": "http",
+    "dns": "dns",
+    "file": "file",
+    "network": "network",
+    "tcp": "network",
+    "headless": "headless",
+    "ssl": "ssl",
+    "websocket": "websocket",
+    "whois": "whois",
+    "code": "code",
+    "javascript": "javascript",
+    "workflows": "workflow",
+}
+
+try:
+    _Loader = yaml.CSafeLoader
+except AttributeError:
+    _Loader = yaml.SafeLoader
+
+
+@dataclass
+class TemplateEntry:
+    """
+    Metadata of one template
+    """
+    id: str
+    path: str
+    tags: List[str] = field(default_factory=list)
+    severity: str = "unknown"
+    protocol: str = "unknown"
+    hash: str = ""
+    mtime: int = 0
+    size: int = 0
+
+
+def _split_tags(value: Any) -> List[str]:
+    if isinstance(value, str):
+        value = value.split(",")
+    return sorted({str(t).strip().lower() for t in value or [] if t})
+
+
+def parse_template(path: str, rel_path: str) -> Optional[TemplateEntry]:
+    """
+    Parse metadata of a single template file
+
+    :return: entry or None if the file is not a nuclei template
+    """
+    with open(path, "rb") as f:
+        content = f.read()
+    try:
+        doc = yaml.load(content, Loader=_Loader)
+    except yaml.YAMLError as e:
+        logger.debug(f"[TemplateIndex] Invalid YAML {rel_path}: {e}")
+        return None
+    if not isinstance(doc, dict) or "id" not in doc:
+        return None
+
+    info = doc.get("info") or {}
+    protocol = next(
+        (PROTOCOL_KEYS[key] for key in doc if key in PROTOCOL_KEYS),
+        "unknown"
+    )
+    stat = os.stat(path)
+    return TemplateEntry(
+        id=str(doc["id"]),
+        path=rel_path,
+        tags=_split_tags(info.get("tags")),
+        severity=str(info.get("severity") or "unknown").lower(),
+        protocol=protocol,
+        hash=hashlib.sha256(content).hexdigest(),
+        mtime=stat.st_mtime_ns,
+        size=stat.st_size,
+    )
+
+
+class TemplateIndex:
+    """
+    On-disk index of a nuclei templates directory
+    """
+
+    def __init__(
+        self,
+        templates_dir: Optional[str] = None,
+        index_path: Optional[str] = None
+    ) -> None:
+        self.templates_dir = os.path.abspath(
+            templates_dir or DEFAULT_TEMPLATES_DIR
+        )
+        self.index_path = index_path or os.path.join(
+            self.templates_dir, INDEX_FILE
+        )
+        # an explicit index path has no fallback
+        self._index_paths = [self.index_path] if index_path else [
+            self.index_path,
+            os.path.join(
+                INDEX_CACHE_DIR,
+                "templates-"
+                + hashlib.sha256(self.templates_dir.encode()).hexdigest()[:16]
+                + ".json"
+            )
+        ]
+        self.entries: Dict[str, TemplateEntry] = {}
+
+    def _iter_files(self) -> Iterable[str]:
+        for root, dirs, files in os.walk(self.templates_dir):
+            # skip .git, .github and other hidden directories
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in files:
+                if name.endswith((".yaml", ".yml")):
+                    yield os.path.join(root, name)
+
+    def load(self) -> bool:
+        """
+        Load the index file
+
+        :return: False if there is no usable index on disk
+        """
+        for path in self._index_paths:
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data.get("version") != INDEX_VERSION:
+                continue
+            self.entries = {
+                row["path"]: TemplateEntry(**row)
+                for row in data["templates"]
+            }
+            return True
+        return False
+
+    def save(self) -> bool:
+        """
+        Write the index file, failures keep the index in memory only
+
+        :return: False if no index location is writable
+        """
+        for path in self._index_paths:
+            tmp_path = f"{path}.tmp"
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(
+                        {
+                            "version": INDEX_VERSION,
+                            "templates": [
+                                asdict(e) for e in self.entries.values()
+                            ]
+                        },
+                        f,
+                        separators=(",", ":")
+                    )
+                os.replace(tmp_path, path)
+                return True
+            except OSError as e:
+                logger.debug(f"[TemplateIndex] Can not write {path}: {e}")
+        logger.warning(
+            f"[TemplateIndex] No writable index location for "
+            f"{self.templates_dir}, keeping the index in memory"
+        )
+        return False
+
+    def build(self, incremental: bool = True) -> Dict[str, int]:
+        """
+        (Re)build the index, parsing only new or modified templates
+
+        :param incremental: reuse entries of unchanged files
+        :return: counters of added, updated, removed and unchanged files
+        """
+        if incremental and not self.entries:
+            self.load()
+        old = self.entries if incremental else {}
+        entries: Dict[str, TemplateEntry] = {}
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+        for path in self._iter_files():
+            rel_path = os.path.relpath(path, self.templates_dir)
+            try:
+                stat = os.stat(path)
+                previous = old.get(rel_path)
+                if (
+                    previous is not None
+                    and previous.mtime == stat.st_mtime_ns
+                    and previous.size == stat.st_size
+                ):
+                    entries[rel_path] = previous
+                    stats["unchanged"] += 1
+                    continue
+                entry = parse_template(path, rel_path)
+            except OSError as e:
+                logger.warning(f"[TemplateIndex] Can not read {path}: {e}")
+                continue
+            if entry is None:
+                continue
+            entries[rel_path] = entry
+            stats["updated" if rel_path in old else "added"] += 1
+
+        stats["removed"] = len(set(old) - set(entries))
+        self.entries = entries
+        changed = stats["added"] + stats["updated"] + stats["removed"]
+        if changed or not incremental:
+            # an up to date index is not written again on every load
+            self.save()
+        logger.info(
+            f"[TemplateIndex] {len(entries)} templates in "
+            f"{self.templates_dir}: {stats}"
+        )
+        return stats
+
+    def load_or_build(self) -> "TemplateIndex":
+        """
+        Load the stored index, building it if there is none yet
+
+        The template tree is not walked for a stored index: templates
+        change through NucleiModule.update_templates, which rebuilds
+        the index incrementally
+        """
+        if not self.load():
+            self.build(incremental=False)
+        return self
+
+    @property
+    def digest(self) -> str:
+        """
+        Hash of the whole template set, changes with any template
+        """
+        h = hashlib.sha256()
+        for path in sorted(self.entries):
+            h.update(f"{path}:{self.entries[path].hash}\n".encode())
+        return h.hexdigest()
+
+    def query(
+        self,
+        tags: Optional[Iterable[str]] = None,
+        exclude_tags: Optional[Iterable[str]] = None,
+        severities: Optional[Iterable[str]] = None,
+        protocols: Optional[Iterable[str]] = None,
+        ids: Optional[Iterable[str]] = None
+    ) -> List[TemplateEntry]:
+        """
+        Select templates by metadata, every filter is optional
+
+        :param tags: keep templates having any of the tags
+        :param exclude_tags: drop templates having any of the tags
+        :param severities: keep templates with these severities
+        :param protocols: keep templates of these protocols
+        :param ids: keep templates with these ids
+        """
+        tags = set(tags or [])
+        exclude_tags = set(exclude_tags or [])
+        severities = set(severities or [])
+        protocols = set(protocols or [])
+        ids = set(ids or [])
+
+        result = []
+        for entry in self.entries.values():
+            entry_tags = set(entry.tags)
+            if tags and not tags & entry_tags:
+                continue
+            if exclude_tags & entry_tags:
+                continue
+            if severities and entry.severity not in severities:
+                continue
+            if protocols and entry.protocol not in protocols:
+                continue
+            if ids and entry.id not in ids:
+                continue
+            result.append(entry)
+        return result
+
+    def count(self, **filters) -> int:
+        return len(self.query(**filters))
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Template counts by severity and protocol
+        """
+        entries = self.entries.values()
+        return {
+            "templates_dir": self.templates_dir,
+            "total": len(self.entries),
+            "digest": self.digest,
+            "severity": dict(Counter(e.severity for e in entries)),
+            "protocol": dict(Counter(e.protocol for e in entries))
+        }
@@ -0,0 +1,134 @@
+"""
+Technology-aware nuclei template routing
+
+httpx already detects the technologies of every URL. The router maps
+those fingerprints to nuclei template tags and groups targets by the
+set of detected technologies; every group runs with the tags of
+technologies that were NOT detected excluded, so a WordPress host skips
+Jenkins templates and vice versa, while generic templates still run
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+# httpx (wappalyzer) technology name -> nuclei template tags
+TECH_TAGS: Dict[str, List[str]] = {
+    "wordpress": ["wordpress", "wp-plugin", "wp-theme", "wp"],
+    "joomla": ["joomla"],
+    "drupal": ["drupal"],
+    "magento": ["magento"],
+    "prestashop": ["prestashop"],
+    "moodle": ["moodle"],
+    "jenkins": ["jenkins"],
+    "gitlab": ["gitlab"],
+    "grafana": ["grafana"],
+    "kibana": ["kibana"],
+    "elasticsearch": ["elasticsearch"],
+    "atlassian confluence": ["confluence"],
+    "atlassian jira": ["jira"],
+    "apache tomcat": ["tomcat"],
+    "oracle weblogic server": ["weblogic"],
+    "jboss": ["jboss"],
+    "adobe coldfusion": ["coldfusion"],
+    "microsoft sharepoint": ["sharepoint"],
+    "microsoft exchange server": ["exchange"],
+    "outlook web app": ["exchange"],
+    "citrix netscaler": ["citrix"],
+    "zimbra": ["zimbra"],
+    "phpmyadmin": ["phpmyadmin"],
+    "laravel": ["laravel"],
+    "spring": ["springboot", "spring"],
+    "apache struts": ["struts"],
+    "sonarqube": ["sonarqube"],
+    "nexus repository": ["nexus"],
+    "rabbitmq": ["rabbitmq"],
+    "roundcube": ["roundcube"],
+}
+
+
+@dataclass
+class TemplateGroup:
+    """
+    Targets sharing the same selected template set
+
+    `templates` limits the group to these template paths (relative to
+    the templates directory), None runs the whole directory
+    """
+    technologies: FrozenSet[str]
+    exclude_tags: List[str]
+    targets: List[str] = field(default_factory=list)
+    templates: Optional[List[str]] = None
+
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url if "://" in url else f"//{url}")
+    return f"{parsed.scheme}://{parsed.netloc}".lower().lstrip(":/")
+
+
+def detected_technologies(
+    tech: Iterable[str],
+    tech_tags: Dict[str, List[str]]
+) -> FrozenSet[str]:
+    """
+    Known technologies from an httpx "tech" list ("WordPress:6.4.2")
+    """
+    names = {t.split(":")[0].strip().lower() for t in tech or []}
+    return frozenset(name for name in names if name in tech_tags)
+
+
+def route_templates(
+    targets: List[str],
+    httpx_records: Iterable[Dict[str, Any]],
+    tech_tags: Optional[Dict[str, List[str]]] = None
+) -> List[TemplateGroup]:
+    """
+    Group nuclei targets by the technologies detected on their origin
+
+    Targets without an httpx record (e.g. ffuf hits on unknown hosts)
+    or whose records carry no "tech" list (httpx live mode, cached live
+    probes) form a group without exclusions and get the full template
+    set, nothing is excluded for technologies that were never detected
+
+    :param targets: nuclei targets (URLs)
+    :param httpx_records: parsed httpx records with "url" and "tech"
+    :param tech_tags: override of TECH_TAGS
+    :return: groups with the tags to exclude for each
+    """
+    tech_tags = tech_tags or TECH_TAGS
+    all_tags = {tag for tags in tech_tags.values() for tag in tags}
+
+    tech_by_origin: Dict[str, FrozenSet[str]] = {}
+    for record in httpx_records:
+        if not record.get("url") or not isinstance(record.get("tech"), list):
+            continue
+        origin = _origin(record["url"])
+        tech_by_origin[origin] = tech_by_origin.get(
+            origin, frozenset()
+        ) | detected_technologies(record["tech"], tech_tags)
+
+    groups: Dict[Optional[FrozenSet[str]], TemplateGroup] = {}
+    for target in targets:
+        tech = tech_by_origin.get(_origin(target))
+        if tech is None:
+            group = groups.setdefault(None, TemplateGroup(frozenset(), []))
+        else:
+            if tech not in groups:
+                keep = {tag for name in tech for tag in tech_tags[name]}
+                groups[tech] = TemplateGroup(
+                    tech, sorted(all_tags - keep)
+                )
+            group = groups[tech]
+        group.targets.append(target)
+
+    logger.info(
+        "Template routing: " + "; ".join(
+            f"{','.join(sorted(g.technologies)) or 'generic'}"
+            f"={len(g.targets)}"
+            for g in groups.values()
+        )
+    )
+    return list(groups.values())
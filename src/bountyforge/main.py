@@ -6,6 +6,7 @@ from flask_cors import CORS
 from . import utils
 from .config import settings
 from .api import config_api, jwt
+from .repository import ensure_indexes
 
 logger = logging.getLogger('bountyforge')
 
@@ -101,6 +102,7 @@ def create_app() -> flask.Flask | None:
         }
     )
     app.register_blueprint(config_api)
+    ensure_indexes()
 
     return app
 
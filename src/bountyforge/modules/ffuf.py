@@ -6,6 +6,10 @@ from typing import Any, Dict, List, Union, Optional
 from urllib.parse import urlparse
 
 from bountyforge.core.module_base import Module, TargetType, ScanType
+from bountyforge.core.progress import ProgressRecord, parse_ffuf_progress
+from bountyforge.core.recursion import (
+    RecursionScheduler, RequestBudget, count_wordlist
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +19,9 @@ class FfufModule(Module):
     ffuf в двух режимах, управляемых через scan_type:
     - ScanType.SUBDOMAIN: перебор поддоменов через Host: FUZZ.target
     - ScanType.DIRECTORY (или любой другой): классический /FUZZ
+
+    Recursion in directory mode is driven by RecursionScheduler
+    instead of ffuf's own `-recursion` flag
     """
     binary_name = "ffuf"
 
@@ -27,6 +34,9 @@ class FfufModule(Module):
         additional_flags: List[str] = None,
         rate_limit: int = 20,
         protocol: Optional[str] = None,
+        recursion_depth: int = 2,
+        host_request_budget: int = 50000,
+        job_request_budget: int = 500000,
         **kwargs
     ) -> None:
         super().__init__(
@@ -38,8 +48,15 @@ class FfufModule(Module):
         )
         self.wordlist = wordlist
         self.protocol = protocol
+        self.recursion_depth = recursion_depth
+        self.host_request_budget = host_request_budget
+        self.job_request_budget = job_request_budget
 
-    def _build_command(self, target_str: str) -> List[str]:
+    def _build_command(
+        self,
+        target_str: str,
+        base_url: Optional[str] = None
+    ) -> List[str]:
         parsed = urlparse(target_str) if "://" in target_str else None
         if parsed and parsed.scheme:
             scheme = parsed.scheme
@@ -51,7 +68,9 @@ class FfufModule(Module):
         cmd = [self._resolve_binary(self.binary_name)]
         cmd += ["-w", self.wordlist]
         cmd += ["-of", "json", "-json"]
-        cmd += ["-s"]
+        # the progress line is only printed without -s
+        if self.progress_callback is None:
+            cmd += ["-s"]
 
         if self.scan_type == ScanType.SUBDOMAIN:
             # Host: FUZZ.target
@@ -59,10 +78,9 @@ class FfufModule(Module):
             cmd += ["-u", url_base]
             cmd += ["-H", f"'Host: FUZZ.{host}'"]
         else:
-            # /FUZZ
-            url_base = f"{scheme}://{host}/FUZZ"
+            # /FUZZ, base_url is set for recursion passes
+            url_base = f"{base_url or f'{scheme}://{host}'}/FUZZ"
             cmd += ["-u", url_base]
-            cmd += ["-recursion", "-recursion-depth", "2"]
 
         cmd += ["-r"]
         if self.additional_flags:
@@ -71,6 +89,129 @@ class FfufModule(Module):
         logger.info(f"Command: {cmd}")
         return cmd
 
+    def _parse_progress(
+        self,
+        stream: str,
+        line: str
+    ) -> Optional[ProgressRecord]:
+        return parse_ffuf_progress(line) if stream == "stderr" else None
+
+    def _run_pass(
+        self,
+        host: str,
+        base_url: Optional[str] = None,
+        depth: int = 0
+    ) -> tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """
+        Run a single ffuf invocation and parse its output
+
+        :param host: target host from the job
+        :param base_url: directory to brute force, host root if not set
+        :param depth: recursion depth of the pass
+        :return: raw record and list of parsed hits
+        """
+        cmd = self._build_command(host, base_url)
+        res = self._execute_command(cmd)
+        record = {
+            "target": host,
+            "scan_type": self.scan_type.value,
+            "success": res.get("success", False),
+            "returncode": res.get("returncode", -1),
+            "error": res.get("error", ""),
+            # spooled output stays on disk until the stage is spilled
+            "output": res.get("output", "")
+        }
+        if base_url:
+            record["base_url"] = base_url
+            record["depth"] = depth
+
+        parsed = []
+        if res.get("success"):
+            parsed = self._parse_pass(res["output"], host, depth)
+            self._emit_records(parsed, base_url or host)
+        return record, parsed
+
+    def _parse_pass(
+        self,
+        output: str,
+        host: str,
+        depth: int = 0
+    ) -> List[Dict[str, Any]]:
+        """
+        Parse the JSON lines of a single ffuf invocation
+        """
+        parsed = []
+        for line in output.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                obj = json.loads(line)
+                parsed.append({
+                    "target": host,
+                    "scan_type": self.scan_type.value,
+                    "url":     obj.get("url"),
+                    "status":  obj.get("status"),
+                    "length":  obj.get("length"),
+                    "redirectlocation": obj.get("redirectlocation"),
+                    "depth": depth,
+                })
+            except json.JSONDecodeError:
+                # fallback: plain-text path
+                parsed.append({
+                    "target": host,
+                    "scan_type": self.scan_type.value,
+                    "path": line
+                })
+            except Exception as e:
+                logger.exception(
+                    f"[FfufModule] JSON parse error on {host}: {e}"
+                )
+        return parsed
+
+    def replay(self, stored: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Parse the stored per-pass records again
+        """
+        records = stored.get("result")
+        if not isinstance(records, list):
+            return super().replay(stored)
+        parsed = []
+        for record in records:
+            if record.get("success"):
+                parsed.extend(self._parse_pass(
+                    record.get("output", ""),
+                    record.get("target"),
+                    record.get("depth", 0)
+                ))
+        return {
+            "scan_type": self.scan_type.value,
+            "result": records,
+            "parsed": parsed
+        }
+
+    def _make_scheduler(self) -> Optional[RecursionScheduler]:
+        """
+        Create recursion scheduler for directory mode
+        """
+        if self.scan_type == ScanType.SUBDOMAIN or self.recursion_depth <= 0:
+            return None
+
+        job_budget = RequestBudget(self.job_request_budget)\
+            if self.job_request_budget else None
+        requests_per_pass = count_wordlist(self.wordlist)
+        if not requests_per_pass and (job_budget or self.host_request_budget):
+            logger.warning(
+                f"[FfufModule] Can not count wordlist {self.wordlist}, "
+                f"request budgets do not apply"
+            )
+        return RecursionScheduler(
+            max_depth=self.recursion_depth,
+            requests_per_pass=requests_per_pass,
+            host_budget=self.host_request_budget,
+            job_budget=job_budget
+        )
+
     def run(self) -> Dict[str, Any]:
         raw = self._prepare_target()
         hosts = [
@@ -79,47 +220,31 @@ class FfufModule(Module):
 
         all_results = []
         all_parsed = []
+        scheduler = self._make_scheduler()
 
         for host in hosts:
             try:
                 self._pre_run(host)
-                cmd = self._build_command(host)
-                res = self._execute_command(cmd)
-                record = {
-                    "target": host,
-                    "scan_type": self.scan_type.value,
-                    "success": res.get("success", False),
-                    "returncode": res.get("returncode", -1),
-                    "error": res.get("error", ""),
-                    "output": res.get("output", "")
-                }
+                record, parsed = self._run_pass(host)
                 all_results.append(record)
+                all_parsed.extend(parsed)
+
+                if scheduler is None:
+                    continue
 
-                if res.get("success"):
-                    for line in res["output"].splitlines():
-                        line = line.strip()
-                        if not line:
-                            continue
-                        try:
-                            obj = json.loads(line)
-                            all_parsed.append({
-                                "target": host,
-                                "scan_type": self.scan_type.value,
-                                "url":     obj.get("url"),
-                                "status":  obj.get("status"),
-                                "length":  obj.get("length"),
-                            })
-                        except json.JSONDecodeError:
-                            # fallback: plain-text path
-                            all_parsed.append({
-                                "target": host,
-                                "scan_type": self.scan_type.value,
-                                "path": line
-                            })
-                        except Exception as e:
-                            logger.exception(
-                                f"[FfufModule] JSON parse error on {host}: {e}"
-                            )
+                scheduler.charge(host)
+                scheduler.offer(host, parsed, depth=0)
+                while (branch := scheduler.next_branch(host)) is not None:
+                    logger.info(
+                        f"[FfufModule] Descending into {branch.url} "
+                        f"(depth {branch.depth}, status {branch.status})"
+                    )
+                    record, parsed = self._run_pass(
+                        host, branch.url, branch.depth
+                    )
+                    all_results.append(record)
+                    all_parsed.extend(parsed)
+                    scheduler.offer(host, parsed, depth=branch.depth)
 
             except Exception as e:
                 logger.exception(f"[FfufModule] Exception on {host}: {e}")
@@ -1,8 +1,9 @@
 import logging
 import json
-from typing import List, Union, Dict, Any
+from typing import List, Union, Dict, Any, Optional
 from dataclasses import fields
 from bountyforge.core import Module, ScanType, TargetType
+from bountyforge.core.probe_cache import ProbeCache, canonical_url
 
 logger = logging.getLogger(__name__)
 
@@ -14,8 +15,16 @@ class HttpxModule(Module):
     Modes:
       - "recon": Detailed output (e.g., title, status code, CDN info)
       - "live": Minimal output (e.g., status code only)
+
+    With a ProbeCache only cache misses and stale entries are probed
+    (stale ones in full, marked as changed or not), fresh cached records
+    are merged into `parsed`
+
+    Targets are probed in invocations of `batch_size` URLs, so a
+    failing batch is retried (or fails) without the others
     """
     binary_name = "httpx"
+    batch_size = 50
 
     def __init__(
         self,
@@ -26,6 +35,7 @@ class HttpxModule(Module):
         additional_flags: List[str] = None,
         rate_limit: int = 20,
         headers: dict = None,
+        probe_cache: Optional[ProbeCache] = None,
         **kwargs
     ) -> None:
         # check for unexpected args
@@ -44,6 +54,7 @@ class HttpxModule(Module):
             headers=headers,
             rate_limit=rate_limit
         )
+        self.probe_cache = probe_cache
 
     def _build_command(self, target_str: str) -> List[str]:
         """
@@ -60,13 +71,17 @@ class HttpxModule(Module):
         match self.scan_type:
             case ScanType.RECON:
                 # In reconnaissance scan_type, show title,
-                # status code and CDN information
-                command.extend(["-title", "-status-code", "-cdn"])
+                # status code, CDN information, detected technologies
+                # and body hash for caching and clustering
+                command.extend([
+                    "-title", "-status-code", "-cdn", "-tech-detect",
+                    "-hash", "sha256"
+                ])
             case ScanType.LIVE:
                 # In live scan_type, output is kept minimal
-                command.append(["-status-code"])
+                command.append("-status-code")
             case _:
-                command.append(["-status-code"])
+                command.append("-status-code")
 
         match self.target_type:
             case TargetType.FILE:
@@ -84,7 +99,67 @@ class HttpxModule(Module):
 
         return command
 
+    def _probe_profile(self) -> str:
+        """
+        Mode and flags that decide which fields a probe record holds
+        """
+        scan_type = getattr(self.scan_type, "value", self.scan_type)
+        return " ".join([str(scan_type), *self.additional_flags])
+
     def _parse_output(self, output: str) -> List[Dict[str, Any]]:
         return [
             json.loads(line) for line in output.splitlines() if line.strip()
         ]
+
+    def run(self) -> Dict[str, Any]:
+        if self.probe_cache is None or self.target_type == TargetType.FILE:
+            return super().run()
+
+        try:
+            targets = [t for t in self._prepare_target().split(",") if t]
+            profile = self._probe_profile()
+            fresh, stale = self.probe_cache.lookup(targets, profile)
+            to_probe = [t for t in targets if t not in fresh]
+            logger.info(
+                f"[HttpxModule] Probe cache: {len(fresh)} fresh, "
+                f"{len(stale)} stale, "
+                f"{len(to_probe) - len(stale)} misses"
+            )
+
+            result: Dict[str, Any] = {"result": "", "parsed": []}
+            if to_probe:
+                target_str = ",".join(to_probe)
+                self._pre_run(target_str)
+                result = self._run_batched(target_str)
+
+            parsed = result.get("parsed", [])
+            if parsed:
+                self.probe_cache.store(parsed, profile)
+            stale_by_key = {
+                canonical_url(t): entry for t, entry in stale.items()
+            }
+            for record in parsed:
+                key = canonical_url(record.get("input") or "")
+                self.probe_cache.mark_reprobed(
+                    record, stale_by_key.get(key)
+                )
+
+            result["parsed"] = parsed + [
+                {**entry, "cached": True} for entry in fresh.values()
+            ]
+            result["cache"] = {
+                "fresh": len(fresh),
+                "stale": len(stale),
+                "probed": len(to_probe)
+            }
+            return result
+
+        except Exception as e:
+            logger.exception(
+                f"Critical error in module {self.__class__.__name__}: {e}"
+            )
+            return {
+                "error": str(e),
+                "success": False,
+                "tool": self.__class__.__name__
+            }
@@ -1,8 +1,17 @@
 import logging
 import re
-from typing import List, Union, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Union, Dict, Any, Optional
 from dataclasses import fields
 from bountyforge.core import Module, ScanType, TargetType
+from bountyforge.core.executor import join_outputs
+from bountyforge.core.fingerprints import FingerprintCache
+from bountyforge.core.portscan import (
+    discovery_ports, split_port_flags, tcp_connect_scan
+)
+from bountyforge.core.progress import (
+    NMAP_STATS_RE, NmapStatsParser, ProgressRecord
+)
 
 logger = logging.getLogger(__name__)
 
@@ -12,8 +21,26 @@ class NmapModule(Module):
     Nmap scanning module.
 
     This module performs an Nmap scan
+
+    In two-phase mode every host first gets a fast open-port sweep
+    (nmap without -sV at a high --min-rate, or the built-in TCP connect
+    scanner covering the same ports) and then a version/script pass on
+    its open ports only. Port selection flags (-p, --top-ports, -F,
+    --exclude-ports) of additional_flags apply to the sweep.
+    Hosts are processed in parallel, so the version pass of one host
+    runs while others are still being swept
+
+    With a FingerprintCache the version pass skips open ports that were
+    fingerprinted recently and reuses the cached service data. The
+    cache needs the open ports of a host first, so hosts are always
+    scanned in two phases while it is enabled
+
+    In single-phase mode every host is scanned by its own invocation
+    (`batch_size`), `workers` of them in parallel, so a failing host is
+    retried without the others
     """
     binary_name = "nmap"
+    batch_size = 1
 
     def __init__(
         self,
@@ -23,6 +50,11 @@ class NmapModule(Module):
         exclude: List[str] = None,
         additional_flags: List[str] = None,
         rate_limit: int = 20,
+        two_phase: bool = False,
+        discovery: str = "nmap",
+        discovery_rate: int = 5000,
+        workers: int = 4,
+        fingerprint_cache: Optional[FingerprintCache] = None,
         **kwargs
     ) -> None:
         # check for unexpected args
@@ -40,8 +72,23 @@ class NmapModule(Module):
             additional_flags=additional_flags,
             rate_limit=rate_limit
         )
+        self.two_phase = two_phase
+        self.discovery = discovery
+        self.discovery_rate = discovery_rate
+        self.workers = workers
+        self.batch_workers = workers
+        self.fingerprint_cache = fingerprint_cache
+        self._stats_parser = NmapStatsParser()
 
-    def _build_command(self, target_str: str) -> List[str]:
+    def _build_command(
+        self,
+        target_str: str,
+        ports: Optional[List[int]] = None
+    ) -> List[str]:
+        """
+        :param target_str: prepared target(s)
+        :param ports: scan only these ports (version pass of two-phase mode)
+        """
         command = super()._build_base_command()
 
         command += ["-Pn"]
@@ -53,28 +100,244 @@ class NmapModule(Module):
                 command.extend(["-T4", "-A", "-sV"])
             case ScanType.FULL:
                 # Full port scan on all ports with aggressive flags
-                command.extend(["-p-", "-T4", "-A", "-sV"])
+                if not ports:
+                    command.append("-p-")
+                command.extend(["-T4", "-A", "-sV"])
             case _:
                 command.extend(["-T4", "-sV"])
 
+        if ports:
+            command.extend(["-p", ",".join(map(str, sorted(ports)))])
+
         match self.target_type:
             case TargetType.FILE:
                 command.extend(["-iL", target_str])
-            case TargetType.SINGLE | TargetType.MULTIPLE:
+            case TargetType.MULTIPLE:
+                # nmap expects targets as separate arguments
+                command.extend(target_str.split(","))
+            case TargetType.SINGLE:
                 command.append(target_str)
             case _:
                 command.append(target_str)
 
         if self.additional_flags:
-            command.extend(self.additional_flags)
+            # the version pass gets its ports from the sweep
+            command.extend(
+                split_port_flags(self.additional_flags)[1] if ports
+                else self.additional_flags
+            )
 
         if self.exclude:
             command.extend(["--exclude", ",".join(self.exclude)])
 
+        if self.progress_callback is not None:
+            command += ["--stats-every", "10s"]
+
         command += ["-min-rate", str(self.rate_limit)]
         logger.info(f"Command: {command}")
         return command
 
+    def _build_discovery_command(self, host: str) -> List[str]:
+        """
+        Fast open-port sweep without service detection
+        """
+        command = super()._build_base_command()
+        command += ["-Pn", "-n", "-T4", "--open"]
+        port_flags = split_port_flags(self.additional_flags)[0]
+        if port_flags:
+            command += port_flags
+        elif self.scan_type == ScanType.FULL:
+            command.append("-p-")
+        command.append(host)
+        if self.exclude:
+            command.extend(["--exclude", ",".join(self.exclude)])
+        if self.progress_callback is not None:
+            command += ["--stats-every", "10s"]
+        command += ["--min-rate", str(self.discovery_rate)]
+        logger.info(f"Discovery command: {command}")
+        return command
+
+    def _parse_progress(
+        self,
+        stream: str,
+        line: str
+    ) -> Optional[ProgressRecord]:
+        return self._stats_parser(line) if stream == "stdout" else None
+
+    def _is_heartbeat(self, stream: str, line: str) -> bool:
+        return bool(NMAP_STATS_RE.match(line.strip()))
+
+    def _fingerprint_profile(self) -> str:
+        """
+        Flags of the version pass that decide what a fingerprint holds,
+        -A adds scripts and OS detection to -sV
+        """
+        mode = "-A" if self.scan_type in (
+            ScanType.AGGRESSIVE, ScanType.FULL
+        ) else "-sV"
+        return " ".join([mode, *self.additional_flags])
+
+    def _discover_ports(self, host: str) -> tuple[List[int], str]:
+        """
+        First phase: find open ports of a host
+
+        :return: open ports and error message (empty on success)
+        """
+        if self.discovery == "connect":
+            ports = discovery_ports(
+                split_port_flags(self.additional_flags)[0],
+                full=self.scan_type == ScanType.FULL
+            )
+            return tcp_connect_scan(host, ports), ""
+
+        res = self._execute_command(self._build_discovery_command(host))
+        if not res.get("success"):
+            return [], res.get("error", "")
+        ports = {
+            int(entry["port"].split("/")[0])
+            for entry in self._parse_output(res["output"])
+            if entry.get("state") == "open"
+            and entry["port"].endswith("/tcp")
+        }
+        return sorted(ports), ""
+
+    def _scan_host(self, host: str) -> Dict[str, Any]:
+        """
+        Run both phases for a single host
+        """
+        record: Dict[str, Any] = {"host": host, "open_ports": []}
+        try:
+            ports, error = self._discover_ports(host)
+        except Exception as e:
+            logger.exception(f"[NmapModule] Discovery failed on {host}: {e}")
+            ports, error = [], str(e)
+        record["open_ports"] = ports
+        if error:
+            record["error"] = error
+
+        cached = self._cached_entries(host, ports)
+        stale = [port for port in ports if port not in cached]
+        record["cached_ports"] = sorted(cached)
+        if not stale:
+            record.update({"output": "", "parsed": list(cached.values())})
+            return record
+
+        res = self._execute_command(self._build_command(host, stale))
+        parsed = self._parse_output(res.get("output", ""))
+        if self.fingerprint_cache is not None and res.get("success"):
+            self.fingerprint_cache.store(
+                parsed, self._fingerprint_profile()
+            )
+        self._emit_records(parsed, host)
+        record.update({
+            "success": res.get("success", False),
+            "returncode": res.get("returncode", -1),
+            "output": res.get("output", ""),
+            "parsed": parsed + list(cached.values()),
+        })
+        if not res.get("success"):
+            record["error"] = res.get("error", "")
+        return record
+
+    def _cached_entries(
+        self,
+        host: str,
+        ports: List[int]
+    ) -> Dict[int, Dict[str, Any]]:
+        """
+        Parsed entries for ports with a fresh cached fingerprint
+        """
+        if self.fingerprint_cache is None or not ports:
+            return {}
+        entries = {}
+        for port, doc in self.fingerprint_cache.lookup(
+            host, ports, profile=self._fingerprint_profile()
+        ).items():
+            seen_at = doc.pop("seen_at", None)
+            entries[port] = {
+                **doc,
+                "host": host,
+                "cached": True,
+                "seen_at": seen_at.isoformat() if seen_at else None
+            }
+        if entries:
+            logger.info(
+                f"[NmapModule] {host}: reusing fingerprints of ports "
+                f"{sorted(entries)}"
+            )
+        return entries
+
+    def _replayed_records(
+        self,
+        stored: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """
+        Cached fingerprints, once per (ip, port): stored records
+            were already fanned out to every hostname
+        """
+        records = {}
+        for record in super()._replayed_records(stored):
+            key = (record.get("ip") or record.get("host"), record["port"])
+            records.setdefault(key, record)
+        return list(records.values())
+
+    def _target_hosts(self, target_str: str) -> List[str]:
+        if self.target_type == TargetType.FILE:
+            with open(target_str) as f:
+                return [line.strip() for line in f if line.strip()]
+        return [t for t in target_str.split(",") if t]
+
+    def _reuses_fingerprints(self) -> bool:
+        """
+        Whether cached fingerprints can spare -sV runs, which needs the
+            open ports of a host before its version pass
+        """
+        return self.fingerprint_cache is not None \
+            and self.fingerprint_cache.max_age > 0
+
+    def run(self) -> Dict[str, Any]:
+        # with usable fingerprints the sweep finds the ports to look up
+        if not self.two_phase and not self._reuses_fingerprints():
+            res = super().run()
+            # write-through, so later two-phase runs can reuse the results
+            if self.fingerprint_cache is not None and res.get("parsed"):
+                self.fingerprint_cache.store(
+                    res["parsed"], self._fingerprint_profile()
+                )
+            return res
+
+        try:
+            target_str = self._prepare_target()
+            self._pre_run(target_str)
+            hosts = self._target_hosts(target_str)
+
+            outputs: List[str] = []
+            parsed: List[Dict[str, Any]] = []
+            phases: List[Dict[str, Any]] = []
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for record in pool.map(self._scan_host, hosts):
+                    if record["output"]:
+                        outputs.append(record["output"])
+                    parsed.extend(record.pop("parsed"))
+                    record.pop("output")
+                    phases.append(record)
+
+            return {
+                "result": join_outputs(outputs),
+                "parsed": parsed,
+                "phases": phases
+            }
+
+        except Exception as e:
+            logger.exception(
+                f"Critical error in module {self.__class__.__name__}: {e}"
+            )
+            return {
+                "error": str(e),
+                "success": False,
+                "tool": self.__class__.__name__
+            }
+
     @classmethod
     def _parse_version(cls, output: str) -> str:
         """
@@ -86,24 +349,35 @@ class NmapModule(Module):
     def _parse_output(self, output: str) -> List[Dict[str, Any]]:
         """
         Parse output from Nmap scan
+
+        Port lines are attributed to the closest preceding
+        "Nmap scan report" line, so multi-host output is supported
         """
-        lines = output.splitlines()
         results: List[Dict[str, Any]] = []
         port_line_re = re.compile(r'^(\d+/\w+)\s+(\w+)\s+(\S+)\s*(.*)$')
-
-        report_re = re.search(
+        report_line_re = re.compile(
             r'Nmap scan report for\s+'
             r'(?P<name>\S+)'
-            r'(?: \((?P<ip>\d+\.\d+\.\d+\.\d+)\))?',
-            output
+            r'(?: \((?P<ip>[0-9a-fA-F:.]+)\))?'
         )
-        if report_re:
-            name = report_re.group('name')
-            ip = report_re.group('ip') or report_re.group('name')
-        else:
-            name = ip = None
+        script_line_re = re.compile(r'^\|[_ ]?(.*)$')
+
+        name = ip = None
+        entry = None
+        for line in output.splitlines():
+            report = report_line_re.match(line.strip())
+            if report:
+                name = report.group('name')
+                ip = report.group('ip') or name
+                entry = None
+                continue
+
+            # "| http-title: ..." lines belong to the preceding port
+            script = script_line_re.match(line)
+            if script and entry is not None:
+                entry.setdefault("scripts", []).append(script.group(1))
+                continue
 
-        for line in lines:
             m = port_line_re.match(line.strip())
             if m:
                 port, state, service, extra = m.groups()
@@ -117,5 +391,8 @@ class NmapModule(Module):
                 if extra:
                     entry["info"] = extra
                 results.append(entry)
+            elif line.strip():
+                # e.g. "Host script results:" ends the port block
+                entry = None
 
         return results
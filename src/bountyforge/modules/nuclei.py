@@ -2,17 +2,42 @@ import os
 import subprocess
 import logging
 import json
-from typing import Any, Dict, List, Union
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Union, Optional
 from dataclasses import fields
 from bountyforge.core import Module, ScanType, TargetType
+from bountyforge.core.executor import join_outputs
+from bountyforge.core.findings import dedupe_findings
+from bountyforge.core.progress import ProgressRecord, parse_nuclei_stats
+from bountyforge.core.template_index import TemplateIndex
+from bountyforge.core.template_routing import TemplateGroup
 
 logger = logging.getLogger(__name__)
 
+# severity tiers in execution order: name -> nuclei severities
+SEVERITY_TIERS: Dict[str, List[str]] = {
+    "critical": ["critical", "high"],
+    "medium": ["medium"],
+    "low": ["low", "info", "unknown"],
+}
+
 
 class NucleiModule(Module):
     """
     Nuclei scanner module.
     Uses `nuclei` CLI to scan targets with given templates.
+
+    When template groups are given (see template_routing), one nuclei
+    invocation is run per group with the group's tags excluded.
+
+    With shards > 1 the selected templates (from the template index)
+    are split into that many lists that run as parallel nuclei
+    processes, each with its share of the rate limit.
+
+    With severity tiers enabled templates run tier by tier (see
+    SEVERITY_TIERS), every finished tier is handed to `on_tier` and the
+    scan can stop after a given tier
     """
     templates_dir: str = "./nuclei-templates"
     binary_name = "nuclei"
@@ -26,6 +51,12 @@ class NucleiModule(Module):
         additional_flags: List[str] = None,
         templates_dir: str = "",
         rate_limit: int = 20,
+        groups: Optional[List[TemplateGroup]] = None,
+        shards: int = 1,
+        severity_tiers: bool = False,
+        stop_after_tier: Optional[str] = None,
+        on_tier: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+        index: Optional[TemplateIndex] = None,
         **kwargs
     ) -> None:
         """
@@ -34,6 +65,13 @@ class NucleiModule(Module):
         :param templates_dir: Path to nuclei templates directory.
         :param scan_type: One of ScanType.
         :param additional_flags: Extra CLI flags.
+        :param groups: Targets grouped by selected template set.
+        :param shards: Number of parallel nuclei processes per group.
+        :param severity_tiers: Run templates tier by tier.
+        :param stop_after_tier: Last tier to run, None runs all.
+        :param on_tier: Called with tier name and result after each tier.
+        :param index: Loaded index of templates_dir, loaded on first use
+            if not given.
         """
         # check for unexpected args
         # unexpected_args = set(kwargs) - {f.name for f in fields(self)}
@@ -51,10 +89,30 @@ class NucleiModule(Module):
             rate_limit=rate_limit
         )
         self.templates_dir = templates_dir
+        self.groups = groups
+        self.shards = max(shards, 1)
+        if stop_after_tier and stop_after_tier not in SEVERITY_TIERS:
+            raise ValueError(f"Unknown severity tier: {stop_after_tier}")
+        self.severity_tiers = severity_tiers
+        self.stop_after_tier = stop_after_tier
+        self.on_tier = on_tier
+        self.index = index
 
-    def _build_command(self, target_str: str) -> List[str]:
+    def _build_command(
+        self,
+        target_str: str,
+        exclude_tags: Optional[List[str]] = None,
+        templates: Optional[str] = None,
+        rate_limit: Optional[int] = None,
+        severities: Optional[List[str]] = None
+    ) -> List[str]:
         """
         Construct the nuclei command based on target and configuration.
+
+        :param templates: file with template paths of a shard,
+            overrides templates_dir
+        :param rate_limit: rate limit of a shard, overrides rate_limit
+        :param severities: run only templates of these severities
         """
         cmd = super()._build_base_command()
         cmd += ["-silent", "-j", "-disable-update-check", "-fr"]
@@ -67,9 +125,17 @@ class NucleiModule(Module):
             case _:
                 cmd.extend(["-u", target_str])
 
-        if self.templates_dir:
+        if templates:
+            cmd += ["-t", templates]
+        elif self.templates_dir:
             cmd += ["-t", self.templates_dir]
 
+        if exclude_tags:
+            cmd += ["-etags", ",".join(exclude_tags)]
+
+        if severities:
+            cmd += ["-severity", ",".join(severities)]
+
         # match self.scan_type:
         #     case ScanType.AGGRESSIVE:
         #         # increase rate-limit for aggressive mode
@@ -90,7 +156,10 @@ class NucleiModule(Module):
         if self.exclude:
             cmd.extend(["-exclude-hosts", ",".join(self.exclude)])
 
-        cmd += ["-rate-limit", str(self.rate_limit)]
+        if self.progress_callback is not None:
+            cmd += ["-stats", "-sj"]
+
+        cmd += ["-rate-limit", str(rate_limit or self.rate_limit)]
         logger.info(f"Command: {cmd}")
         return cmd
 
@@ -102,13 +171,16 @@ class NucleiModule(Module):
             raise Exception("Invalid template directory")
 
     @classmethod
-    def update_templates(cls) -> None:
+    def update_templates(cls, templates_dir: str = "") -> None:
         """
-        Update the nuclei templates to the latest version.
+        Update the nuclei templates to the latest version
+        and incrementally rebuild the template index.
         """
         logger.info("Updating nuclei templates...")
 
         cmd = [f"{cls.binary_name}", "-update-templates"]
+        if templates_dir:
+            cmd += ["-update-template-dir", templates_dir]
         result = subprocess.run(
             cmd,
             capture_output=True,
@@ -116,8 +188,17 @@ class NucleiModule(Module):
             timeout=240
         )
         logger.info(result.stdout or result.stderr)
+        # the only place the template tree is walked again
+        TemplateIndex(templates_dir or None).build()
         return cls._parse_version(result.stdout or result.stderr)
 
+    @classmethod
+    def template_index(cls, templates_dir: str = "") -> TemplateIndex:
+        """
+        Loaded (or freshly built) index of the templates directory.
+        """
+        return TemplateIndex(templates_dir or None).load_or_build()
+
     @classmethod
     def update_nuclei(cls) -> None:
         """
@@ -136,6 +217,266 @@ class NucleiModule(Module):
         return cls._parse_version(result.stdout or result.stderr)
 
     def _parse_output(self, output: str) -> List[Dict[str, Any]]:
-        return [
+        records = [
             json.loads(line) for line in output.splitlines() if line.strip()
         ]
+        # statistics lines (-stats -sj) are not findings
+        return [r for r in records if "template-id" in r]
+
+    def _parse_progress(
+        self,
+        stream: str,
+        line: str
+    ) -> Optional[ProgressRecord]:
+        return parse_nuclei_stats(line)
+
+    def replay(self, stored: Dict[str, Any]) -> Dict[str, Any]:
+        result = super().replay(stored)
+        if "parsed" in result:
+            # output of all groups, tiers and shards is stored joined
+            result["parsed"] = dedupe_findings(result["parsed"])
+        return result
+
+    def _loaded_index(self) -> TemplateIndex:
+        """
+        Index of templates_dir, loaded once for all groups, tiers
+            and shards of the module
+        """
+        if self.index is None:
+            self.index = self.template_index(self.templates_dir)
+        return self.index
+
+    def _shard_templates(
+        self,
+        exclude_tags: Optional[List[str]] = None,
+        severities: Optional[List[str]] = None,
+        templates: Optional[List[str]] = None
+    ) -> List[List[str]]:
+        """
+        Split the templates selected for a group into shards
+
+        :param templates: relative paths the selection is limited to
+        :return: lists of absolute template paths, empty if no
+            template is selected
+        """
+        index = self._loaded_index()
+        allowed = set(templates) if templates is not None else None
+        entries = [
+            entry for entry in index.query(
+                exclude_tags=exclude_tags, severities=severities
+            )
+            # workflows can not be passed with -t
+            if entry.protocol != "workflow"
+            and (allowed is None or entry.path in allowed)
+        ]
+        if not entries:
+            return []
+
+        # round robin over sorted paths mixes directories (and so
+        # protocols and template weights) evenly between shards
+        shards: List[List[str]] = [
+            [] for _ in range(min(self.shards, len(entries)))
+        ]
+        for i, entry in enumerate(sorted(entries, key=lambda e: e.path)):
+            shards[i % len(shards)].append(
+                os.path.join(index.templates_dir, entry.path)
+            )
+        return shards
+
+    def _run_invocation(
+        self,
+        target_str: str,
+        exclude_tags: Optional[List[str]] = None,
+        templates: Optional[str] = None,
+        rate_limit: Optional[int] = None,
+        severities: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        command = self._build_command(
+            target_str, exclude_tags, templates, rate_limit, severities
+        )
+        result = self._post_run(target_str, self._execute_command(command))
+        self._emit_records(
+            result.get("parsed", []),
+            os.path.basename(templates) if templates else None
+        )
+        return result
+
+    def _run_sharded(
+        self,
+        target_str: str,
+        exclude_tags: Optional[List[str]] = None,
+        severities: Optional[List[str]] = None,
+        templates: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run template shards as parallel nuclei processes and merge them
+
+        :param templates: relative template paths, None for all
+        """
+        if self.shards <= 1 and templates is None:
+            return self._run_invocation(
+                target_str, exclude_tags, severities=severities
+            )
+        shards = self._shard_templates(exclude_tags, severities, templates)
+        if not shards:
+            if templates is not None:
+                # nothing selected for the group in this tier
+                return {"result": "", "parsed": []}
+            return self._run_invocation(
+                target_str, exclude_tags, severities=severities
+            )
+
+        rate_limit = max(self.rate_limit // len(shards), 1)
+        files: List[str] = []
+        try:
+            for shard in shards:
+                with tempfile.NamedTemporaryFile(
+                    "w", suffix=".txt", prefix="nuclei-shard-", delete=False
+                ) as f:
+                    f.write("\n".join(shard))
+                files.append(f.name)
+
+            with ThreadPoolExecutor(max_workers=len(files)) as pool:
+                results = list(pool.map(
+                    lambda path: self._run_invocation(
+                        target_str, exclude_tags, path, rate_limit,
+                        severities
+                    ),
+                    files
+                ))
+        finally:
+            for path in files:
+                os.unlink(path)
+
+        ok = [res for res in results if "error" not in res]
+        errors = [res for res in results if "error" in res]
+        if not ok:
+            return errors[0]
+
+        merged = {
+            "result": join_outputs([res["result"] for res in ok]),
+            "parsed": dedupe_findings(
+                record for res in ok for record in res["parsed"]
+            ),
+            "shards": len(shards)
+        }
+        if errors:
+            merged["errors"] = errors
+        return merged
+
+    def _run_groups(
+        self,
+        groups: List[TemplateGroup],
+        severities: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Run every template group, optionally limited to severities
+        """
+        outputs: List[str] = []
+        parsed: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        for group in groups:
+            if not group.targets:
+                continue
+            target_str = ",".join(group.targets)
+            try:
+                self._pre_run(target_str)
+                res = self._run_sharded(
+                    target_str, group.exclude_tags, severities,
+                    group.templates
+                )
+            except Exception as e:
+                logger.exception(
+                    f"[NucleiModule] Group "
+                    f"{sorted(group.technologies)} failed: {e}"
+                )
+                res = {"error": str(e)}
+
+            errors.extend(
+                {"technologies": sorted(group.technologies), **err}
+                for err in res.get("errors", [])
+            )
+            if "error" in res:
+                errors.append({
+                    "technologies": sorted(group.technologies),
+                    **res
+                })
+                continue
+            outputs.append(res["result"])
+            parsed.extend(res["parsed"])
+
+        return {
+            "result": join_outputs(outputs),
+            "parsed": dedupe_findings(parsed),
+            "errors": errors
+        }
+
+    def run(self) -> Dict[str, Any]:
+        groups = self.groups
+        if not groups:
+            if self.shards <= 1 and not self.severity_tiers:
+                return super().run()
+            try:
+                groups = [TemplateGroup(
+                    frozenset(), [], targets=[self._prepare_target()]
+                )]
+            except Exception as e:
+                logger.exception(
+                    f"Critical error in module {self.__class__.__name__}: {e}"
+                )
+                return {
+                    "error": str(e),
+                    "success": False,
+                    "tool": self.__class__.__name__
+                }
+
+        tiers = SEVERITY_TIERS if self.severity_tiers else {None: None}
+        outputs: List[str] = []
+        parsed: List[Dict[str, Any]] = []
+        errors: List[Dict[str, Any]] = []
+        tier_summary: List[Dict[str, Any]] = []
+        for tier, severities in tiers.items():
+            res = self._run_groups(groups, severities)
+            outputs.append(res["result"])
+            parsed.extend(res["parsed"])
+            errors.extend(
+                {"tier": tier, **err} if tier else err
+                for err in res["errors"]
+            )
+            if tier is None:
+                continue
+
+            logger.info(
+                f"[NucleiModule] Tier {tier}: "
+                f"{len(res['parsed'])} findings"
+            )
+            tier_summary.append({
+                "tier": tier, "findings": len(res["parsed"])
+            })
+            if self.on_tier:
+                try:
+                    self.on_tier(tier, res)
+                except Exception as e:
+                    logger.exception(
+                        f"[NucleiModule] Tier {tier} callback failed: {e}"
+                    )
+            if tier == self.stop_after_tier:
+                break
+
+        result = {
+            "result": join_outputs(outputs),
+            "parsed": dedupe_findings(parsed),
+            "groups": [
+                {
+                    "technologies": sorted(group.technologies),
+                    "targets": len(group.targets),
+                    "excluded_tags": len(group.exclude_tags)
+                }
+                for group in groups
+            ]
+        }
+        if tier_summary:
+            result["tiers"] = tier_summary
+        if errors:
+            result["errors"] = errors
+        return result
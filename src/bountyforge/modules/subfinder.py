@@ -12,8 +12,12 @@ class SubfinderModule(Module):
     Module for passive subdomain enumeration using subfinder
 
     The scan_type is fixed to RECON by default
+
+    Every domain is enumerated by its own invocation (`batch_size`),
+    so a failing domain is retried without the others
     """
     binary_name = "subfinder"
+    batch_size = 1
 
     def __init__(
         self,
@@ -0,0 +1,396 @@
+"""
+MongoDB access shared by the API, the frontend and the workers
+
+Every process keeps one pooled MongoClient (a new one after a fork,
+clients must not be shared with child processes). ScanRepository holds
+the queries of the job and result collections, ensure_indexes creates
+the indexes these queries rely on
+"""
+
+import datetime
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING, InsertOne, MongoClient
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError, ConnectionFailure
+
+from bountyforge.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[MongoClient] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+# collection -> (keys, options) of its indexes
+INDEXES: Dict[str, List[Tuple[List[Tuple[str, int]], Dict[str, Any]]]] = {
+    "scan_jobs": [
+        ([("job_id", ASCENDING)], {"unique": True}),
+        ([("initiator", ASCENDING), ("timestamp", DESCENDING)], {}),
+        ([("timestamp", DESCENDING)], {}),
+    ],
+    "scan_results": [
+        ([("job_id", ASCENDING), ("timestamp", ASCENDING)], {}),
+    ],
+    "scan_result_chunks": [
+        ([
+            ("job_id", ASCENDING), ("stage", ASCENDING),
+            ("field", ASCENDING), ("seq", ASCENDING)
+        ], {}),
+    ],
+    "scan_hosts": [
+        ([("job_id", ASCENDING), ("stage", ASCENDING), ("seq", ASCENDING)],
+         {}),
+        ([("job_id", ASCENDING), ("host", ASCENDING)], {}),
+    ],
+    "scan_ports": [
+        ([("job_id", ASCENDING), ("stage", ASCENDING), ("seq", ASCENDING)],
+         {}),
+        ([("job_id", ASCENDING), ("port", ASCENDING)], {}),
+        ([("job_id", ASCENDING), ("service", ASCENDING)], {}),
+    ],
+    "scan_endpoints": [
+        ([("job_id", ASCENDING), ("stage", ASCENDING), ("seq", ASCENDING)],
+         {}),
+        ([("job_id", ASCENDING), ("status_code", ASCENDING)], {}),
+    ],
+    "scan_directories": [
+        ([("job_id", ASCENDING), ("stage", ASCENDING), ("seq", ASCENDING)],
+         {}),
+        ([("job_id", ASCENDING), ("status", ASCENDING)], {}),
+    ],
+    "scan_findings": [
+        ([("job_id", ASCENDING), ("stage", ASCENDING), ("seq", ASCENDING)],
+         {}),
+        ([("job_id", ASCENDING), ("info.severity", ASCENDING)], {}),
+        ([("job_id", ASCENDING), ("template-id", ASCENDING)], {}),
+    ],
+    "stage_resources": [
+        ([("timestamp", DESCENDING)], {}),
+    ],
+}
+
+
+def get_client() -> MongoClient:
+    """
+    Pooled client of the current process
+    """
+    global _client, _client_pid
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            _client = MongoClient(
+                settings.backend.mongo_url,
+                maxPoolSize=settings.backend.mongo_pool_size
+            )
+            _client_pid = os.getpid()
+        return _client
+
+
+def get_db() -> Database:
+    """
+    Default database of the configured mongo url
+    """
+    return get_client().get_default_database()
+
+
+def ensure_indexes(db: Optional[Database] = None) -> None:
+    """
+    Create the declared indexes, existing ones are left as they are
+    """
+    db = db if db is not None else get_db()
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            try:
+                db[collection].create_index(keys, **options)
+            except ConnectionFailure as e:
+                logger.warning(f"Creating indexes failed: {e}")
+                return
+            except Exception as e:
+                # e.g. duplicates of a unique key in old data
+                logger.warning(
+                    f"Creating index {keys} on {collection} failed: {e}"
+                )
+
+
+class ScanRepository:
+    """
+    Queries of the scan_jobs and scan_results collections
+    """
+
+    def __init__(self, db: Optional[Database] = None) -> None:
+        self.db = db if db is not None else get_db()
+
+    # scan_jobs
+
+    def insert_job(self, job: Dict[str, Any]) -> None:
+        self.db.scan_jobs.insert_one(dict(job))
+
+    def set_job_status(self, job_id: str, status: str) -> None:
+        self.db.scan_jobs.update_one(
+            {"job_id": job_id}, {"$set": {"status": status}}
+        )
+
+    def find_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.db.scan_jobs.find_one({"job_id": job_id}, {"_id": 0})
+
+    def jobs_of(self, initiator: str) -> List[Dict[str, Any]]:
+        """
+        Jobs started by a user, newest first
+        """
+        return list(self.db.scan_jobs.find(
+            {"initiator": initiator}, {"_id": 0}
+        ).sort("timestamp", DESCENDING))
+
+    def last_job(self, initiator: str) -> Optional[Dict[str, Any]]:
+        return self.db.scan_jobs.find_one(
+            {"initiator": initiator},
+            {"_id": 0},
+            sort=[("timestamp", DESCENDING)]
+        )
+
+    def all_jobs(self) -> Iterator[Dict[str, Any]]:
+        """
+        Id, timestamp and status of every job, newest first
+        """
+        return self.db.scan_jobs.find(
+            {}, {"_id": 0, "job_id": 1, "timestamp": 1, "status": 1}
+        ).sort("timestamp", DESCENDING)
+
+    def jobs_since(
+        self,
+        initiator: str,
+        since: datetime.datetime
+    ) -> List[Dict[str, Any]]:
+        """
+        Targets of the jobs a user started since a point in time
+        """
+        return list(self.db.scan_jobs.find(
+            {"initiator": initiator, "timestamp": {"$gte": since}},
+            {"_id": 0, "job_id": 1, "targets": 1}
+        ))
+
+    # scan_results
+
+    def insert_result(self, record: Dict[str, Any]) -> None:
+        self.db.scan_results.insert_one(dict(record))
+
+    def find_result(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self.db.scan_results.find_one({"job_id": job_id}, {"_id": 0})
+
+    def results_of(self, job_id: str) -> List[Dict[str, Any]]:
+        """
+        Result records of a job, oldest first
+        """
+        return list(self.db.scan_results.find(
+            {"job_id": job_id},
+            sort=[("timestamp", ASCENDING)],
+            projection={"_id": 0}
+        ))
+
+    def count_results(self, job_id: str) -> int:
+        return self.db.scan_results.count_documents({"job_id": job_id})
+
+
+class RecordRepository:
+    """
+    Parsed records of scan stages, one collection per kind of record
+
+    Records are stored with the job, the stage that produced them and
+    their position in the stage output (seq)
+    """
+    # records per insert_many call
+    batch_size: int = 1000
+    # fields added to the stored records
+    META_FIELDS = ("_id", "job_id", "stage", "seq", "shard")
+
+    def __init__(self, db: Optional[Database] = None) -> None:
+        self.db = db if db is not None else get_db()
+
+    def insert(
+        self,
+        collection: str,
+        job_id: str,
+        stage: str,
+        records: Iterable[Dict[str, Any]]
+    ) -> int:
+        """
+        Store the records of a stage in batches
+
+        :return: number of stored records
+        """
+        count = 0
+        batch: List[Dict[str, Any]] = []
+        for record in records:
+            batch.append({
+                **record, "job_id": job_id, "stage": stage, "seq": count
+            })
+            count += 1
+            if len(batch) >= self.batch_size:
+                self.db[collection].insert_many(batch, ordered=False)
+                batch = []
+        if batch:
+            self.db[collection].insert_many(batch, ordered=False)
+        return count
+
+    def delete(self, collection: str, job_id: str, stage: str) -> None:
+        self.db[collection].delete_many({"job_id": job_id, "stage": stage})
+
+    def records(
+        self,
+        collection: str,
+        job_id: str,
+        stage: str
+    ) -> List[Dict[str, Any]]:
+        """
+        Records of a stage in their original order
+        """
+        cursor = self.db[collection].find(
+            {"job_id": job_id, "stage": stage},
+            {field: 0 for field in self.META_FIELDS}
+        ).sort("seq", ASCENDING)
+        return list(cursor)
+
+    def query(
+        self,
+        collection: str,
+        job_id: str,
+        filters: Optional[Dict[str, Any]] = None,
+        skip: int = 0,
+        limit: int = 100
+    ) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        A page of the records of a job
+
+        :param filters: equality filters on record fields
+        :return: total number of matching records and the page
+        """
+        query = {**(filters or {}), "job_id": job_id}
+        total = self.db[collection].count_documents(query)
+        cursor = self.db[collection].find(
+            query, {"_id": 0, "job_id": 0}
+        ).sort([("stage", ASCENDING), ("seq", ASCENDING)])
+        return total, list(cursor.skip(skip).limit(limit))
+
+
+class BulkWriter:
+    """
+    Writes records of a running job as they are produced
+
+    Records are buffered and written with unordered bulk_write calls
+    once `batch_size` of them are pending or `flush_interval` seconds
+    passed, so partial results are queryable during the scan without
+    a round trip per record
+    """
+
+    def __init__(
+        self,
+        job_id: str,
+        db: Optional[Database] = None,
+        batch_size: int = 500,
+        flush_interval: float = 5.0
+    ) -> None:
+        """
+        :param job_id: job the records belong to
+        :param db: MongoDB database
+        :param batch_size: pending records that trigger a flush
+        :param flush_interval: seconds after which pending records
+            are flushed by the background thread
+        """
+        self.job_id = job_id
+        self.db = db if db is not None else get_db()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.failed = 0
+        self._buffer: Dict[str, List[InsertOne]] = defaultdict(list)
+        self._pending = 0
+        self._seq: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(
+        self,
+        collection: str,
+        stage: str,
+        records: Iterable[Dict[str, Any]],
+        shard: Optional[str] = None
+    ) -> None:
+        """
+        Queue records of a stage, tagged with the stage and shard
+        """
+        with self._lock:
+            for record in records:
+                self._buffer[collection].append(InsertOne({
+                    **record,
+                    "job_id": self.job_id,
+                    "stage": stage,
+                    "shard": shard,
+                    "seq": self._seq[stage]
+                }))
+                self._seq[stage] += 1
+                self._pending += 1
+            full = self._pending >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Write all pending records
+        """
+        with self._lock:
+            buffer, self._buffer = self._buffer, defaultdict(list)
+            self._pending = 0
+        for collection, ops in buffer.items():
+            for i in range(0, len(ops), self.batch_size):
+                self._write(collection, ops[i:i + self.batch_size])
+
+    def _write(self, collection: str, ops: List[InsertOne]) -> None:
+        started = time.monotonic()
+        try:
+            res = self.db[collection].bulk_write(ops, ordered=False)
+            self.written += res.inserted_count
+        except BulkWriteError as e:
+            inserted = e.details.get("nInserted", 0)
+            self.written += inserted
+            self.failed += len(ops) - inserted
+            logger.warning(
+                f"[BulkWriter] {len(ops) - inserted} of {len(ops)} "
+                f"records to {collection} failed"
+            )
+        except Exception as e:
+            self.failed += len(ops)
+            logger.warning(f"[BulkWriter] Writing to {collection} failed: {e}")
+        else:
+            logger.debug(
+                f"[BulkWriter] {len(ops)} records to {collection} in "
+                f"{time.monotonic() - started:.3f}s"
+            )
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
+
+    def start(self) -> "BulkWriter":
+        """
+        Start flushing by age in a background thread
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """
+        Stop the background thread and write what is pending
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
@@ -6,9 +6,8 @@ from flask_httpauth import HTTPBasicAuth
 from werkzeug.security import generate_password_hash, check_password_hash
 import requests
 from datetime import timedelta
-from pymongo import MongoClient
-
 from bountyforge.config import settings
+from bountyforge.repository import ScanRepository
 from bountyforge.utils import init_logging
 
 logger = logging.getLogger('web')
@@ -127,12 +126,7 @@ def scan_settings():
 @app.route("/scan_history")
 @login_required
 def scan_history():
-    mongo = MongoClient(settings.backend.mongo_url)
-    db = mongo.get_default_database()
-    docs = db.scan_jobs\
-             .find({"initiator": session["user"]}, {"_id": 0})\
-             .sort("timestamp", -1)
-    history = list(docs)
+    history = ScanRepository().jobs_of(session["user"])
     return render_template("scan_history.html", history=history)
 
 
@@ -1,5 +1,14 @@
+import os
+
 import pytest
-from bountyforge.config import settings, Config
+
+# bountyforge.core connects to the default database on import,
+# so the test run needs a mongo url with a database name
+os.environ.setdefault(
+    "BACKEND__MONGO_URL", "mongodb://localhost:27017/bountyforge_test"
+)
+
+from bountyforge.config import settings, Config  # noqa: E402
 
 
 @pytest.fixture(scope='session')
@@ -0,0 +1,124 @@
+from bountyforge.core.clustering import (
+    attribute_findings, cluster_responses, response_fingerprint
+)
+
+
+def probe(url, body="parked", title="Parked", tech=("Nginx",), status=200):
+    return {
+        "url": url,
+        "hash": {"body_sha256": body} if body else None,
+        "title": title,
+        "tech": list(tech),
+        "status_code": status,
+    }
+
+
+def test_response_fingerprint():
+    assert response_fingerprint(probe("http://a")) == response_fingerprint(
+        probe("http://b", title=" parked ", tech=("nginx",))
+    )
+    assert response_fingerprint(probe("http://a")) != response_fingerprint(
+        probe("http://a", status=404)
+    )
+    # records without a body hash are keyed by their own URL
+    assert response_fingerprint(probe("http://a", body=None)) \
+        == ("url", "http://a")
+
+
+def test_cluster_responses():
+    records = [
+        probe("http://parked-long.example.com/"),
+        probe("http://p.example.com"),
+        probe("http://app.example.com", body="app", title="App"),
+        probe("http://p2.example.com"),
+        probe("http://p.example.com"),
+        probe("http://live1.example.com", body=None),
+        probe("http://live2.example.com", body=None),
+        {"title": "no url"},
+    ]
+    clusters = cluster_responses(records, representatives=2)
+    assert [c.members for c in clusters] == [
+        [
+            "http://parked-long.example.com/",
+            "http://p.example.com",
+            "http://p2.example.com",
+        ],
+        ["http://app.example.com"],
+        ["http://live1.example.com"],
+        ["http://live2.example.com"],
+    ]
+    # shortest URLs represent the cluster
+    assert clusters[0].representatives == [
+        "http://p.example.com", "http://p2.example.com"
+    ]
+    assert clusters[0].followers == ["http://parked-long.example.com/"]
+    assert all(not c.followers for c in clusters[1:])
+
+    # at least one member is always scanned
+    clusters = cluster_responses(records[:2], representatives=0)
+    assert clusters[0].representatives == ["http://p.example.com"]
+
+
+def test_attribute_findings():
+    clusters = cluster_responses([
+        probe("http://a.example.com"),
+        probe("http://b.example.com"),
+        probe("http://c.example.com"),
+        probe("http://solo.example.com", body="solo"),
+    ])
+    assert clusters[0].representatives == ["http://a.example.com"]
+    findings = [
+        {"template-id": "default-page", "host": "http://a.example.com",
+         "matched-at": "http://a.example.com/index.php?x=1"},
+        # a different host sharing the representative's prefix
+        {"template-id": "other", "host": "http://a.example.com.evil",
+         "matched-at": "http://a.example.com.evil/"},
+        {"template-id": "solo", "host": "http://solo.example.com",
+         "matched-at": "http://solo.example.com/"},
+    ]
+    result = attribute_findings(findings, clusters)
+    assert result[:3] == findings
+    assert [
+        (r["template-id"], r["host"], r["matched-at"], r["attributed_from"])
+        for r in result[3:]
+    ] == [
+        ("default-page", "http://b.example.com",
+         "http://b.example.com/index.php?x=1", "http://a.example.com"),
+        ("default-page", "http://c.example.com",
+         "http://c.example.com/index.php?x=1", "http://a.example.com"),
+    ]
+
+
+def test_attribute_findings_without_followers():
+    findings = [{"template-id": "x", "matched-at": "http://a.example.com"}]
+    clusters = cluster_responses([probe("http://a.example.com")])
+    assert attribute_findings(findings, clusters) is findings
+    assert attribute_findings(findings, []) is findings
+
+
+def test_attribute_findings_of_several_representatives():
+    clusters = cluster_responses([
+        probe("http://a.example.com"),
+        probe("http://b.example.com"),
+        probe("http://follower.example.com"),
+    ], representatives=2)
+    assert clusters[0].followers == ["http://follower.example.com"]
+    findings = [
+        {"template-id": "default-page", "matched-at": "http://a.example.com/"},
+        {"template-id": "default-page", "matched-at": "http://b.example.com/"},
+        {"template-id": "exposed-env",
+         "matched-at": "http://b.example.com/.env"},
+        {"template-id": "exposed-env",
+         "matched-at": "http://b.example.com/app/.env"},
+    ]
+    copies = attribute_findings(findings, clusters)[len(findings):]
+    # one copy per template and follower, every path of its source
+    assert [(c["template-id"], c["matched-at"], c["attributed_from"])
+            for c in copies] == [
+        ("default-page", "http://follower.example.com/",
+         "http://a.example.com"),
+        ("exposed-env", "http://follower.example.com/.env",
+         "http://b.example.com"),
+        ("exposed-env", "http://follower.example.com/app/.env",
+         "http://b.example.com"),
+    ]
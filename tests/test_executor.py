@@ -0,0 +1,103 @@
+import sys
+
+from bountyforge.core.executor import (
+    STALLED, TIMEOUT, ProcessRunner, SpooledOutput, join_outputs
+)
+
+
+def python(code: str):
+    return [sys.executable, "-u", "-c", code]
+
+
+def test_process_completes():
+    result = ProcessRunner(
+        python("import sys; print('out'); print('err', file=sys.stderr)"),
+        timeout=30, idle_timeout=30
+    ).run()
+    assert result.returncode == 0
+    assert result.stdout == "out\n"
+    assert result.stderr == "err\n"
+    assert not result.truncated
+    assert result.rusage["max_rss_kb"] > 0
+    assert result.rusage["wall_time"] > 0
+
+
+def test_stalled_process_keeps_partial_output():
+    runner = ProcessRunner(
+        python("import time; print('partial'); time.sleep(30)"),
+        idle_timeout=0.5
+    )
+    runner.poll_interval = 0.1
+    result = runner.run()
+    assert result.truncated
+    assert result.reason == STALLED
+    assert result.stdout == "partial\n"
+    assert result.wall_time < 10
+    assert result.returncode != 0
+    assert "user_cpu" in result.rusage
+
+
+def test_timeout_with_steady_output():
+    runner = ProcessRunner(
+        python(
+            "import time\n"
+            "while True:\n"
+            "    print('tick')\n"
+            "    time.sleep(0.05)"
+        ),
+        timeout=0.5, idle_timeout=5
+    )
+    runner.poll_interval = 0.1
+    result = runner.run()
+    assert result.truncated
+    assert result.reason == TIMEOUT
+    assert result.stdout.startswith("tick\n")
+
+
+def test_spooled_capture():
+    result = ProcessRunner(
+        python(
+            "import sys\n"
+            "for i in range(2000):\n"
+            "    print(f'line {i}')\n"
+            "    print('x' * 50, file=sys.stderr)"
+        ),
+        timeout=30, spool_threshold=1024, stderr_limit=200
+    ).run()
+    assert isinstance(result.stdout, SpooledOutput)
+    assert result.stdout.spooled
+    lines = list(result.stdout.splitlines())
+    assert lines[0] == "line 0" and lines[-1] == "line 1999"
+    with result.stdout.mmap() as mapped:
+        assert mapped[:7] == b"line 0\n"
+    assert result.stderr.startswith("[")
+    assert result.stderr.endswith("x" * 50 + "\n")
+    assert len(result.stderr) < 300
+
+    joined = join_outputs(["first", result.stdout])
+    assert isinstance(joined, SpooledOutput)
+    assert joined.getvalue().startswith("first\nline 0\n")
+    joined.close()
+
+
+def test_small_output_is_not_spooled():
+    result = ProcessRunner(
+        python("print('out')"), timeout=30, spool_threshold=1024
+    ).run()
+    assert result.stdout == "out\n"
+
+
+def test_heartbeat_lines_do_not_hold_off_stall():
+    runner = ProcessRunner(
+        python(
+            "import time\n"
+            "while True:\n"
+            "    print('stats')\n"
+            "    time.sleep(0.05)"
+        ),
+        idle_timeout=0.5,
+        on_line=lambda stream, line: line.strip() != "stats"
+    )
+    runner.poll_interval = 0.1
+    result = runner.run()
+    assert result.reason == STALLED
@@ -0,0 +1,33 @@
+from bountyforge.core.findings import aggregate_findings, dedupe_findings
+
+
+def test_dedupe_findings():
+    records = [
+        {"template-id": "a", "matched-at": "http://x", "matcher-name": "m"},
+        {"template-id": "a", "matched-at": "http://x", "matcher-name": "m"},
+        {"template-id": "a", "matched-at": "http://x", "matcher-name": "n"},
+    ]
+    assert dedupe_findings(records) == [records[0], records[2]]
+
+
+def test_aggregate_findings():
+    records = [
+        {"template-id": "git-config", "matched-at": "http://x.com/.git",
+         "extracted-results": ["b", "a"]},
+        {"template-id": "git-config", "matched-at": "https://X.com:8443/.git",
+         "extracted-results": ["a", "b"]},
+        {"template-id": "git-config", "matched-at": "http://y.com/.git",
+         "extracted-results": ["a", "b"]},
+        {"template-id": "git-config", "matched-at": "http://x.com/.git",
+         "extracted-results": ["c"]},
+    ]
+    result = aggregate_findings(records)
+    assert len(result) == 3
+    assert result[0]["occurrences"] == 2
+    assert result[0]["locations"] == [
+        "http://x.com/.git", "https://X.com:8443/.git"
+    ]
+    assert [r["occurrences"] for r in result[1:]] == [1, 1]
+
+    # aggregating again keeps counts and locations
+    assert aggregate_findings(result) == result
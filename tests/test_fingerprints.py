@@ -0,0 +1,149 @@
+import datetime
+import os
+import stat
+
+from pymongo.errors import OperationFailure
+
+from bountyforge.core.fingerprints import FingerprintCache
+from bountyforge.core.module_base import ScanType
+from bountyforge.modules.nmap import NmapModule
+
+
+def matches(doc, query):
+    for key, cond in query.items():
+        value = doc.get(key)
+        if isinstance(cond, dict):
+            if "$in" in cond and value not in cond["$in"]:
+                return False
+            if "$gte" in cond and not (value and value >= cond["$gte"]):
+                return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+        self.indexes = []
+
+    def drop_index(self, name):
+        raise OperationFailure("index not found")
+
+    def create_index(self, keys, **options):
+        self.indexes.append(keys)
+
+    def find(self, query, projection=None):
+        hidden = {k for k, v in (projection or {}).items() if not v}
+        return [
+            {k: v for k, v in doc.items() if k not in hidden}
+            for doc in self.docs if matches(doc, query)
+        ]
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            doc = next(
+                (d for d in self.docs if matches(d, op._filter)), None
+            )
+            if doc is None:
+                doc = dict(op._filter)
+                self.docs.append(doc)
+            doc.update(op._doc["$set"])
+
+
+ENTRY = {"ip": "10.0.0.1", "port": "22/tcp", "state": "open",
+         "service": "ssh", "info": "OpenSSH 9.6"}
+
+
+def test_fingerprint_cache_round_trip():
+    cache = FingerprintCache(FakeCollection())
+    cache.store([ENTRY, {"host": "10.0.0.1"}], profile="-sV")
+    hits = cache.lookup("10.0.0.1", [22, 80], profile="-sV")
+    assert list(hits) == [22]
+    assert hits[22]["info"] == "OpenSSH 9.6"
+    assert "profile" not in hits[22]
+    # a port seen closed by the discovery pass is not reused
+    assert cache.lookup("10.0.0.1", [22], "closed", "-sV") == {}
+
+
+def test_fingerprint_cache_is_per_profile():
+    cache = FingerprintCache(FakeCollection())
+    cache.store([ENTRY], profile="-sV")
+    assert cache.lookup("10.0.0.1", [22], profile="-A") == {}
+    cache.store([{**ENTRY, "scripts": {"ssh-hostkey": "..."}}], "-A")
+    assert "scripts" in cache.lookup("10.0.0.1", [22], profile="-A")[22]
+    assert "scripts" not in cache.lookup("10.0.0.1", [22], profile="-sV")[22]
+
+
+def test_fingerprint_cache_expiry():
+    collection = FakeCollection()
+    cache = FingerprintCache(collection, max_age=60)
+    cache.store([ENTRY])
+    collection.docs[0]["seen_at"] -= datetime.timedelta(seconds=120)
+    assert cache.lookup("10.0.0.1", [22]) == {}
+    assert FingerprintCache(collection, max_age=0).lookup(
+        "10.0.0.1", [22]
+    ) == {}
+
+
+def test_nmap_fingerprint_profile():
+    assert NmapModule("x")._fingerprint_profile() == "-sV"
+    assert NmapModule(
+        "x", scan_type=ScanType.FULL, additional_flags=["--script", "vuln"]
+    )._fingerprint_profile() == "-A --script vuln"
+
+
+def test_default_run_skips_version_scan_of_cached_ports(
+    tmp_path, monkeypatch
+):
+    # fake nmap: the sweep finds 22 and 80, -sV reports its -p ports
+    nmap = tmp_path / "nmap"
+    nmap.write_text(
+        "#!/bin/sh\n"
+        f"echo \"$@\" >> {tmp_path}/calls\n"
+        "echo 'Nmap scan report for 10.0.0.1'\n"
+        "echo 'PORT STATE SERVICE VERSION'\n"
+        "case \" $* \" in\n"
+        "  *' -sV '*)\n"
+        "    while [ $# -gt 0 ]; do\n"
+        "      if [ \"$1\" = -p ]; then ports=$2; fi; shift\n"
+        "    done\n"
+        "    for p in $(echo $ports | tr , ' '); do\n"
+        "      echo \"$p/tcp open http nginx\"\n"
+        "    done;;\n"
+        "  *) echo '22/tcp open ssh'; echo '80/tcp open http';;\n"
+        "esac\n"
+    )
+    nmap.chmod(nmap.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    cache = FingerprintCache(FakeCollection())
+    cache.store([ENTRY], profile="-sV")
+    # default settings: single-phase mode with the fingerprint cache
+    res = NmapModule("10.0.0.1", fingerprint_cache=cache).run()
+
+    version_passes = [
+        call.split() for call in
+        (tmp_path / "calls").read_text().splitlines() if "-sV" in call
+    ]
+    assert len(version_passes) == 1
+    assert version_passes[0][version_passes[0].index("-p") + 1] == "80"
+    by_port = {r["port"]: r for r in res["parsed"]}
+    assert by_port["22/tcp"]["cached"]
+    assert by_port["22/tcp"]["info"] == "OpenSSH 9.6"
+    assert by_port["80/tcp"]["info"] == "nginx"
+    # the new fingerprint is stored for the next run
+    assert cache.lookup("10.0.0.1", [80], profile="-sV")
+
+
+def test_run_without_fingerprint_ttl_is_single_phase(tmp_path, monkeypatch):
+    nmap = tmp_path / "nmap"
+    nmap.write_text(f"#!/bin/sh\necho \"$@\" >> {tmp_path}/calls\n")
+    nmap.chmod(nmap.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    NmapModule(
+        "10.0.0.1", fingerprint_cache=FingerprintCache(FakeCollection(), 0)
+    ).run()
+    calls = (tmp_path / "calls").read_text().splitlines()
+    assert len(calls) == 1 and "-sV" in calls[0]
@@ -0,0 +1,158 @@
+import socket
+
+from bountyforge.core import hostmap as hostmap_module
+from bountyforge.core.hostmap import HostMap, normalize_host, resolve_hosts
+from bountyforge.modules.nmap import NmapModule
+
+
+CDN = {"testcdn": ["198.51.100.0/24"]}
+
+NMAP_OUTPUT = """Starting Nmap 7.94 ( https://nmap.org )
+Nmap scan report for 192.0.2.10
+Host is up (0.010s latency).
+PORT    STATE SERVICE VERSION
+22/tcp  open  ssh     OpenSSH 8.9p1
+80/tcp  open  http    nginx 1.18.0
+| http-title: Welcome
+|_Requested resource was /login
+
+Nmap scan report for www.example.com (192.0.2.20)
+Host is up (0.020s latency).
+PORT    STATE  SERVICE
+443/tcp open   https
+8080/tcp closed http-proxy
+
+Host script results:
+|_clock-skew: 0s
+
+Nmap done: 2 IP addresses (2 hosts up) scanned in 1.23 seconds
+"""
+
+
+def test_normalize_host():
+    host = normalize_host("https://www.example.com:8443/x")
+    assert host == "www.example.com"
+    assert normalize_host("example.com") == "example.com"
+    assert normalize_host("192.0.2.1:80") == "192.0.2.1"
+
+
+def test_primary_address_is_numeric_ipv4_first():
+    hostmap = HostMap(CDN)
+    hostmap.add("a.example.com", ["10.0.0.10", "10.0.0.9"])
+    hostmap.add("b.example.com", ["2001:db8::1", "10.0.0.9"])
+    hostmap.add("c.example.com", ["2001:db8::10", "2001:db8::9"])
+    hostmap.add("d.example.com", [])
+
+    assert hostmap.ips == ["10.0.0.9", "2001:db8::9"]
+    assert hostmap.hosts_for("10.0.0.9") == [
+        "a.example.com", "b.example.com"
+    ]
+    assert hostmap.ips_for("a.example.com") == ["10.0.0.10", "10.0.0.9"]
+    assert hostmap.scan_targets() == [
+        "10.0.0.9", "2001:db8::9", "d.example.com"
+    ]
+
+
+def test_round_trip_and_cdn():
+    hostmap = HostMap.from_dict(
+        {"a.example.com": ["192.0.2.1"], "cdn.example.com": ["198.51.100.7"]},
+        ["gone.example.com"],
+        CDN
+    )
+    assert hostmap.as_dict() == {
+        "a.example.com": ["192.0.2.1"], "cdn.example.com": ["198.51.100.7"]
+    }
+    assert hostmap.unresolved == ["gone.example.com"]
+    assert hostmap.cdn_provider("198.51.100.7") == "testcdn"
+    assert hostmap.cdn_provider("192.0.2.1") is None
+    assert hostmap.cdn_provider("not-an-ip") is None
+    assert hostmap.scan_targets(skip_cdn=True) == [
+        "192.0.2.1", "gone.example.com"
+    ]
+
+
+def test_fan_out():
+    hostmap = HostMap(CDN)
+    hostmap.add("a.example.com", ["192.0.2.1"])
+    hostmap.add("b.example.com", ["192.0.2.1"])
+    hostmap.add("cdn.example.com", ["198.51.100.7"])
+
+    entries = [{"host": "192.0.2.1", "ip": "192.0.2.1", "port": "22/tcp",
+                "state": "open", "service": "ssh"}]
+    results = hostmap.fan_out(entries)
+    assert [(r["host"], r["port"]) for r in results] == [
+        ("a.example.com", "22/tcp"), ("b.example.com", "22/tcp")
+    ]
+    assert not any(r.get("synthesized") for r in results)
+
+    results = hostmap.fan_out(entries, skipped_cdn=True)
+    assumed = [r for r in results if r.get("synthesized")]
+    assert [(r["host"], r["port"], r["service"]) for r in assumed] == [
+        ("cdn.example.com", "80/tcp", "http"),
+        ("cdn.example.com", "443/tcp", "https"),
+    ]
+    assert all(r["assumed"] and r["cdn"] == "testcdn" for r in assumed)
+    # scanned entries never carry the flags
+    assert len(results) - len(assumed) == 2
+    assert not any(
+        r.get("assumed") for r in results if r not in assumed
+    )
+
+
+def test_nmap_parse_multi_host_output():
+    results = NmapModule("192.0.2.10")._parse_output(NMAP_OUTPUT)
+    assert [
+        (r["host"], r["ip"], r["port"], r["state"]) for r in results
+    ] == [
+        ("192.0.2.10", "192.0.2.10", "22/tcp", "open"),
+        ("192.0.2.10", "192.0.2.10", "80/tcp", "open"),
+        ("www.example.com", "192.0.2.20", "443/tcp", "open"),
+        ("www.example.com", "192.0.2.20", "8080/tcp", "closed"),
+    ]
+    assert results[0]["info"] == "OpenSSH 8.9p1"
+    assert results[1]["scripts"] == [
+        "http-title: Welcome", "Requested resource was /login"
+    ]
+    # host script results do not belong to the last port
+    assert "scripts" not in results[3]
+
+
+def test_resolve_hosts(monkeypatch):
+    zone = {
+        "a.example.com": ["192.0.2.1"],
+        "b.example.com": ["192.0.2.1", "2001:db8::1"],
+    }
+    lookups = []
+
+    def getaddrinfo(host, port, proto=0):
+        lookups.append(host)
+        if host not in zone:
+            raise socket.gaierror(socket.EAI_NONAME, "Name not known")
+        return [
+            (socket.AF_INET6 if ":" in ip else socket.AF_INET,
+             socket.SOCK_STREAM, proto, "", (ip, 0))
+            for ip in zone[host]
+        ]
+
+    monkeypatch.setattr(
+        hostmap_module.socket, "getaddrinfo", getaddrinfo
+    )
+    hostmap = resolve_hosts(
+        [
+            "https://a.example.com/login", "a.example.com",
+            "b.example.com:8443", "gone.example.com", "192.0.2.50", ""
+        ],
+        CDN
+    )
+    assert sorted(lookups) == [
+        "a.example.com", "b.example.com", "gone.example.com"
+    ]
+    assert hostmap.as_dict() == {
+        "a.example.com": ["192.0.2.1"],
+        "b.example.com": ["192.0.2.1", "2001:db8::1"],
+        "192.0.2.50": ["192.0.2.50"],
+    }
+    assert hostmap.unresolved == ["gone.example.com"]
+    assert hostmap.scan_targets() == [
+        "192.0.2.1", "192.0.2.50", "gone.example.com"
+    ]
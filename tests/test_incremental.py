@@ -0,0 +1,130 @@
+from bountyforge.core.incremental import RescanPlan, RescanPlanner
+from bountyforge.core.template_index import TemplateEntry, TemplateIndex
+from bountyforge.core.template_routing import TemplateGroup
+
+
+def matches(doc, query):
+    for key, cond in query.items():
+        if isinstance(cond, dict):
+            if "$in" in cond and doc.get(key) not in cond["$in"]:
+                return False
+            if "$nin" in cond and doc.get(key) in cond["$nin"]:
+                return False
+        elif doc.get(key) != cond:
+            return False
+    return True
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    def create_index(self, keys, **options):
+        pass
+
+    def find(self, query, projection=None):
+        return [dict(d) for d in self.docs if matches(d, query)]
+
+    def find_one(self, query, projection=None):
+        return next(iter(self.find(query)), None)
+
+    def distinct(self, key):
+        return list({d.get(key) for d in self.docs})
+
+    def delete_many(self, query):
+        self.docs = [d for d in self.docs if not matches(d, query)]
+
+    def _upsert(self, query, update):
+        doc = self.find_one(query)
+        if doc is None:
+            self.docs.append({**query, **update.get("$setOnInsert", {})})
+        for d in self.docs:
+            if matches(d, query):
+                d.update(update.get("$set", {}))
+
+    def update_one(self, query, update, upsert=False):
+        self._upsert(query, update)
+
+    def bulk_write(self, ops, ordered=True):
+        for op in ops:
+            self._upsert(op._filter, op._doc)
+
+
+def make_index(templates):
+    index = TemplateIndex("/nonexistent")
+    index.entries = {
+        path: TemplateEntry(id=tid, path=path, hash=h)
+        for path, (tid, h) in templates.items()
+    }
+    return index
+
+
+TEMPLATES = {"a.yaml": ("a", "1"), "b.yaml": ("b", "1")}
+ROOT = "https://example.com"
+PATH = "https://example.com/admin"
+HTTPX = [{"url": ROOT, "status_code": 200, "hash": {"body_sha256": "x"}}]
+FINDINGS = [
+    {"template-id": "a", "matched-at": f"{ROOT}/.git"},
+    {"template-id": "b", "matched-at": f"{PATH}/x"},
+]
+
+
+def first_run(state, snapshots):
+    planner = RescanPlanner(state, snapshots, make_index(TEMPLATES))
+    plan = planner.plan([ROOT, PATH], HTTPX)
+    assert plan.full == [ROOT, PATH]
+    planner.record(plan, HTTPX, FINDINGS)
+
+
+def test_unchanged_url_is_skipped():
+    state, snapshots = FakeCollection(), FakeCollection()
+    first_run(state, snapshots)
+
+    planner = RescanPlanner(state, snapshots, make_index(TEMPLATES))
+    plan = planner.plan([ROOT, PATH], HTTPX)
+    assert plan.skipped == [ROOT]
+    # the path has no probe of its own and is always scanned
+    assert plan.full == [PATH]
+    assert plan.carried == [{**FINDINGS[0], "carried": True}]
+
+
+def test_changed_fingerprint_is_scanned():
+    state, snapshots = FakeCollection(), FakeCollection()
+    first_run(state, snapshots)
+
+    planner = RescanPlanner(state, snapshots, make_index(TEMPLATES))
+    changed = [{**HTTPX[0], "hash": {"body_sha256": "y"}}]
+    plan = planner.plan([ROOT], changed)
+    assert plan.full == [ROOT] and plan.carried == []
+
+
+def test_changed_templates_partial_rescan():
+    state, snapshots = FakeCollection(), FakeCollection()
+    first_run(state, snapshots)
+
+    index = make_index({
+        "a.yaml": ("a", "2"), "b.yaml": ("b", "1"), "c.yaml": ("c", "1")
+    })
+    planner = RescanPlanner(state, snapshots, index)
+    plan = planner.plan([ROOT], HTTPX)
+    assert plan.partial == {ROOT: ["a.yaml", "c.yaml"]}
+    # findings of the modified template are outdated
+    assert plan.carried == []
+
+    planner.record(plan, HTTPX, [])
+    # the first snapshot is no longer referenced
+    assert [d["digest"] for d in snapshots.docs] == [index.digest]
+
+
+def test_plan_split():
+    plan = RescanPlan(
+        full=["u1"], partial={"u2": ["x.yaml"], "u3": ["x.yaml"]}
+    )
+    groups = plan.split([
+        TemplateGroup(frozenset({"wordpress"}), ["jenkins"],
+                      targets=["u1", "u2", "u3"])
+    ])
+    assert [(g.targets, g.templates) for g in groups] == [
+        (["u1"], None), (["u2", "u3"], ["x.yaml"])
+    ]
+    assert all(g.exclude_tags == ["jenkins"] for g in groups)
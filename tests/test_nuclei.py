@@ -0,0 +1,276 @@
+import json
+import os
+import stat
+import threading
+
+import pytest
+
+from bountyforge.core.module_base import TargetType
+from bountyforge.core.template_index import TemplateIndex
+from bountyforge.modules.nuclei import NucleiModule
+
+TEMPLATES = {
+    "http/cves/cve-a.yaml": ("critical", "cve"),
+    "http/cves/cve-b.yaml": ("high", "cve,wordpress"),
+    "http/exposures/env.yaml": ("medium", "exposure"),
+    "http/misconfig/headers.yaml": ("info", "misconfig"),
+    "dns/txt.yaml": ("info", "dns"),
+    "workflows/wordpress.yaml": ("info", "wordpress"),
+}
+
+
+def write_templates(root):
+    for rel_path, (severity, tags) in TEMPLATES.items():
+        path = os.path.join(root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        protocol = "workflows" if rel_path.startswith("workflows") \
+            else rel_path.split("/")[0]
+        with open(path, "w") as f:
+            f.write(
+                f"id: {os.path.splitext(os.path.basename(path))[0]}\n"
+                f"info:\n  severity: {severity}\n  tags: {tags}\n"
+                f"{protocol}: []\n"
+            )
+    return TemplateIndex(root).load_or_build()
+
+
+@pytest.fixture
+def templates(tmp_path, monkeypatch):
+    # the command is built with the nuclei binary, it is never run
+    nuclei = tmp_path / "bin" / "nuclei"
+    nuclei.parent.mkdir()
+    nuclei.write_text("#!/bin/sh\nexit 1\n")
+    nuclei.chmod(nuclei.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv(
+        "PATH", f"{nuclei.parent}{os.pathsep}{os.environ['PATH']}"
+    )
+    root = str(tmp_path / "templates")
+    write_templates(root)
+    return root
+
+
+class FakeNuclei(NucleiModule):
+    """
+    Reports one finding per template the invocation would run
+    """
+
+    def __init__(self, *args, fail_shard=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.commands = []
+        self.shard_templates = []
+        self.fail_shard = fail_shard
+        self._lock = threading.Lock()
+
+    def _execute_command(self, command):
+        def flag(name):
+            return command[command.index(name) + 1] \
+                if name in command else None
+
+        templates = flag("-t")
+        severities = (flag("-severity") or "").split(",")
+        if templates.endswith(".txt"):
+            with open(templates) as f:
+                paths = f.read().splitlines()
+        else:
+            index = TemplateIndex(templates).load_or_build()
+            paths = [
+                os.path.join(templates, e.path) for e in index.query(
+                    severities=[s for s in severities if s]
+                )
+            ]
+        with self._lock:
+            self.commands.append(command)
+            if templates.endswith(".txt"):
+                self.shard_templates.append(paths)
+        if self.fail_shard is not None and self.fail_shard in paths:
+            return {"success": False, "error": "boom", "returncode": 1}
+        target = flag("-u")
+        output = "\n".join(
+            json.dumps({
+                "template-id": os.path.splitext(os.path.basename(p))[0],
+                "matched-at": target,
+            })
+            for p in sorted(paths)
+        )
+        return {"success": True, "output": output}
+
+
+def module(root, **kwargs):
+    return FakeNuclei(
+        "http://x.example.com", TargetType.SINGLE,
+        templates_dir=root, rate_limit=30, **kwargs
+    )
+
+
+def test_shard_templates(templates):
+    root = templates
+
+    shards = module(root, shards=2)._shard_templates()
+    assert [len(shard) for shard in shards] == [3, 2]
+    # every template once, workflows are never passed with -t
+    assert sorted(p for shard in shards for p in shard) == sorted(
+        os.path.join(root, p) for p in TEMPLATES if "workflows" not in p
+    )
+
+    # no more shards than templates
+    shards = module(root, shards=8)._shard_templates(
+        severities=["critical", "high"]
+    )
+    assert sorted(map(len, shards)) == [1, 1]
+
+    shards = module(root, shards=2)._shard_templates(
+        exclude_tags=["cve"], templates=["http/exposures/env.yaml",
+                                         "http/cves/cve-a.yaml"]
+    )
+    assert shards == [[os.path.join(root, "http/exposures/env.yaml")]]
+    assert module(root, shards=2)._shard_templates(templates=[]) == []
+
+
+def test_run_sharded(templates):
+    root = templates
+    mod = module(root, shards=2)
+
+    res = mod._run_sharded("http://x.example.com")
+    assert res["shards"] == 2
+    assert sorted(r["template-id"] for r in res["parsed"]) == [
+        "cve-a", "cve-b", "env", "headers", "txt"
+    ]
+    # shards split the rate limit and their lists are removed afterwards
+    assert [c[c.index("-rate-limit") + 1] for c in mod.commands] \
+        == ["15", "15"]
+    assert not any(
+        os.path.exists(c[c.index("-t") + 1]) for c in mod.commands
+    )
+
+
+def test_run_sharded_keeps_results_of_healthy_shards(templates):
+    root = templates
+    mod = module(
+        root, shards=2,
+        fail_shard=os.path.join(root, "http/cves/cve-a.yaml")
+    )
+    res = mod.run()
+    failed = next(
+        s for s in mod.shard_templates if mod.fail_shard in s
+    )
+    assert sorted(r["template-id"] for r in res["parsed"]) == sorted(
+        os.path.splitext(os.path.basename(p))[0]
+        for s in mod.shard_templates if s is not failed for p in s
+    )
+    assert [e["error"] for e in res["errors"]] == ["boom"]
+
+
+def test_run_sharded_group_without_templates(templates):
+    root = templates
+    mod = module(root)
+    res = mod._run_sharded(
+        "http://x.example.com", severities=["low"], templates=[
+            "http/cves/cve-a.yaml"
+        ]
+    )
+    assert res == {"result": "", "parsed": []}
+    assert mod.commands == []
+
+    # a single shard without a selection runs the whole directory
+    res = mod._run_sharded("http://x.example.com")
+    assert len(mod.commands) == 1
+    assert mod.commands[0][mod.commands[0].index("-t") + 1] == root
+    assert len(res["parsed"]) == len(TEMPLATES)
+
+
+def found(res):
+    return sorted(r["template-id"] for r in res["parsed"])
+
+
+def test_severity_tiers(templates):
+    tiers = []
+    mod = module(
+        templates, severity_tiers=True,
+        on_tier=lambda tier, res: tiers.append((tier, found(res)))
+    )
+    res = mod.run()
+    # one invocation per tier, most severe first
+    assert [c[c.index("-severity") + 1] for c in mod.commands] == [
+        "critical,high", "medium", "low,info,unknown"
+    ]
+    assert tiers == [
+        ("critical", ["cve-a", "cve-b"]),
+        ("medium", ["env"]),
+        ("low", ["headers", "txt", "wordpress"]),
+    ]
+    assert res["tiers"] == [
+        {"tier": "critical", "findings": 2},
+        {"tier": "medium", "findings": 1},
+        {"tier": "low", "findings": 3},
+    ]
+    assert len(res["parsed"]) == 6
+
+
+def test_stop_after_tier(templates):
+    tiers = []
+    mod = module(
+        templates, severity_tiers=True, stop_after_tier="critical",
+        on_tier=lambda tier, res: tiers.append(tier)
+    )
+    res = mod.run()
+    assert tiers == ["critical"]
+    assert found(res) == ["cve-a", "cve-b"]
+    assert len(mod.commands) == 1
+
+    with pytest.raises(ValueError):
+        module(templates, severity_tiers=True, stop_after_tier="urgent")
+
+
+def test_tier_callback_failure_does_not_stop_scan(templates):
+    def on_tier(tier, res):
+        raise RuntimeError("store failed")
+
+    res = module(templates, severity_tiers=True, on_tier=on_tier).run()
+    assert [t["tier"] for t in res["tiers"]] == ["critical", "medium", "low"]
+    assert "errors" not in res
+
+
+def test_sharded_tiers(templates):
+    mod = module(
+        templates, severity_tiers=True, shards=2,
+        fail_shard=os.path.join(templates, "http/exposures/env.yaml")
+    )
+    res = mod.run()
+    # tiers select templates from the index, shards never mix tiers
+    assert sorted(map(sorted, mod.shard_templates)) == sorted([
+        [os.path.join(templates, "http/cves/cve-a.yaml")],
+        [os.path.join(templates, "http/cves/cve-b.yaml")],
+        [os.path.join(templates, "http/exposures/env.yaml")],
+        [os.path.join(templates, "dns/txt.yaml")],
+        [os.path.join(templates, "http/misconfig/headers.yaml")],
+    ])
+    assert found(res) == ["cve-a", "cve-b", "headers", "txt"]
+    # errors are tagged with the tier they happened in
+    assert [(e["tier"], e["error"]) for e in res["errors"]] == [
+        ("medium", "boom")
+    ]
+
+
+def test_index_is_loaded_once_per_run(templates, monkeypatch):
+    loads = []
+    original = NucleiModule.template_index.__func__
+
+    def counting(cls, templates_dir=""):
+        loads.append(templates_dir)
+        return original(cls, templates_dir)
+
+    monkeypatch.setattr(
+        NucleiModule, "template_index", classmethod(counting)
+    )
+    mod = module(templates, severity_tiers=True, shards=2)
+    mod.run()
+    assert len(mod.shard_templates) == 5
+    assert loads == [templates]
+
+    # an index loaded by the caller is used as is
+    loads.clear()
+    index = TemplateIndex(templates).load_or_build()
+    mod = module(templates, severity_tiers=True, shards=2, index=index)
+    mod.run()
+    assert loads == []
+    assert mod.index is index
@@ -0,0 +1,113 @@
+import os
+import socket
+import stat
+
+from bountyforge.core import portscan
+from bountyforge.core.portscan import (
+    TOP_PORTS, discovery_ports, parse_port_spec, split_port_flags,
+    tcp_connect_scan, top_ports
+)
+from bountyforge.modules.nmap import NmapModule
+
+SERVICES = """\
+# comment
+http\t80/tcp\t0.484143\t# World Wide Web HTTP
+ssh\t22/tcp\t0.182286
+domain\t53/udp\t0.213496
+https\t443/tcp\t0.208669
+telnet\t23/tcp\t0.221265
+"""
+
+
+def test_top_ports(tmp_path, monkeypatch):
+    services = tmp_path / "nmap-services"
+    services.write_text(SERVICES)
+    assert top_ports(3, str(services)) == [23, 80, 443]
+    assert top_ports(3, str(tmp_path / "missing")) == TOP_PORTS[:3]
+    monkeypatch.setattr(portscan, "NMAP_SERVICES", (str(services),))
+    assert top_ports() == [22, 23, 80, 443]
+
+
+def test_parse_port_spec():
+    assert parse_port_spec("22,80,8000-8002,T:443,U:53,161") == [
+        22, 80, 443, 8000, 8001, 8002
+    ]
+    assert parse_port_spec("-") == list(range(1, 65536))
+    assert parse_port_spec("http,65534-") == [65534, 65535]
+
+
+def test_split_port_flags():
+    assert split_port_flags(
+        ["--script", "vuln", "-p", "22,80", "-F", "--top-ports=50",
+         "-p443", "--exclude-ports", "25"]
+    ) == (
+        ["-p", "22,80", "-F", "--top-ports=50", "-p443",
+         "--exclude-ports", "25"],
+        ["--script", "vuln"]
+    )
+
+
+def test_discovery_ports():
+    assert discovery_ports(["-p", "22,80"]) == [22, 80]
+    assert discovery_ports(["-p-", "--exclude-ports", "1-65533"]) == [
+        65534, 65535
+    ]
+    assert len(discovery_ports([], full=True)) == 65535
+
+
+def test_tcp_connect_scan():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    open_port = server.getsockname()[1]
+    closed = socket.socket()
+    closed.bind(("127.0.0.1", 0))
+    closed_port = closed.getsockname()[1]
+    try:
+        assert tcp_connect_scan(
+            "127.0.0.1", [open_port, closed_port], timeout=1
+        ) == [open_port]
+    finally:
+        server.close()
+        closed.close()
+    assert tcp_connect_scan("does-not-exist.invalid", [80]) == []
+
+
+def test_two_phase_connect_discovery(tmp_path, monkeypatch):
+    # fake nmap reporting every port of its -p argument as http
+    nmap = tmp_path / "nmap"
+    nmap.write_text(
+        "#!/bin/sh\n"
+        f"echo \"$@\" >> {tmp_path}/calls\n"
+        "while [ $# -gt 0 ]; do\n"
+        "  if [ \"$1\" = -p ]; then ports=$2; fi; shift\n"
+        "done\n"
+        "echo 'Nmap scan report for 127.0.0.1'\n"
+        "echo 'PORT STATE SERVICE VERSION'\n"
+        "echo \"$ports/tcp open http Test\"\n"
+    )
+    nmap.chmod(nmap.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    port = server.getsockname()[1]
+    try:
+        res = NmapModule(
+            "127.0.0.1", two_phase=True, discovery="connect",
+            additional_flags=["-p", f"{port},1", "--version-light"]
+        ).run()
+    finally:
+        server.close()
+
+    assert res["phases"][0]["open_ports"] == [port]
+    assert res["parsed"] == [{
+        "host": "127.0.0.1", "ip": "127.0.0.1", "port": f"{port}/tcp",
+        "state": "open", "service": "http", "info": "Test"
+    }]
+    calls = (tmp_path / "calls").read_text().splitlines()
+    # one version pass on the open port, the user -p is not repeated
+    assert len(calls) == 1
+    assert calls[0].split().count("-p") == 1
+    assert "--version-light" in calls[0]
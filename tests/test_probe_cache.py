@@ -0,0 +1,73 @@
+import time
+
+from bountyforge.core.probe_cache import (
+    ProbeCache, canonical_url, url_is_under
+)
+
+
+class FakeCache:
+    def __init__(self):
+        self.values = {}
+
+    def get_many(self, keys):
+        return {k: self.values[k] for k in keys if k in self.values}
+
+    def set_many(self, items, ttl):
+        self.values.update(items)
+
+
+RECORD = {
+    "input": "Example.com", "url": "https://example.com",
+    "status_code": 200, "title": "Home", "tech": ["Nginx"],
+    "hash": {"body_sha256": "abc"}, "body": "not cached"
+}
+
+
+def test_canonical_url():
+    assert canonical_url("http://Example.com/") == canonical_url(
+        "http://example.com:80"
+    )
+    assert canonical_url("Example.com:8443") == "example.com:8443"
+
+
+def test_url_is_under():
+    assert url_is_under("http://x.com", "http://x.com")
+    assert url_is_under("http://x.com/a?b", "http://x.com")
+    assert url_is_under("http://x.com?a", "http://x.com")
+    assert not url_is_under("http://x.com.evil/", "http://x.com")
+    assert not url_is_under("http://x.com/ab", "http://x.com/a")
+
+
+def test_probe_cache_hit():
+    cache = ProbeCache(FakeCache(), fresh_ttl=60, max_age=600)
+    cache.store([RECORD], "recon")
+    fresh, stale = cache.lookup(["example.com", "other.com"], "recon")
+    assert list(fresh) == ["example.com"] and stale == {}
+    assert fresh["example.com"]["title"] == "Home"
+    assert "body" not in fresh["example.com"]
+
+
+def test_probe_cache_is_per_profile():
+    # a minimal live record must not be served to a recon probe
+    cache = ProbeCache(FakeCache(), fresh_ttl=60, max_age=600)
+    cache.store([{"input": "example.com", "status_code": 200}], "live")
+    assert cache.lookup(["example.com"], "recon") == ({}, {})
+
+
+def test_probe_cache_stale_and_reprobe():
+    backend = FakeCache()
+    cache = ProbeCache(backend, fresh_ttl=60, max_age=600)
+    cache.store([RECORD], "recon")
+    for entry in backend.values.values():
+        entry["probed_at"] = time.time() - 120
+    fresh, stale = cache.lookup(["example.com"], "recon")
+    assert fresh == {} and list(stale) == ["example.com"]
+
+    previous = stale["example.com"]
+    same = ProbeCache.mark_reprobed(dict(RECORD), previous)
+    assert same["reprobed"] and not same["changed"]
+    changed = ProbeCache.mark_reprobed(
+        {**RECORD, "hash": {"body_sha256": "def"}}, previous
+    )
+    assert changed["changed"]
+    assert "reprobed" not in ProbeCache.mark_reprobed(dict(RECORD), None)
@@ -0,0 +1,81 @@
+import sys
+
+from bountyforge.core.executor import STALLED, ProcessRunner
+from bountyforge.core.module_base import Module, ScanType
+from bountyforge.core.progress import (
+    NmapStatsParser, ProgressRecord, ProgressReporter, parse_ffuf_progress,
+    parse_nuclei_stats
+)
+
+
+def test_parse_ffuf_progress():
+    record = parse_ffuf_progress(
+        "\x1b[2K:: Progress: [1000/4000] :: Job [1/1] :: 50 req/sec :: "
+        "Duration: [0:00:20] :: Errors: 0 ::"
+    )
+    assert record.percent == 25.0
+    assert record.rps == 50.0
+    assert record.eta == 60.0
+    assert parse_ffuf_progress('{"url": "http://x/a"}') is None
+
+
+def test_parse_nuclei_stats():
+    record = parse_nuclei_stats(
+        '{"duration":"0:01:00","errors":"0","hosts":"1","matched":"0",'
+        '"percent":"20","requests":"200","rps":"3","total":"1000"}'
+    )
+    assert (record.percent, record.rps, record.eta) == (20.0, 3.0, 240.0)
+    assert (record.requests, record.total) == (200, 1000)
+    assert parse_nuclei_stats('{"template-id": "x"}') is None
+
+
+def test_nmap_stats_parser():
+    parser = NmapStatsParser()
+    assert parser(
+        "Stats: 0:00:30 elapsed; 0 hosts completed (1 up), "
+        "1 undergoing SYN Stealth Scan"
+    ) is None
+    record = parser(
+        "SYN Stealth Scan Timing: About 75.00% done; "
+        "ETC: 10:22 (0:00:10 remaining)"
+    )
+    assert (record.percent, record.eta, record.elapsed) == (75.0, 10.0, 30.0)
+
+
+def test_reporter_rate_limit():
+    events = []
+    reporter = ProgressReporter(events.append, min_interval=60)
+    for rps in (1, 5, 2):
+        reporter.report("nuclei", ProgressRecord("nuclei", rps=rps))
+    assert len(events) == 1
+    summary = reporter.summary("nuclei")
+    assert summary["updates"] == 3
+    assert summary["max_rps"] == 5
+    assert summary["last"]["rps"] == 2
+
+
+class StatsModule(Module):
+    def _parse_progress(self, stream, line):
+        return parse_nuclei_stats(line)
+
+
+def test_repeated_stats_count_as_stall(monkeypatch):
+    # a hung nuclei keeps printing the same statistics
+    monkeypatch.setattr(ProcessRunner, "poll_interval", 0.1)
+    stats = (
+        '{"duration":"0:00:05","percent":"40","requests":"400",'
+        '"rps":"0","total":"1000"}'
+    )
+    module = StatsModule(ScanType.DEFAULT, "x")
+    module.idle_timeout = 0.5
+    records = []
+    module.progress_callback = records.append
+    result = module._execute_command([sys.executable, "-u", "-c", (
+        "import time\n"
+        "while True:\n"
+        f"    print({stats!r})\n"
+        "    time.sleep(0.05)"
+    )])
+    assert result["truncated"]
+    assert result["error"].startswith(f"Command {STALLED}")
+    assert records[0].requests == 400
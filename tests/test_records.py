@@ -0,0 +1,98 @@
+from bountyforge.core.records import (
+    load_records, record_filters, store_records
+)
+from bountyforge.core.spill import SpillStore
+
+
+class FakeCursor:
+    def __init__(self, docs, hidden):
+        self.docs = docs
+        self.hidden = hidden
+
+    def sort(self, key, direction=None):
+        keys = [k for k, _ in key] if isinstance(key, list) else [key]
+        return FakeCursor(
+            sorted(self.docs, key=lambda d: tuple(d[k] for k in keys)),
+            self.hidden
+        )
+
+    def __iter__(self):
+        for doc in self.docs:
+            yield {k: v for k, v in doc.items() if k not in self.hidden}
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    def insert_many(self, docs, ordered=True):
+        self.docs += [dict(d) for d in docs]
+
+    def delete_many(self, query):
+        self.docs = [d for d in self.docs if not self._match(d, query)]
+
+    @staticmethod
+    def _match(doc, query):
+        return all(doc.get(k) == v for k, v in query.items())
+
+    def find(self, query, projection=None):
+        hidden = {k for k, v in (projection or {}).items() if not v}
+        return FakeCursor(
+            [d for d in self.docs if self._match(d, query)], hidden
+        )
+
+
+class FakeDB(dict):
+    def __getitem__(self, name):
+        return self.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        return self[name]
+
+
+def test_store_and_load_records(tmp_path):
+    db = FakeDB()
+    # a live record is replaced by the final findings
+    db.scan_findings.insert_many([
+        {"template-id": "old", "job_id": "job", "stage": "nuclei", "seq": 0}
+    ])
+    spill = SpillStore(str(tmp_path), "job")
+    httpx = spill.spill("httpx", {
+        "result": "raw",
+        "parsed": [{"url": "https://a.example.com", "status_code": 200}]
+    })
+    results = {
+        "httpx": httpx,
+        "nuclei": {"result": "", "parsed": [
+            {"template-id": "t1"}, {"template-id": "t2"}
+        ]},
+        "dns": {"dead": ["b.example.com"]},
+    }
+
+    stored = store_records(db, "job", results, spill)
+    assert "parsed" not in stored["nuclei"]
+    assert stored["nuclei"]["normalized"] == {
+        "collection": "scan_findings", "count": 2
+    }
+    assert list(stored["httpx"]["spilled"]) == ["result"]
+    assert stored["dns"] == {"dead": ["b.example.com"]}
+    assert [d["template-id"] for d in db.scan_findings.docs] == ["t1", "t2"]
+    assert db.scan_endpoints.docs[0]["stage"] == "httpx"
+
+    loaded = load_records(db, {"job_id": "job", "results": stored})
+    assert loaded["results"]["nuclei"]["parsed"] == [
+        {"template-id": "t1"}, {"template-id": "t2"}
+    ]
+    assert loaded["results"]["httpx"]["parsed"] == [
+        {"url": "https://a.example.com", "status_code": 200}
+    ]
+    spill.cleanup()
+
+
+def test_record_filters():
+    assert record_filters(
+        "findings", {"severity": "high", "tier": "critical", "skip": "5"}
+    ) == {"info.severity": "high"}
+    assert record_filters("endpoints", {"status_code": "200"}) == {
+        "status_code": 200
+    }
@@ -0,0 +1,79 @@
+from bountyforge.core.recursion import (
+    RecursionScheduler, RequestBudget, count_wordlist
+)
+from bountyforge.modules.ffuf import FfufModule
+
+
+def test_count_wordlist(tmp_path, monkeypatch):
+    (tmp_path / "words.txt").write_text("admin\n\nlogin\nbackup\n")
+    monkeypatch.chdir(tmp_path)
+    # relative paths and keywords are resolved like ffuf does
+    assert count_wordlist("words.txt") == 3
+    assert count_wordlist("words.txt:FUZZ") == 3
+    assert count_wordlist(str(tmp_path / "words.txt")) == 3
+    assert count_wordlist("missing.txt") == 0
+
+
+def test_request_budget():
+    budget = RequestBudget(100)
+    assert budget.try_spend(60)
+    assert not budget.try_spend(60)
+    budget.spend(60)
+    assert budget.used == 120
+    assert budget.remaining == 0
+
+
+def hit(path, status=301, length=0):
+    return {"url": f"http://x{path}", "status": status, "length": length}
+
+
+def test_scheduler_ranks_branches():
+    scheduler = RecursionScheduler(max_depth=2)
+    scheduler.offer("x", [
+        hit("/static", 200, 10),
+        hit("/admin", 301, 20),
+        hit("/index.php", 200, 30),
+        hit("/missing", 404, 40),
+        # same size as /static: likely a catch-all response
+        hit("/other", 200, 10),
+    ], depth=0)
+    order = []
+    while (branch := scheduler.next_branch("x")) is not None:
+        order.append((branch.url, branch.depth))
+    assert order == [
+        ("http://x/admin", 1), ("http://x/static", 1), ("http://x/other", 1)
+    ]
+
+
+def test_scheduler_depth_limit():
+    scheduler = RecursionScheduler(max_depth=1)
+    scheduler.offer("x", [hit("/a/b")], depth=1)
+    assert scheduler.next_branch("x") is None
+    # a directory is offered only once
+    scheduler.offer("x", [hit("/a")], depth=0)
+    scheduler.offer("x", [hit("/a/")], depth=0)
+    assert scheduler.next_branch("x").url == "http://x/a"
+    assert scheduler.next_branch("x") is None
+
+
+def test_scheduler_budgets():
+    job = RequestBudget(250)
+    scheduler = RecursionScheduler(
+        max_depth=3, requests_per_pass=100, host_budget=200, job_budget=job
+    )
+    scheduler.charge("x")
+    scheduler.offer("x", [hit("/a"), hit("/b")], depth=0)
+    assert scheduler.next_branch("x") is not None
+    # the host budget of 200 is spent by the base pass and one branch
+    assert scheduler.next_branch("x") is None
+    assert scheduler.spent("x") == 200
+
+    scheduler.offer("y", [hit("/a"), hit("/b")], depth=0)
+    assert scheduler.next_branch("y") is None
+    assert job.used == 200
+
+
+def test_ffuf_recursion_defaults():
+    module = FfufModule("http://x")
+    assert module.recursion_depth == 2
+    assert module.host_request_budget and module.job_request_budget
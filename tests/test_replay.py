@@ -0,0 +1,46 @@
+import json
+
+from bountyforge.core.replay import ReplayPipeline
+
+NMAP_OUTPUT = """Nmap scan report for a.example.com (10.0.0.1)
+PORT    STATE SERVICE VERSION
+22/tcp  open  ssh     OpenSSH 9.6
+443/tcp open  https   nginx
+"""
+
+
+def test_replay_reparses_stored_output():
+    finding = {
+        "template-id": "git-config", "host": "https://a.example.com",
+        "matched-at": "https://a.example.com/.git/config", "info": {}
+    }
+    stored = {
+        "nmap": {
+            "result": NMAP_OUTPUT,
+            "parsed": [],
+            "hostmap": {"a.example.com": ["10.0.0.1"]}
+        },
+        "httpx": {
+            "result": json.dumps({
+                "url": "https://a.example.com:443",
+                "input": "a.example.com:443", "status_code": 200
+            }),
+            "parsed": []
+        },
+        "nuclei": {"result": json.dumps(finding), "parsed": []},
+    }
+    options = {"nuclei": {"tech_routing": False, "severity_tiers": False}}
+    results = ReplayPipeline(
+        stored, ["a.example.com"], ["nmap", "httpx", "nuclei"], options
+    ).run()
+
+    assert results["nmap"]["replayed"]
+    assert {e["port"] for e in results["nmap"]["parsed"]} == {
+        "22/tcp", "443/tcp"
+    }
+    assert results["nmap"]["routes"]["http"] == ["a.example.com:443"]
+    assert results["httpx"]["parsed"][0]["status_code"] == 200
+    assert [f["template-id"] for f in results["nuclei"]["parsed"]] == [
+        "git-config"
+    ]
+    assert results["nuclei"]["parsed"][0]["occurrences"] == 1
@@ -0,0 +1,80 @@
+import time
+
+from pymongo.errors import DuplicateKeyError, ServerSelectionTimeoutError
+
+from bountyforge.repository import (
+    INDEXES, BulkWriter, ensure_indexes, get_client
+)
+
+
+class FakeCollection:
+    def __init__(self, db, name):
+        self.db = db
+        self.name = name
+
+    def create_index(self, keys, **options):
+        if self.db.error:
+            raise self.db.error
+        self.db.created.append((self.name, keys, options))
+
+    def bulk_write(self, ops, ordered=True):
+        self.db.writes.append(
+            (self.name, [op._doc for op in ops], ordered)
+        )
+
+
+class FakeDB:
+    def __init__(self, error=None):
+        self.error = error
+        self.created = []
+        self.writes = []
+
+    def __getitem__(self, name):
+        return FakeCollection(self, name)
+
+
+def test_client_is_shared():
+    assert get_client() is get_client()
+
+
+def test_ensure_indexes():
+    db = FakeDB()
+    ensure_indexes(db)
+    assert len(db.created) == sum(len(i) for i in INDEXES.values())
+    assert ("scan_jobs", [("job_id", 1)], {"unique": True}) in db.created
+
+
+def test_ensure_indexes_errors():
+    # duplicate keys only skip the index, an unreachable server stops
+    ensure_indexes(FakeDB(DuplicateKeyError("dup")))
+    ensure_indexes(FakeDB(ServerSelectionTimeoutError("down")))
+
+
+def test_bulk_writer_flushes_by_size():
+    db = FakeDB()
+    writer = BulkWriter("job", db, batch_size=3, flush_interval=60)
+    writer.add("scan_hosts", "subfinder", [{"host": "a"}, {"host": "b"}])
+    assert db.writes == []
+    writer.add("scan_hosts", "subfinder", [{"host": "c"}], shard="x")
+    assert len(db.writes) == 1
+    name, docs, ordered = db.writes[0]
+    assert name == "scan_hosts" and not ordered
+    assert docs[2] == {
+        "host": "c", "job_id": "job", "stage": "subfinder",
+        "shard": "x", "seq": 2
+    }
+
+
+def test_bulk_writer_flushes_by_age():
+    db = FakeDB()
+    writer = BulkWriter("job", db, batch_size=100, flush_interval=0.05)
+    writer.start()
+    writer.add("scan_findings", "nuclei", [{"template-id": "t"}])
+    time.sleep(0.2)
+    assert [docs for _, docs, _ in db.writes] == [[{
+        "template-id": "t", "job_id": "job", "stage": "nuclei",
+        "shard": None, "seq": 0
+    }]]
+    writer.add("scan_findings", "nuclei", [{"template-id": "u"}])
+    writer.close()
+    assert len(db.writes) == 2
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import socket
+import threading
+
+import dns.message
+import dns.rcode
+import dns.rrset
+import pytest
+
+from bountyforge.core.cache import RedisCache
+from bountyforge.core.resolver import (
+    AsyncResolver, NOANSWER, NXDOMAIN, RESOLVED
+)
+
+ZONE = {
+    "www.example.test.": ["10.0.0.1"],
+    "api.example.test.": ["10.0.0.1", "10.0.0.2"],
+}
+# names without A records (e.g. IPv6 only)
+NO_A = {"v6.example.test."}
+
+
+class StubDNSServer:
+    """
+    Minimal UDP DNS server answering A queries from ZONE
+    """
+
+    def __init__(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.settimeout(0.2)
+        self.port = self.sock.getsockname()[1]
+        self.queries = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+
+    def _serve(self):
+        while not self._stop.is_set():
+            try:
+                data, addr = self.sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            query = dns.message.from_wire(data)
+            name = query.question[0].name.to_text()
+            self.queries.append(name)
+            response = dns.message.make_response(query)
+            if name in NO_A:
+                pass
+            elif name in ZONE:
+                response.answer.append(
+                    dns.rrset.from_text_list(name, 60, "IN", "A", ZONE[name])
+                )
+            else:
+                response.set_rcode(dns.rcode.NXDOMAIN)
+            self.sock.sendto(response.to_wire(), addr)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+        self.sock.close()
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    def pipeline(self, transaction=False):
+        return self
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def execute(self):
+        pass
+
+
+@pytest.fixture
+def stub_dns():
+    with StubDNSServer() as server:
+        yield server
+
+
+def test_resolve_many(stub_dns):
+    resolver = AsyncResolver(
+        nameservers=["127.0.0.1"], port=stub_dns.port, concurrency=2
+    )
+    results = asyncio.run(resolver.resolve_many(
+        ["www.example.test", "api.example.test", "dead.example.test",
+         "v6.example.test", "192.0.2.1"]
+    ))
+
+    assert results["www.example.test"].status == RESOLVED
+    assert results["www.example.test"].ips == ["10.0.0.1"]
+    assert sorted(results["api.example.test"].ips) == ["10.0.0.1", "10.0.0.2"]
+    assert results["dead.example.test"].status == NXDOMAIN
+    assert results["v6.example.test"].status == NOANSWER
+    assert not results["v6.example.test"].is_dead
+    assert results["192.0.2.1"].ips == ["192.0.2.1"]
+    assert "192.0.2.1." not in stub_dns.queries
+
+
+def test_resolve_builds_hostmap_and_drops_dead(stub_dns):
+    resolver = AsyncResolver(nameservers=["127.0.0.1"], port=stub_dns.port)
+    hostmap, dead = resolver.resolve(
+        ["https://www.example.test/login", "api.example.test",
+         "dead.example.test", "v6.example.test"]
+    )
+
+    assert dead == ["dead.example.test"]
+    # exists without A records, scanned by name
+    assert hostmap.unresolved == ["v6.example.test"]
+    assert hostmap.scan_targets() == ["10.0.0.1", "v6.example.test"]
+    assert hostmap.hosts_for("10.0.0.1") == [
+        "www.example.test", "api.example.test"
+    ]
+
+
+def test_shared_cache(stub_dns):
+    client = FakeRedis()
+    resolver = AsyncResolver(
+        nameservers=["127.0.0.1"], port=stub_dns.port,
+        cache=RedisCache(client, "dns"), negative_ttl=30
+    )
+    asyncio.run(resolver.resolve_many(["www.example.test", "x.example.test"]))
+    assert json.loads(client.data["dns:x.example.test"])["status"] == NXDOMAIN
+
+    stub_dns.queries.clear()
+    results = asyncio.run(
+        resolver.resolve_many(["www.example.test", "x.example.test"])
+    )
+    assert stub_dns.queries == []
+    assert results["www.example.test"].cached
+    assert results["x.example.test"].is_dead
@@ -0,0 +1,138 @@
+import os
+import stat
+import sys
+
+from bountyforge.core.module_base import Module, ScanType, TargetType
+from bountyforge.core.recursion import RequestBudget
+from bountyforge.core.retry import RetryPolicy, is_retryable
+from bountyforge.modules.httpx import HttpxModule
+
+
+def test_is_retryable():
+    assert is_retryable({"success": False, "returncode": -9})
+    assert is_retryable({"success": False, "returncode": 137})
+    assert is_retryable({
+        "success": False, "returncode": 1,
+        "error": "[FTL] Could not run nuclei: dial tcp: connection refused"
+    })
+    assert is_retryable({
+        "success": False, "returncode": 1,
+        "error": "Encountered error(s): 1 errors occured.\n"
+                 "\t* Get \"http://x/FUZZ\": connection refused"
+    })
+    # per-target noise of a tool that failed for another reason
+    assert not is_retryable({
+        "success": False, "returncode": 1,
+        "error": "[WRN] Could not probe https://a.example.com: "
+                 "dial tcp 10.0.0.1:443: connection refused\n"
+                 "[ERR] invalid template"
+    })
+    assert not is_retryable({"success": False, "returncode": 2})
+    assert not is_retryable({"success": False, "returncode": 1})
+    assert not is_retryable(
+        {"success": True, "returncode": 0, "truncated": True}
+    )
+
+
+def test_flaky_command_is_retried(tmp_path):
+    marker = tmp_path / "ran"
+    # killed on the first run, succeeds on the second
+    command = [sys.executable, "-c", (
+        "import os, pathlib, signal\n"
+        f"p = pathlib.Path({str(marker)!r})\n"
+        "if not p.exists():\n"
+        "    p.touch()\n"
+        "    os.kill(os.getpid(), signal.SIGKILL)\n"
+        "print('ok')"
+    )]
+    module = Module(ScanType.DEFAULT, "x")
+    module.retry_policy = RetryPolicy(base_delay=0)
+    result = module._execute_command(command)
+    assert result["success"]
+    assert result["output"] == "ok"
+    assert result["attempts"] == 2
+
+
+def test_job_retry_budget():
+    module = Module(ScanType.DEFAULT, "x")
+    budget = RequestBudget(1)
+    module.retry_policy = RetryPolicy(max_retries=5, base_delay=0,
+                                      budget=budget)
+    command = [sys.executable, "-c", "import os; os.kill(os.getpid(), 9)"]
+    result = module._execute_command(command)
+    assert not result["success"]
+    assert result["attempts"] == 2
+    assert budget.remaining == 0
+
+
+def fake_httpx(tmp_path, monkeypatch):
+    # killed once on the batch with "flaky.example.com", exits 1 on
+    # "broken.example.com", reports every other -u target as live
+    httpx = tmp_path / "httpx"
+    httpx.write_text(
+        "#!/bin/sh\n"
+        "while [ $# -gt 0 ]; do\n"
+        "  if [ \"$1\" = -u ]; then targets=$2; fi; shift\n"
+        "done\n"
+        f"echo \"$targets\" >> {tmp_path}/calls\n"
+        "case $targets in\n"
+        "  *flaky*)\n"
+        f"    if [ ! -e {tmp_path}/killed ]; then\n"
+        f"      touch {tmp_path}/killed; kill -9 $$\n"
+        "    fi;;\n"
+        "  *broken*) echo '[FTL] bad input' >&2; exit 1;;\n"
+        "esac\n"
+        "for t in $(echo \"$targets\" | tr , ' '); do\n"
+        "  echo \"{\\\"input\\\": \\\"$t\\\"}\"\n"
+        "done\n"
+    )
+    httpx.chmod(httpx.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_only_the_failed_batch_is_retried(tmp_path, monkeypatch):
+    fake_httpx(tmp_path, monkeypatch)
+    module = HttpxModule(
+        ["a.example.com", "b.example.com", "flaky.example.com",
+         "c.example.com", "d.example.com"],
+        TargetType.MULTIPLE
+    )
+    module.batch_size = 2
+    budget = RequestBudget(5)
+    module.retry_policy = RetryPolicy(base_delay=0, budget=budget)
+    result = module.run()
+
+    calls = (tmp_path / "calls").read_text().splitlines()
+    assert sorted(calls) == [
+        "a.example.com,b.example.com",
+        "d.example.com",
+        "flaky.example.com,c.example.com",
+        "flaky.example.com,c.example.com",
+    ]
+    assert budget.remaining == 4
+    assert result["batches"] == 3
+    assert sorted(r["input"] for r in result["parsed"]) == [
+        "a.example.com", "b.example.com", "c.example.com",
+        "d.example.com", "flaky.example.com"
+    ]
+    assert "errors" not in result
+
+
+def test_failed_batch_keeps_the_others(tmp_path, monkeypatch):
+    fake_httpx(tmp_path, monkeypatch)
+    module = HttpxModule(
+        ["a.example.com", "broken.example.com", "c.example.com"],
+        TargetType.MULTIPLE
+    )
+    module.batch_size = 1
+    module.retry_policy = RetryPolicy(base_delay=0)
+    result = module.run()
+
+    # a fatal error is not retried
+    assert len((tmp_path / "calls").read_text().splitlines()) == 3
+    assert [r["input"] for r in result["parsed"]] == [
+        "a.example.com", "c.example.com"
+    ]
+    assert [e["targets"] for e in result["errors"]] == [
+        ["broken.example.com"]
+    ]
@@ -0,0 +1,40 @@
+from bountyforge.core.routing import (
+    HTTP_ROUTE, UNKNOWN_ROUTE, classify_service, route_services
+)
+
+
+def test_classify_service():
+    assert classify_service(
+        {"port": "80/tcp", "service": "http"}
+    ) == HTTP_ROUTE
+    assert classify_service(
+        {"port": "8443/tcp", "service": "ssl/https-alt"}
+    ) == HTTP_ROUTE
+    assert classify_service(
+        {"port": "8080/tcp", "service": "tcpwrapped"}
+    ) == HTTP_ROUTE
+    assert classify_service({"port": "22/tcp", "service": "ssh"}) == "ssh"
+    assert classify_service(
+        {"port": "445/tcp", "service": "microsoft-ds"}
+    ) == "smb"
+    assert classify_service(
+        {"port": "31337/tcp", "service": "unknown"}
+    ) == UNKNOWN_ROUTE
+
+
+def test_route_services():
+    routes = route_services([
+        {"host": "a.example.com", "port": "443/tcp", "state": "open",
+         "service": "https"},
+        {"host": "a.example.com", "port": "22/tcp", "state": "open",
+         "service": "ssh"},
+        {"host": "a.example.com", "port": "3306/tcp", "state": "filtered",
+         "service": "mysql"},
+        {"host": "a.example.com", "port": "443/tcp", "state": "open",
+         "service": "https"},
+    ])
+
+    assert routes == {
+        HTTP_ROUTE: ["a.example.com:443"],
+        "ssh": ["a.example.com:22"],
+    }
@@ -0,0 +1,85 @@
+from bountyforge.core.executor import SpooledOutput
+from bountyforge.core.spill import SpillStore, load_results, materialize
+
+
+class FakeCursor(list):
+    def sort(self, key, direction):
+        return FakeCursor(sorted(self, key=lambda d: d[key]))
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = []
+
+    def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    def find(self, query, projection=None):
+        return FakeCursor(
+            d for d in self.docs
+            if all(d.get(k) == v for k, v in query.items())
+        )
+
+
+class FakeDB:
+    def __init__(self):
+        self.scan_result_chunks = FakeCollection()
+
+
+def test_spill_round_trip(tmp_path):
+    store = SpillStore(str(tmp_path), "job")
+    store.segment_records = 2
+    store.text_chunk = 4
+    store.chunk_bytes = 30
+    parsed = [{"url": f"https://a.example.com/{i}"} for i in range(5)]
+    res = {"result": "raw tool output", "parsed": parsed, "scan_type": "x"}
+
+    summary = store.spill("httpx", res)
+    assert "parsed" not in summary and "result" not in summary
+    assert summary["scan_type"] == "x"
+    assert len(summary["spilled"]["parsed"]["segments"]) == 3
+    assert store.parsed(summary) == parsed
+
+    db = FakeDB()
+    stored = store.persist(db, {"httpx": summary, "dns": {"dead": []}})
+    assert stored["httpx"]["spilled"]["parsed"]["count"] == 5
+    assert stored["httpx"]["spilled"]["parsed"]["chunks"] > 1
+    store.cleanup()
+    assert not (tmp_path / "job").exists()
+
+    record = load_results(db, {"job_id": "job", "results": stored})
+    assert record["results"]["httpx"]["parsed"] == parsed
+    assert record["results"]["httpx"]["result"] == "raw tool output"
+    assert "spilled" not in record["results"]["httpx"]
+    assert record["results"]["dns"] == {"dead": []}
+
+
+def spooled(text):
+    output = SpooledOutput(threshold=4)
+    output.write(text)
+    assert output.spooled
+    return output
+
+
+def test_spill_list_with_spooled_outputs(tmp_path):
+    store = SpillStore(str(tmp_path), "job")
+    output = spooled('{"url": "http://x/admin"}\n')
+    records = [
+        {"target": "x", "output": output},
+        {"target": "y", "output": ""},
+    ]
+    summary = store.spill("ffuf_directorybruteforce", {"result": records})
+    assert list(store.iter_field(summary, "result")) == [
+        {"target": "x", "output": '{"url": "http://x/admin"}\n'},
+        {"target": "y", "output": ""},
+    ]
+    assert not output.spooled
+
+
+def test_materialize():
+    output = spooled("raw output\n")
+    assert materialize(output) == "raw output\n"
+    assert not output.spooled
+    record = {"target": "x", "output": spooled("line one\n")}
+    assert materialize(record) == {"target": "x", "output": "line one\n"}
+    assert materialize({"target": "x"}) == {"target": "x"}
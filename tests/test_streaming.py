@@ -0,0 +1,153 @@
+import sys
+import threading
+import time
+
+from bountyforge.core.hostmap import HostMap
+from bountyforge.core.module_base import Module, ScanType
+from bountyforge.core.streaming import StageQueue, StreamingPipeline
+
+
+def test_stage_queue_batches():
+    q = StageQueue(maxsize=10)
+    for i in range(5):
+        q.put(i)
+    q.close()
+    assert list(q.batches(size=2, linger=0.01)) == [[0, 1], [2, 3], [4]]
+
+
+def test_stage_queue_backpressure():
+    q = StageQueue(maxsize=2)
+    produced = []
+
+    def produce():
+        for i in range(5):
+            q.put(i)
+            produced.append(i)
+        q.close()
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    time.sleep(0.1)
+    # the producer blocks on the full queue until the consumer reads
+    assert len(produced) == 2
+    assert [i for batch in q.batches(10, 0.01) for i in batch] == [
+        0, 1, 2, 3, 4
+    ]
+    thread.join(1)
+
+
+def test_stage_queue_drain_after_last_batch():
+    q = StageQueue(maxsize=2)
+    q.put("a.example.com")
+    q.close()
+    for batch in q.batches(size=10, linger=0.01):
+        pass
+    # the close signal was taken with the last batch
+    q.drain()
+
+
+class FakeStreamingPipeline(StreamingPipeline):
+    """
+    Tool runs answered from canned records
+    """
+    SUBDOMAINS = {"example.com": ["a.example.com", "b.example.com"]}
+    ADDRESSES = {
+        "example.com": ["10.0.0.1"],
+        "a.example.com": ["10.0.0.1"],
+        "b.example.com": ["10.0.0.2"],
+    }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scanned = []
+
+    def _publish(self, payload):
+        pass
+
+    def _build_hostmap(self, cdn_ranges, targets=None):
+        hostmap = HostMap(cdn_ranges)
+        for target in targets:
+            hostmap.add(target, self.ADDRESSES.get(target, []))
+        return hostmap
+
+    def _run_module(self, stage, mod, cfg):
+        if stage == "subfinder":
+            hosts = self.SUBDOMAINS.get(mod.target[0], [])
+            return {"result": "", "parsed": [{"host": h} for h in hosts]}
+        if stage == "nmap":
+            self.scanned += mod.target
+            return {"result": "", "parsed": [
+                {"ip": ip, "port": "443/tcp", "state": "open",
+                 "service": "https"}
+                for ip in mod.target
+            ]}
+        return {"result": "", "parsed": [
+            {"url": f"https://{t}", "status_code": 200} for t in mod.target
+        ]}
+
+
+def test_streaming_pipeline():
+    pipeline = FakeStreamingPipeline(
+        ["example.com"], ["subfinder", "nmap", "httpx"],
+        {"dns": {"enabled": False}},
+        batch_size=2, linger=0.05, queue_size=1
+    )
+    results = pipeline.run()
+
+    # 10.0.0.1 is shared by two hosts of different batches
+    assert sorted(pipeline.scanned) == ["10.0.0.1", "10.0.0.2"]
+    assert {e["host"] for e in results["nmap"]["parsed"]} == {
+        "example.com", "a.example.com", "b.example.com"
+    }
+    assert sorted(pipeline.targets) == [
+        "https://a.example.com:443",
+        "https://b.example.com:443",
+        "https://example.com:443",
+    ]
+    assert results["httpx"]["batches"] >= 2
+    assert [r["host"] for r in results["subfinder"]["parsed"]] == [
+        "a.example.com", "b.example.com"
+    ]
+
+
+class FailingPipeline(FakeStreamingPipeline):
+    def _run_module(self, stage, mod, cfg):
+        if stage == "httpx":
+            raise RuntimeError("httpx crashed")
+        return super()._run_module(stage, mod, cfg)
+
+
+def test_streaming_stage_fails_on_last_batch():
+    pipeline = FailingPipeline(
+        ["example.com"], ["subfinder", "httpx"],
+        {"dns": {"enabled": False}},
+        batch_size=10, linger=0.05, queue_size=10
+    )
+    thread = threading.Thread(target=pipeline.run, daemon=True)
+    thread.start()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert pipeline.results["streaming_errors"] == {
+        "httpx": "httpx crashed"
+    }
+
+
+def test_stage_time_budget_spans_batches():
+    pipeline = FakeStreamingPipeline(
+        ["example.com"], ["httpx"], {"dns": {"enabled": False}}
+    )
+    first = pipeline._stage_deadline("httpx", 60)
+    time.sleep(0.01)
+    # later batches get the rest of the budget, not a new one
+    assert pipeline._stage_deadline("httpx", 60) == first
+    assert pipeline._stage_deadline("nmap", 60) > first
+    assert pipeline._stage_deadline("nmap", None) is None
+
+    # a batch module past the stage deadline runs no command
+    mod = Module(ScanType.DEFAULT, "a.example.com")
+    mod.time_budget = 60
+    mod.deadline = time.monotonic() - 1
+    result = mod._execute_command([sys.executable, "-c", "print('ran')"])
+    assert result["truncated"]
+    assert not result.get("output")
+    assert "exhausted" in result["error"]
@@ -0,0 +1,170 @@
+import json
+import os
+
+from bountyforge.core.template_index import (
+    INDEX_FILE, TemplateIndex, parse_template
+)
+
+
+TEMPLATE = """id: {id}
+info:
+  name: {id}
+  severity: {severity}
+  tags: {tags}
+http:
+  - method: GET
+    path:
+      - "{{{{BaseURL}}}}/"
+"""
+
+
+def write_template(root, rel_path, id, severity="info", tags="tech"):
+    path = os.path.join(root, rel_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(TEMPLATE.format(id=id, severity=severity, tags=tags))
+    return path
+
+
+def bump(path):
+    # change mtime even on filesystems with coarse timestamps
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_parse_template(tmp_path):
+    path = write_template(
+        str(tmp_path), "http/a.yaml", "a", "High", "cve, WordPress"
+    )
+    entry = parse_template(path, "http/a.yaml")
+    assert entry.id == "a"
+    assert entry.severity == "high"
+    assert entry.tags == ["cve", "wordpress"]
+    assert entry.protocol == "http"
+
+    other = tmp_path / "not-a-template.yaml"
+    other.write_text("key: value\n")
+    assert parse_template(str(other), "not-a-template.yaml") is None
+
+
+def test_build_and_query(tmp_path):
+    root = str(tmp_path)
+    write_template(root, "http/a.yaml", "a", "high", "cve,wordpress")
+    write_template(root, "http/b.yaml", "b", "info", "tech")
+    write_template(root, ".github/c.yaml", "c")
+
+    index = TemplateIndex(root)
+    stats = index.build(incremental=False)
+    assert stats["added"] == 2
+    assert os.path.exists(os.path.join(root, INDEX_FILE))
+    assert [e.id for e in index.query(tags=["cve"])] == ["a"]
+    assert [e.id for e in index.query(exclude_tags=["cve"])] == ["b"]
+    assert [e.id for e in index.query(severities=["info"])] == ["b"]
+    assert index.count(protocols=["dns"]) == 0
+    assert index.summary()["severity"] == {"high": 1, "info": 1}
+
+
+def test_load_or_build_does_not_walk_stored_index(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    a = write_template(root, "http/a.yaml", "a", "high")
+    write_template(root, "http/b.yaml", "b")
+    TemplateIndex(root).load_or_build()
+    index_path = os.path.join(root, INDEX_FILE)
+    saved = os.stat(index_path).st_mtime_ns
+
+    walks = []
+    monkeypatch.setattr(
+        "bountyforge.core.template_index.os.walk",
+        lambda *args, **kwargs: walks.append(args) or iter([])
+    )
+    index = TemplateIndex(root).load_or_build()
+    assert index.count() == 2
+    assert walks == []
+    assert os.stat(index_path).st_mtime_ns == saved
+    monkeypatch.undo()
+    digest = index.digest
+
+    # updated templates are picked up by the incremental rebuild
+    write_template(root, "http/a.yaml", "a", "critical")
+    bump(a)
+    write_template(root, "dns/c.yaml", "c")
+    os.remove(os.path.join(root, "http/b.yaml"))
+    stats = TemplateIndex(root).build()
+    assert stats == {"added": 1, "updated": 1, "removed": 1, "unchanged": 0}
+
+    index = TemplateIndex(root).load_or_build()
+    assert sorted(e.id for e in index.entries.values()) == ["a", "c"]
+    assert index.entries["http/a.yaml"].severity == "critical"
+    assert index.digest != digest
+    with open(index_path) as f:
+        assert len(json.load(f)["templates"]) == 2
+
+
+def test_index_of_read_only_templates_dir(tmp_path, monkeypatch):
+    root = tmp_path / "templates"
+    write_template(str(root), "http/a.yaml", "a")
+    # the index file can not be replaced in the templates directory
+    (root / INDEX_FILE).mkdir()
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(
+        "bountyforge.core.template_index.INDEX_CACHE_DIR", str(cache_dir)
+    )
+    TemplateIndex(str(root)).load_or_build()
+    assert len(os.listdir(cache_dir)) == 1
+
+    index = TemplateIndex(str(root))
+    assert index.load()
+    assert [e.id for e in index.entries.values()] == ["a"]
+
+
+def test_index_kept_in_memory_without_writable_location(
+    tmp_path, monkeypatch
+):
+    root = tmp_path / "templates"
+    write_template(str(root), "http/a.yaml", "a")
+    (root / INDEX_FILE).mkdir()
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    monkeypatch.setattr(
+        "bountyforge.core.template_index.INDEX_CACHE_DIR",
+        str(blocker / "cache")
+    )
+    index = TemplateIndex(str(root)).load_or_build()
+    assert [e.id for e in index.entries.values()] == ["a"]
+    assert not index.save()
+
+
+def test_build_reparses_only_changed_files(tmp_path, monkeypatch):
+    root = str(tmp_path)
+    a = write_template(root, "http/a.yaml", "a")
+    write_template(root, "http/b.yaml", "b")
+    TemplateIndex(root).build(incremental=False)
+
+    parsed = []
+    original = parse_template
+
+    def counting_parse(path, rel_path):
+        parsed.append(rel_path)
+        return original(path, rel_path)
+
+    monkeypatch.setattr(
+        "bountyforge.core.template_index.parse_template", counting_parse
+    )
+    write_template(root, "http/a.yaml", "a", "low")
+    bump(a)
+    stats = TemplateIndex(root).build()
+    assert parsed == [os.path.join("http", "a.yaml")]
+    assert stats == {"added": 0, "updated": 1, "removed": 0, "unchanged": 1}
+
+
+def test_stored_index_kept_without_templates_dir(tmp_path):
+    root = tmp_path / "templates"
+    index_path = str(tmp_path / "index.json")
+    write_template(str(root), "http/a.yaml", "a")
+    TemplateIndex(str(root), index_path).build(incremental=False)
+
+    os.remove(root / "http" / "a.yaml")
+    os.rmdir(root / "http")
+    os.rmdir(root)
+    index = TemplateIndex(str(root), index_path).load_or_build()
+    assert [e.id for e in index.entries.values()] == ["a"]
@@ -0,0 +1,53 @@
+from bountyforge.core.template_routing import (
+    detected_technologies, route_templates
+)
+
+TECH_TAGS = {"wordpress": ["wordpress", "wp"], "jenkins": ["jenkins"]}
+
+
+def test_detected_technologies():
+    assert detected_technologies(
+        ["WordPress:6.4.2", "Nginx"], TECH_TAGS
+    ) == {"wordpress"}
+    assert detected_technologies(None, TECH_TAGS) == frozenset()
+
+
+def test_route_templates():
+    groups = route_templates(
+        [
+            "https://wp.example.com/blog",
+            "https://plain.example.com",
+            "https://other.example.com/x",
+        ],
+        [
+            {"url": "https://wp.example.com", "tech": ["WordPress"]},
+            {"url": "https://plain.example.com", "tech": ["Nginx"]},
+        ],
+        TECH_TAGS
+    )
+    by_target = {t: g for g in groups for t in g.targets}
+    assert by_target["https://wp.example.com/blog"].exclude_tags == [
+        "jenkins"
+    ]
+    assert by_target["https://plain.example.com"].exclude_tags == [
+        "jenkins", "wordpress", "wp"
+    ]
+    # no httpx record, full template set
+    assert by_target["https://other.example.com/x"].exclude_tags == []
+
+
+def test_route_templates_without_tech():
+    # live mode records carry no "tech", nothing may be excluded
+    groups = route_templates(
+        ["https://a.example.com", "https://b.example.com"],
+        [
+            {"url": "https://a.example.com", "status_code": 200},
+            {"url": "https://b.example.com", "status_code": 200,
+             "cached": True},
+            {"url": "https://b.example.com", "tech": ["Jenkins"]},
+        ],
+        TECH_TAGS
+    )
+    by_target = {t: g for g in groups for t in g.targets}
+    assert by_target["https://a.example.com"].exclude_tags == []
+    assert by_target["https://b.example.com"].technologies == {"jenkins"}